@@ -1,8 +1,9 @@
 import os
 
-import vertexai
 from dotenv import load_dotenv
 
+from .process_pool import in_pool_worker
+
 # Load environment variables
 load_dotenv()
 
@@ -10,20 +11,23 @@ load_dotenv()
 PROJECT_ID = os.environ.get("GOOGLE_CLOUD_PROJECT")
 LOCATION = os.environ.get("GOOGLE_CLOUD_LOCATION")
 
-# Initialize Vertex AI at package load time
-try:
-    if PROJECT_ID and LOCATION:
-        print(f"Initializing Vertex AI with project={PROJECT_ID}, location={LOCATION}")
-        vertexai.init(project=PROJECT_ID, location=LOCATION)
-        print("Vertex AI initialization successful")
-    else:
-        print(
-            f"Missing Vertex AI configuration. PROJECT_ID={PROJECT_ID}, LOCATION={LOCATION}. "
-            f"Tools requiring Vertex AI may not work properly."
-        )
-except Exception as e:
-    print(f"Failed to initialize Vertex AI: {str(e)}")
-    print("Please check your Google Cloud credentials and project settings.")
+# Process-pool workers only run local NumPy and SQLite jobs: they skip Vertex AI and the agents
+if not in_pool_worker():
+    import vertexai
 
-from . import agent
+    # Initialize Vertex AI at package load time
+    try:
+        if PROJECT_ID and LOCATION:
+            print(f"Initializing Vertex AI with project={PROJECT_ID}, location={LOCATION}")
+            vertexai.init(project=PROJECT_ID, location=LOCATION)
+            print("Vertex AI initialization successful")
+        else:
+            print(
+                f"Missing Vertex AI configuration. PROJECT_ID={PROJECT_ID}, LOCATION={LOCATION}. "
+                f"Tools requiring Vertex AI may not work properly."
+            )
+    except Exception as e:
+        print(f"Failed to initialize Vertex AI: {str(e)}")
+        print("Please check your Google Cloud credentials and project settings.")
 
+    from . import agent
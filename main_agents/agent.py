@@ -1,29 +1,65 @@
 from google.adk.agents import LlmAgent
-from google.adk.models.google_llm import Gemini
 from google.genai import types
 from google.adk import Agent, Runner
 from google.adk.tools import AgentTool, FunctionTool
 from google.adk.sessions import InMemorySessionService
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from .config import (
+    DEFAULT_RETRY_ATTEMPTS,
+    DEFAULT_RETRY_INITIAL_DELAY,
+    DEFAULT_RETRY_MAX_DELAY,
+    DEFAULT_EVENT_QUEUE_SIZE,
+    DEFAULT_OFFLOAD_MIN_ROWS,
+    DEFAULT_SESSION_TIMEOUT,
+)
+from .events import (
+    ERROR,
+    FINAL_ANSWER,
+    PARTIAL_TEXT,
+    QUERY_END,
+    QUERY_START,
+    QueryMetrics,
+    SessionEvent,
+    translate,
+)
+from .models import ThrottledGemini
+from .process_pool import log_progress, run_offloaded
+from .resilience import session_deadline
 from .tools import rag_query
 from .prompts import (
     return_instructions_rag_agent, 
     return_instructions_database_agent,
     return_instructions_root_agent
 )
+import asyncio
+import contextlib
 import os
 import sys
+from typing import AsyncIterator
 from dotenv import load_dotenv
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # Agregar el directorio padre al path para importar utils
 
 from utils.connection_db import DatabaseConnection
+from utils.database_jobs import database_paths, profile_tables, refresh_text_index, run_query
+from utils.database_registry import DEFAULT_DATABASE, get_registry
+from utils.endpoint_mapping import get_mapping_index
+from utils.change_tracker import affected_tables, get_change_tracker
+from utils.payload_generator import PayloadGenerator
+from utils.results_store import active_run, get_results_store
+from utils.snapshots import isolated_database
+
+from .executor import execute_test_cases
 
 load_dotenv()
 
 retry_config = types.HttpRetryOptions(
-    attempts=5,  # Maximum retry attempts
-    exp_base=7,  # Delay multiplier
-    initial_delay=1,
-    http_status_codes=[429, 500, 503, 504],  # Retry on these HTTP errors
+    attempts=DEFAULT_RETRY_ATTEMPTS,  # Maximum retry attempts
+    exp_base=2,  # Delay multiplier
+    initial_delay=DEFAULT_RETRY_INITIAL_DELAY,
+    max_delay=DEFAULT_RETRY_MAX_DELAY,  # Cap for a single backoff sleep
+    jitter=1,
+    # 429 is not retried here: ThrottledGemini backs off through the shared rate limiter
+    http_status_codes=[500, 503, 504],  # Retry on these HTTP errors
 )
 
 
@@ -33,90 +69,243 @@ USER_ID = "default"  # User
 SESSION = "default"  # Session
 MODEL_NAME = "gemini-2.5-flash"  # Model name for responses
 
-# Define helper functions that will be reused throughout the notebook
-async def run_session(
-    runner_instance: Runner,
-    user_queries: list[str] | str = None,
-    session_name: str = "default",
-):
-    print(f"\n ### Session: {session_name}")
-
-    # Get app name from the Runner
-    app_name = runner_instance.app_name
-
+async def _get_or_create_session(app_name: str, session_name: str):
     # Attempt to create a new session or retrieve an existing one
     try:
-        session = await session_service.create_session(
+        return await session_service.create_session(
             app_name=app_name, user_id=USER_ID, session_id=session_name
         )
     except:
-        session = await session_service.get_session(
+        return await session_service.get_session(
             app_name=app_name, user_id=USER_ID, session_id=session_name
         )
 
-    # Process queries if provided
-    if user_queries:
-        # Convert single query to list for uniform processing
-        if type(user_queries) == str:
-            user_queries = [user_queries]
-
-        # Process each query in the list sequentially
-        for query in user_queries:
-            print(f"\n🙍User > {query}")
-
-            # Convert the query string to the ADK Content format
-            query = types.Content(role="user", parts=[types.Part(text=query)])
-
-            # Stream the agent's response asynchronously
-            async for event in runner_instance.run_async(
-                user_id=USER_ID, session_id=session.id, new_message=query
-            ):
-                # Check if the event contains valid content
-                if event.content and event.content.parts:
-                    # Filter out empty or "None" responses before printing
-                    if (
-                        event.content.parts[0].text != "None"
-                        and event.content.parts[0].text
+
+async def _produce_events(
+    runner_instance: Runner,
+    session,
+    session_name: str,
+    user_queries: list[str],
+    queue: asyncio.Queue,
+    session_timeout: float,
+    run_id: str,
+    isolated: bool,
+    run_config: RunConfig,
+):
+    """Run the queries and put their typed events on `queue`; None marks the end of the stream."""
+    results_store = get_results_store()
+    query_text = None
+    metrics = None
+    try:
+        # Every model and retrieval call below is bounded by the session deadline,
+        # and every output or test result is recorded under the same run.
+        # An isolated session works on its own in-memory copy of the database
+        database = isolated_database() if isolated else contextlib.nullcontext()
+        with session_deadline(session_timeout), active_run(run_id), database:
+            async with asyncio.timeout(session_timeout):
+                for query_text in user_queries:
+                    metrics = QueryMetrics(query_text)
+                    await queue.put(SessionEvent(QUERY_START, query_text))
+
+                    # Convert the query string to the ADK Content format
+                    query = types.Content(role="user", parts=[types.Part(text=query_text)])
+                    async for adk_event in runner_instance.run_async(
+                        user_id=USER_ID, session_id=session.id, new_message=query, run_config=run_config
                     ):
-                        print(f"🤖 {MODEL_NAME} > ", event.content.parts[0].text)
-    else:
+                        for event in translate(adk_event, query_text, metrics.elapsed()):
+                            metrics.observe(event)
+                            if event.text and event.type != ERROR and not adk_event.partial:
+                                results_store.record_agent_output(session_name, query_text, event.author, event.text)
+                            # Blocks while the consumer is behind, which pauses the agent (backpressure)
+                            await queue.put(event)
+
+                    metrics.finish()
+                    await queue.put(SessionEvent(QUERY_END, query_text, elapsed=metrics.total_time, data=metrics.to_dict()))
+                    metrics = None
+    except asyncio.CancelledError:
+        raise  # the consumer stopped reading; nobody is waiting for the end of the stream
+    except Exception as e:
+        error = SessionEvent(
+            ERROR, query_text or "", elapsed=metrics.elapsed() if metrics else 0.0,
+            text=str(e) or type(e).__name__, data={"exception": type(e).__name__}, exception=e,
+        )
+        if metrics:
+            metrics.observe(error)
+            metrics.finish()
+        await queue.put(error)
+        if metrics:
+            await queue.put(SessionEvent(QUERY_END, query_text, elapsed=metrics.total_time, data=metrics.to_dict()))
+    finally:
+        # A cancelled producer has no reader left: nothing more is queued
+        cancelled = asyncio.current_task().cancelling() > 0
+        try:
+            results_store.flush()
+        except Exception as e:
+            if cancelled:
+                print(f"Error saving the results of session {session_name}: {e}")
+            else:
+                await queue.put(SessionEvent(
+                    ERROR, query_text or "", text=f"Could not save the session results: {e}",
+                    data={"exception": type(e).__name__}, exception=e,
+                ))
+        if not cancelled:
+            await queue.put(None)
+
+
+async def stream_session(
+    runner_instance: Runner,
+    user_queries: list[str] | str = None,
+    session_name: str = "default",
+    session_timeout: float = DEFAULT_SESSION_TIMEOUT,
+    run_id: str = None,
+    isolated: bool = False,
+    stream_text: bool = False,
+    max_pending_events: int = DEFAULT_EVENT_QUEUE_SIZE,
+) -> AsyncIterator[SessionEvent]:
+    """
+    Run queries in a session and yield typed events as they arrive.
+
+    Each query yields QUERY_START, then tool calls, text and errors as the agent produces them,
+    and ends with QUERY_END, whose `data` holds the query metrics (time_to_first_event,
+    time_to_final_answer, total_time, tool_calls...). An exception (e.g. the session timeout)
+    is yielded as an ERROR event with `exception` set, and ends the stream.
+
+    The agent runs in its own task and hands events over through a bounded queue: a slow
+    consumer pauses the agent instead of piling up events in memory. Leaving the loop early
+    cancels the agent.
+
+    e.g.
+        async for event in stream_session(runner, "What tables back /api/customer?"):
+            if event.type == FINAL_ANSWER:
+                print(event.text)
+            elif event.type == QUERY_END:
+                print(event.data["time_to_final_answer"])
+
+    Args:
+        runner_instance (Runner): Runner of the root agent.
+        user_queries (list[str] | str): One query or a list of queries, run in order.
+        session_name (str): Session id; an existing session keeps its history.
+        session_timeout (float): Seconds for all the queries together.
+        run_id (str): Run under which outputs and test results are recorded. A new one by default.
+        isolated (bool): Run against a private in-memory copy of the database.
+        stream_text (bool): Yield the model text in PARTIAL_TEXT chunks while it is generated (SSE).
+        max_pending_events (int): Events buffered before the agent waits for the consumer.
+
+    Yields:
+        SessionEvent: Typed events, see main_agents/events.py.
+    """
+    if not user_queries:
+        return
+    # Convert single query to list for uniform processing
+    if isinstance(user_queries, str):
+        user_queries = [user_queries]
+
+    session = await _get_or_create_session(runner_instance.app_name, session_name)
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE) if stream_text else None
+    queue = asyncio.Queue(maxsize=max_pending_events)
+    producer = asyncio.create_task(_produce_events(
+        runner_instance, session, session_name, user_queries, queue,
+        session_timeout, run_id, isolated, run_config,
+    ))
+    try:
+        while (event := await queue.get()) is not None:
+            yield event
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await producer
+
+
+async def run_session(
+    runner_instance: Runner,
+    user_queries: list[str] | str = None,
+    session_name: str = "default",
+    session_timeout: float = DEFAULT_SESSION_TIMEOUT,
+    run_id: str = None,
+    isolated: bool = False,
+) -> list[dict]:
+    """Print the agent's answers to each query and return the metrics of every query."""
+    print(f"\n ### Session: {session_name}")
+
+    if not user_queries:
         print("No queries!")
-    
+        return []
+
+    metrics = []
+    async for event in stream_session(
+        runner_instance, user_queries, session_name, session_timeout, run_id, isolated
+    ):
+        if event.type == QUERY_START:
+            print(f"\n🙍User > {event.query}")
+        elif event.type in (PARTIAL_TEXT, FINAL_ANSWER):
+            print(f"🤖 {MODEL_NAME} > ", event.text)
+        elif event.type == QUERY_END:
+            metrics.append(event.data)
+        elif event.type == ERROR:
+            if event.exception is not None:
+                raise event.exception
+            print(f"⚠️ {event.author} > {event.text}")
+    return metrics
+
 
 # ================================================ Herramienta para análisis de base de datos
-def analyze_database(query: str = ""):
+async def analyze_database(query: str = "", database: str = DEFAULT_DATABASE):
     """
-    Herramienta para conectarse y analizar la base de datos SQLite.
+    Herramienta para conectarse y analizar una base de datos SQLite.
     
     Args:
         query: Descripción de lo que se quiere analizar (opcional)
+        database: Nombre de la base de datos a analizar. e.g. "library"
     
     Returns:
         str: Información de las tablas y datos de la base de datos
     """
-    db = DatabaseConnection()
+    try:
+        db = DatabaseConnection(database)
+    except ValueError as e:
+        return f"Error: {str(e)}"
     try:
         if not db.connect():
             return "Error: No se pudo conectar a la base de datos"
         
-        # Obtener información general
-        tables = db.get_tables()
-        foreign_keys = db.get_foreign_keys()
+        # Obtener información general (catálogo cacheado hasta que cambie el esquema)
+        catalog = db.get_catalog()
+        tables = catalog["tables"]
         
         result = {
+            "database": db.source.name,
+            "available_databases": get_registry().names(),
             "tables": tables,
-            "foreign_keys": foreign_keys,
+            "foreign_keys": catalog["foreign_keys"],
             "schemas": {}
         }
         
-        # Obtener esquemas de todas las tablas
+        # Perfilar en el pool de procesos las tablas sin estadísticas en caché; la copia en memoria
+        # de una sesión aislada no es visible desde otros procesos
+        pending = [table for table in tables if db.cached_column_stats(table) is None]
+        if pending and not db.isolated:
+            watermarks = {table: db.table_watermark(table) for table in pending}
+            profiles = await run_offloaded(
+                profile_tables, db.source.name, database_paths([db.source.name]), pending,
+                on_progress=log_progress,
+            )
+            for table, profile in profiles.items():
+                db.store_column_stats(table, profile, watermarks[table])
+
+        # Obtener esquemas, estadísticas por columna y una muestra representativa de todas las tablas
         for table in tables:
-            schema = db.get_table_schema(table)
-            sample_data = db.execute_query(f"SELECT * FROM {table} LIMIT 3")
+            schema = catalog["schemas"][table]
+            column_stats = db.get_column_stats(table).get("columns", {})
+            sample_data = db.sample_rows(table, n=3)
             
             result["schemas"][table] = {
-                "columns": [{"name": col[1], "type": col[2]} for col in schema],
-                "sample_data": [dict(row) for row in sample_data]
+                "columns": [
+                    {"name": col[1], "type": col[2], "stats": column_stats.get(col[1], {})}
+                    for col in schema
+                ],
+                "sample_data": sample_data.to_dict()
             }
         
         return str(result)
@@ -126,11 +315,262 @@ def analyze_database(query: str = ""):
     finally:
         db.disconnect()
 
+# ================================================ Herramienta para consultas SELECT
+async def query_database(query: str, params: list = None, database: str = DEFAULT_DATABASE, attach: list[str] = None):
+    """
+    Ejecuta una consulta SELECT de solo lectura sobre una base de datos.
+    Las consultas que recorrerían demasiadas filas se limitan automáticamente o se rechazan
+    con una recomendación de índice.
+
+    Args:
+        query: Consulta SQL. e.g. "SELECT * FROM books WHERE genre = ? LIMIT 5"
+        params: Parámetros de la consulta. e.g. ["Fiction"]
+        database: Nombre de la base de datos principal. e.g. "library"
+        attach: Otras bases de datos a cruzar en la misma consulta; sus tablas se usan como "nombre.tabla".
+            e.g. ["orders"] para "SELECT ... FROM books b JOIN orders.order_items i ON i.book_id = b.book_id"
+
+    Returns:
+        dict: Columnas (una vez) y filas devueltas, o el motivo del rechazo
+    """
+    try:
+        db = DatabaseConnection(database)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        if not db.connect():
+            return {"status": "error", "message": "No se pudo conectar a la base de datos"}
+
+        with db.attached(attach or []):
+            decision = db.query_guard.check(query, tuple(params) if params else None)
+            if not decision.allowed:
+                return {
+                    "status": "error",
+                    "message": decision.reason,
+                    "recommendations": decision.recommendations,
+                }
+
+            if decision.estimated_rows >= DEFAULT_OFFLOAD_MIN_ROWS and not db.isolated:
+                # Ejecución y serialización fuera del event loop
+                data = await run_offloaded(
+                    run_query, db.source.name, database_paths([db.source.name, *(attach or [])]),
+                    decision.query, params, attach, on_progress=log_progress,
+                )
+            else:
+                data = db.execute_query(decision.query, tuple(params) if params else None, guard=False).to_dict()
+        # Formato compacto: los nombres de columna aparecen una sola vez
+        return {
+            "status": "success",
+            "message": decision.reason or f"{len(data['rows'])} fila(s)",
+            **data,
+        }
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.disconnect()
+
+# ================================================ Herramienta para búsqueda de texto completo
+async def search_database(text: str, database: str = DEFAULT_DATABASE, tables: list[str] = None, limit: int = 10):
+    """
+    Busca filas que contengan un texto (un email, un título, un nombre) en todas las columnas de texto,
+    ordenadas por relevancia. Es mucho más rápido que una consulta con LIKE '%...%'.
+    Antes de buscar pone al día el índice de texto completo (las tablas y filas nuevas se indexan solas).
+
+    Args:
+        text: Texto a buscar. e.g. "orwell" o "john@example.com". "tit*" busca por prefijo
+        database: Nombre de la base de datos. e.g. "library"
+        tables: Tablas en las que buscar (opcional). e.g. ["books"]
+        limit: Número máximo de filas devueltas
+
+    Returns:
+        dict: Filas encontradas con su tabla, relevancia y fragmento coincidente
+    """
+    try:
+        db = DatabaseConnection(database)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        if not db.connect():
+            return {"status": "error", "message": "No se pudo conectar a la base de datos"}
+
+        # El índice vive en un archivo aparte: indexar no cambia la base de datos ni el hash de su esquema
+        if db.stale_text_indexes(tables):
+            if db.isolated:
+                db.refresh_text_index(tables)
+            else:
+                await run_offloaded(
+                    refresh_text_index, db.source.name, database_paths([db.source.name]), tables,
+                    on_progress=log_progress,
+                )
+        matches = db.search_text(text, tables=tables, limit=limit)
+        return {
+            "status": "success",
+            "message": f"{len(matches)} fila(s) encontradas",
+            "matches": matches,
+        }
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.disconnect()
+
+# ================================================ Herramientas para relacionar endpoints y tablas
+def map_endpoint(endpoint: str, fields: list[str] = None, database: str = DEFAULT_DATABASE):
+    """
+    Indica qué tablas y columnas respaldan un endpoint sin revisar todo el esquema.
+    Si el endpoint ya se mapeó (o alguien confirmó su mapeo) la respuesta es inmediata.
+
+    Args:
+        endpoint: Ruta o URL del endpoint. e.g. "/api/customer/{id}"
+        fields: Campos del body o de la respuesta del endpoint (opcional). e.g. ["email", "name"]
+        database: Nombre de la base de datos. e.g. "library"
+
+    Returns:
+        dict: Tablas sugeridas con su puntuación y la columna de cada campo
+    """
+    try:
+        db = DatabaseConnection(database)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        if not db.connect():
+            return {"status": "error", "message": "No se pudo conectar a la base de datos"}
+
+        schema_hash = db.get_schema_snapshot().get("hash")
+        mapping = get_mapping_index().map(endpoint, database, db.get_catalog, fields, schema_hash)
+        return {"status": "success", "mapping": mapping}
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.disconnect()
+
+def confirm_endpoint_mapping(
+    endpoint: str,
+    tables: list[str],
+    columns: dict = None,
+    database: str = DEFAULT_DATABASE,
+):
+    """
+    Guarda el mapeo correcto de un endpoint una vez verificado, para que las siguientes sesiones lo reutilicen.
+
+    Args:
+        endpoint: Ruta o URL del endpoint. e.g. "/api/customer/{id}"
+        tables: Tablas que respaldan el endpoint. e.g. ["users"]
+        columns: Columna de cada campo del endpoint (opcional). e.g. {"email": "users.email"}
+        database: Nombre de la base de datos. e.g. "library"
+
+    Returns:
+        dict: El mapeo guardado
+    """
+    try:
+        db = DatabaseConnection(database)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        if not db.connect():
+            return {"status": "error", "message": "No se pudo conectar a la base de datos"}
+
+        unknown = [table for table in tables if table not in db.get_catalog()["tables"]]
+        if unknown:
+            return {"status": "error", "message": f"Tablas desconocidas: {unknown}"}
+        schema_hash = db.get_schema_snapshot().get("hash")
+        mapping = get_mapping_index().confirm(endpoint, database, tables, columns, schema_hash)
+        return {"status": "success", "mapping": mapping}
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.disconnect()
+
+# ================================================ Herramienta para detectar cambios en la base de datos
+def detect_database_changes(database: str = DEFAULT_DATABASE):
+    """
+    Indica qué tablas cambiaron desde la última comprobación (tablas nuevas o eliminadas, columnas
+    cambiadas, filas insertadas o borradas) y qué endpoints mapeados dependen de ellas.
+    Solo hace falta volver a analizar esas tablas y regenerar las pruebas de esos endpoints.
+
+    Args:
+        database: Nombre de la base de datos. e.g. "library"
+
+    Returns:
+        dict: Diff por tabla y endpoints afectados
+    """
+    try:
+        diff = get_change_tracker(database).check()
+        tables = affected_tables(diff) + diff["tables_removed"]
+        return {
+            "status": "success",
+            "diff": diff,
+            "affected_endpoints": get_mapping_index().endpoints_for_tables(database, tables),
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+# ================================================ Herramienta para generar payloads de prueba
+def generate_test_payloads(
+    fields: list[dict],
+    related_tables: list[str] = None,
+    coverage: str = "pairwise",
+    limit: int = 50,
+    database: str = DEFAULT_DATABASE,
+    values_per_field: int = 10,
+):
+    """
+    Genera payloads de prueba (válidos, límite e inválidos) con valores reales de la base de datos.
+    Solo necesitas indicar qué columna alimenta cada campo del endpoint.
+
+    Args:
+        fields: Campos del endpoint con su columna de origen. e.g.
+            [{"name": "email", "source": "users.email"},
+             {"name": "book_id", "source": "books.book_id", "required": false},
+             {"name": "channel", "values": ["web", "store"]}]
+        related_tables: Tablas intermedias para unir las tablas de los campos por foreign keys. e.g. ["sales"]
+        coverage: "pairwise" (todas las parejas de valores) o "full" (producto cartesiano)
+        limit: Número máximo de payloads devueltos
+        database: Nombre de la base de datos de la que se toman los valores. e.g. "library"
+        values_per_field: Filas reales distintas que se toman por grupo de campos; más da más payloads válidos
+
+    Returns:
+        dict: Conteo por tipo y los payloads generados
+    """
+    try:
+        db = DatabaseConnection(database)
+    except ValueError as e:
+        return {"status": "error", "message": str(e)}
+    try:
+        if not db.connect():
+            return {"status": "error", "message": "No se pudo conectar a la base de datos"}
+
+        generator = PayloadGenerator(db, values_per_field=values_per_field)
+        cases = list(generator.generate(fields, related_tables=related_tables, coverage=coverage, limit=limit))
+        counts = {}
+        for case in cases:
+            counts[case["kind"]] = counts.get(case["kind"], 0) + 1
+
+        return {
+            "status": "success",
+            "counts": counts,
+            "cases": cases,
+        }
+
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.disconnect()
+
 # Crear la herramienta
 database_analysis_tool = FunctionTool(func=analyze_database)
+query_tool = FunctionTool(func=query_database)
+search_tool = FunctionTool(func=search_database)
+endpoint_mapping_tools = [FunctionTool(func=map_endpoint), FunctionTool(func=confirm_endpoint_mapping)]
+change_detection_tool = FunctionTool(func=detect_database_changes)
+payload_generation_tool = FunctionTool(func=generate_test_payloads)
+# Herramienta para ejecutar los casos de prueba generados contra la API
+test_execution_tool = FunctionTool(func=execute_test_cases)
 # Create Rag Agent
 rag_agent = LlmAgent(
-    model=Gemini(model=MODEL_NAME, retry_options=retry_config),
+    model=ThrottledGemini(model=MODEL_NAME, retry_options=retry_config),
     name='rag_agent',
     instruction=return_instructions_rag_agent(),
     tools=[
@@ -140,17 +580,17 @@ rag_agent = LlmAgent(
 database_analyst_agent = LlmAgent(
     name = 'Database_Analyst_Agent',
     description = 'An agent that specializes in analyze database structure and the data within it.',
-    model=Gemini(model=MODEL_NAME, retry_options=retry_config),
+    model=ThrottledGemini(model=MODEL_NAME, retry_options=retry_config),
     instruction=return_instructions_database_agent(),
-    tools=[database_analysis_tool],
+    tools=[database_analysis_tool, query_tool, search_tool, *endpoint_mapping_tools, change_detection_tool, payload_generation_tool],
 )
 # ================================================ Agente raíz que usa los otros agentes como herramientas
 root_agent = Agent(
-    model=Gemini(model=MODEL_NAME, retry_options=retry_config),
+    model=ThrottledGemini(model=MODEL_NAME, retry_options=retry_config),
     name='root_agent',
     description='Agent that orchestrate other agents to try to test and use API endpoints based on their documentation.',
     instruction=return_instructions_root_agent(),
-    tools=[AgentTool(database_analyst_agent), AgentTool(rag_agent)],
+    tools=[AgentTool(database_analyst_agent), AgentTool(rag_agent), test_execution_tool],
 )
 
 session_service = InMemorySessionService()
@@ -188,5 +628,4 @@ async def main():
             print(f"❌ Error en consulta {i}: {e}")
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
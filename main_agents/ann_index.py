@@ -0,0 +1,432 @@
+"""
+Approximate nearest-neighbour search over normalized embeddings, in NumPy.
+
+`IVFPQIndex` is an inverted file with product quantization: a coarse k-means
+splits the vectors into `nlist` lists, and each vector is stored in its list
+as `m` one-byte codes of its residual. A query scans only the `nprobe`
+closest lists, scores the codes with per-query lookup tables, and re-ranks
+the best `k * refine` candidates with the exact vectors when they are given.
+Raising `nprobe` or `refine` trades latency for recall.
+
+Run `python -m main_agents.ann_index` to measure recall@DEFAULT_TOP_K and
+latency against exact search.
+"""
+
+import argparse
+import time
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import (
+    DEFAULT_ANN_NPROBE,
+    DEFAULT_ANN_REFINE,
+    DEFAULT_PQ_SUBVECTORS,
+    DEFAULT_TOP_K,
+)
+
+# Codewords per subquantizer (one byte per code)
+_PQ_CODEWORDS = 256
+# Training points per centroid; more adds build time without improving the lists much
+_TRAIN_POINTS_PER_CENTROID = 40
+_KMEANS_ITERATIONS = 10
+# Rows per matrix product during assignment, bounds temporary memory
+_ASSIGN_BATCH = 65536
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows, so inner product equals cosine similarity."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (L2) of each row."""
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), _ASSIGN_BATCH):
+        batch = vectors[start:start + _ASSIGN_BATCH]
+        labels[start:start + len(batch)] = np.argmax(batch @ centroids.T - half_norms, axis=1)
+    return labels
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = _KMEANS_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means on a sample of at most `k * 40` rows.
+
+    Args:
+        vectors (np.ndarray): (n, d) float32 matrix.
+        k (int): Number of centroids.
+        iterations (int): Lloyd iterations.
+        seed (int): Seed for sampling and initialization.
+
+    Returns:
+        np.ndarray: (k, d) float32 centroids.
+    """
+    rng = np.random.default_rng(seed)
+    if len(vectors) > k * _TRAIN_POINTS_PER_CENTROID:
+        vectors = vectors[rng.choice(len(vectors), k * _TRAIN_POINTS_PER_CENTROID, replace=False)]
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), k, replace=len(vectors) < k)].copy()
+    for _ in range(iterations):
+        labels = _assign(vectors, centroids)
+        counts = np.bincount(labels, minlength=k)
+        filled = counts > 0
+        # Sum the members of each cluster with one reduceat over the rows sorted by label
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        centroids[filled] = np.add.reduceat(vectors[order], starts, axis=0) / counts[filled, None]
+        # Re-seed empty clusters on random points
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty))]
+    return centroids
+
+
+def exact_search(vectors: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Brute-force top-k by inner product.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Row ids and scores, best first.
+    """
+    scores = vectors @ query
+    k = min(k, len(scores))
+    if k == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return top.astype(np.int64), scores[top]
+
+
+def exact_search_batch(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Brute-force top-k for several queries with one matrix product (one pass over `vectors`)."""
+    all_scores = np.asarray(queries, dtype=np.float32) @ np.asarray(vectors).T
+    k = min(k, all_scores.shape[1])
+    results = []
+    for scores in all_scores:
+        if k == 0:
+            results.append((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)))
+            continue
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results.append((top.astype(np.int64), scores[top]))
+    return results
+
+
+def default_nlist(count: int) -> int:
+    """Number of inverted lists for `count` vectors: about 4 * sqrt(n), between 16 and 4096."""
+    return int(min(4096, max(16, 4 * np.sqrt(count))))
+
+
+class IVFPQIndex:
+    """
+    Inverted file index with product-quantized residuals.
+
+    Vectors must be normalized (see `normalize`); scores are inner products,
+    i.e. cosine similarities. Vectors can be added at any time after `train`.
+
+    Args:
+        dimension (int): Vector length; must be divisible by `m`.
+        m (int): Subquantizers; each vector is stored in `m` bytes.
+        nprobe (int): Lists scanned per query by default.
+        refine (int): Candidates re-ranked exactly per result (`k * refine`), when vectors are given.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        m: int = DEFAULT_PQ_SUBVECTORS,
+        nprobe: int = DEFAULT_ANN_NPROBE,
+        refine: int = DEFAULT_ANN_REFINE,
+    ):
+        if dimension % m:
+            raise ValueError(f"dimension {dimension} is not divisible by m={m}")
+        self.dimension = dimension
+        self.m = m
+        self.nprobe = nprobe
+        self.refine = refine
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None  # (m, 256, dimension // m)
+        self.trained_size = 0
+        self._ids: List[List[np.ndarray]] = []
+        self._codes: List[List[np.ndarray]] = []
+        self._count = 0
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _subvectors(self, vectors: np.ndarray) -> np.ndarray:
+        return vectors.reshape(len(vectors), self.m, self.dimension // self.m)
+
+    def train(
+        self,
+        vectors: np.ndarray,
+        nlist: Optional[int] = None,
+        seed: int = 0,
+        progress: Optional[Callable[[int, int, str], None]] = None,
+    ) -> None:
+        """
+        Learn the coarse centroids and the PQ codebooks. Clears any added vectors.
+
+        Args:
+            vectors (np.ndarray): (n, dimension) normalized training vectors.
+            nlist (int): Inverted lists. Defaults to `default_nlist(n)`.
+            seed (int): Random seed.
+            progress (Callable[[int, int, str], None]): Called as (done, total, message) after each k-means,
+                                                        e.g. a process-pool job's `progress`.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        nlist = min(nlist or default_nlist(len(vectors)), len(vectors))
+        self.centroids = kmeans(vectors, nlist, seed=seed)
+        if progress:
+            progress(1, self.m + 1, "coarse centroids")
+        residuals = vectors - self.centroids[_assign(vectors, self.centroids)]
+        subvectors = self._subvectors(residuals)
+        codebooks = []
+        for j in range(self.m):
+            codebooks.append(kmeans(subvectors[:, j, :], _PQ_CODEWORDS, seed=seed + j))
+            if progress:
+                progress(j + 2, self.m + 1, f"codebook {j + 1}/{self.m}")
+        self.codebooks = np.stack(codebooks)
+        self.trained_size = len(vectors)
+        self._ids = [[] for _ in range(nlist)]
+        self._codes = [[] for _ in range(nlist)]
+        self._count = 0
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        subvectors = self._subvectors(residuals)
+        codes = np.empty((len(residuals), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _assign(np.ascontiguousarray(subvectors[:, j, :]), self.codebooks[j])
+        return codes
+
+    def add(self, ids: Sequence[int], vectors: np.ndarray) -> None:
+        """
+        Add normalized vectors under the given ids.
+
+        Args:
+            ids (Sequence[int]): Caller's id of each vector, e.g. the chunk row.
+            vectors (np.ndarray): (n, dimension) normalized vectors.
+        """
+        if not self.trained:
+            raise RuntimeError("Index must be trained before adding vectors")
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.asarray(ids, dtype=np.int64)
+        labels = _assign(vectors, self.centroids)
+        codes = self._encode(vectors - self.centroids[labels])
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(self.nlist + 1))
+        for label in np.flatnonzero(np.diff(bounds)):
+            rows = order[bounds[label]:bounds[label + 1]]
+            self._ids[label].append(ids[rows])
+            self._codes[label].append(codes[rows])
+        self._count += len(ids)
+
+    def _list(self, label: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and codes of a list, merging the blocks appended since the last search."""
+        if len(self._ids[label]) > 1:
+            self._ids[label] = [np.concatenate(self._ids[label])]
+            self._codes[label] = [np.concatenate(self._codes[label])]
+        if not self._ids[label]:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.m), dtype=np.uint8)
+        return self._ids[label][0], self._codes[label][0]
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = DEFAULT_TOP_K,
+        nprobe: Optional[int] = None,
+        vectors: Optional[np.ndarray] = None,
+        refine: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k by inner product.
+
+        Args:
+            query (np.ndarray): Normalized query vector.
+            k (int): Results to return.
+            nprobe (int): Lists to scan. Defaults to `self.nprobe`.
+            vectors (np.ndarray): Exact vectors indexed by id (e.g. a memmap). Enables re-ranking.
+            refine (int): Candidates re-ranked per result. Defaults to `self.refine`.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Ids and scores, best first. Scores are exact when
+                `vectors` is given, PQ approximations otherwise.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        refine = refine or self.refine
+        coarse = self.centroids @ query
+        probes = np.argpartition(-coarse, nprobe - 1)[:nprobe]
+
+        # Lookup table: inner product of each query subvector with every codeword
+        table = np.einsum("jd,jkd->jk", query.reshape(self.m, -1), self.codebooks).ravel()
+        offsets = np.arange(self.m) * _PQ_CODEWORDS
+        candidate_ids = []
+        candidate_scores = []
+        for label in probes:
+            ids, codes = self._list(label)
+            if len(ids):
+                candidate_ids.append(ids)
+                candidate_scores.append(coarse[label] + table[codes + offsets].sum(axis=1))
+        if not candidate_ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(candidate_scores)
+
+        shortlist = min(len(ids), k * refine if vectors is not None else k)
+        top = np.argpartition(-scores, shortlist - 1)[:shortlist]
+        ids, scores = ids[top], scores[top]
+        if vectors is not None:
+            # Sorted ids read a memmap sequentially
+            order = np.argsort(ids)
+            ids = ids[order]
+            scores = np.asarray(vectors[ids], dtype=np.float32) @ query
+        best = np.argsort(-scores)[:k]
+        return ids[best], scores[best]
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """The whole index as flat arrays (lists concatenated), e.g. for `save` or shared memory."""
+        lists = [self._list(label) for label in range(self.nlist)]
+        return {
+            "dimension": np.array(self.dimension),
+            "m": np.array(self.m),
+            "nprobe": np.array(self.nprobe),
+            "refine": np.array(self.refine),
+            "trained_size": np.array(self.trained_size),
+            "centroids": self.centroids,
+            "codebooks": self.codebooks,
+            "list_sizes": np.array([len(ids) for ids, _ in lists], dtype=np.int64),
+            "ids": np.concatenate([ids for ids, _ in lists]) if lists else np.empty(0, dtype=np.int64),
+            "codes": np.concatenate([codes for _, codes in lists]) if lists else np.empty((0, self.m), dtype=np.uint8),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Mapping[str, np.ndarray]) -> "IVFPQIndex":
+        """Index over arrays returned by `to_arrays`; the lists are views, not copies."""
+        index = cls(int(arrays["dimension"]), int(arrays["m"]), int(arrays["nprobe"]), int(arrays["refine"]))
+        index.centroids = arrays["centroids"]
+        index.codebooks = arrays["codebooks"]
+        index.trained_size = int(arrays["trained_size"])
+        bounds = np.concatenate([[0], np.cumsum(arrays["list_sizes"])])
+        ids, codes = arrays["ids"], arrays["codes"]
+        index._ids = [[ids[bounds[i]:bounds[i + 1]]] for i in range(len(bounds) - 1)]
+        index._codes = [[codes[bounds[i]:bounds[i + 1]]] for i in range(len(bounds) - 1)]
+        index._count = int(bounds[-1])
+        return index
+
+    def save(self, path: str) -> None:
+        """Write the index to a .npz file."""
+        np.savez(path, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path: str) -> "IVFPQIndex":
+        """Read an index written by `save`."""
+        with np.load(path) as data:
+            return cls.from_arrays({name: data[name] for name in data.files})
+
+
+def synthetic_vectors(
+    count: int, dimension: int, clusters: int = 256, latent: int = 64, seed: int = 0
+) -> np.ndarray:
+    """
+    Normalized vectors with clustered, low-dimensional structure, a rough stand-in for
+    document embeddings (isotropic noise in 768 dimensions has no meaningful neighbours).
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, latent)).astype(np.float32)
+    points = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, latent)).astype(np.float32)
+    projection = rng.standard_normal((latent, dimension)).astype(np.float32) / np.sqrt(latent)
+    noise = 0.05 * rng.standard_normal((count, dimension)).astype(np.float32)
+    return normalize(points @ projection + noise)
+
+
+def synthetic_queries(vectors: np.ndarray, count: int, noise: float = 0.3, seed: int = 1) -> np.ndarray:
+    """Queries near random corpus vectors, like a question close to the chunk that answers it."""
+    rng = np.random.default_rng(seed)
+    targets = vectors[rng.choice(len(vectors), count, replace=False)]
+    perturbation = normalize(rng.standard_normal(targets.shape).astype(np.float32))
+    return normalize(targets + noise * perturbation)
+
+
+def benchmark(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    k: int = DEFAULT_TOP_K,
+    nprobes: Sequence[int] = (1, 4, 8, 16, 32),
+    refine: int = DEFAULT_ANN_REFINE,
+    index: Optional[IVFPQIndex] = None,
+) -> List[dict]:
+    """
+    Recall@k and latency of the index against exact search, for several nprobe values.
+
+    Args:
+        vectors (np.ndarray): (n, d) normalized corpus vectors, ids are row numbers.
+        queries (np.ndarray): (q, d) normalized query vectors.
+        k (int): Results per query.
+        nprobes (Sequence[int]): nprobe values to measure.
+        refine (int): Re-ranking factor; 0 reports PQ scores without re-ranking.
+        index (IVFPQIndex): Trained index holding `vectors`. Built here if not given.
+
+    Returns:
+        List[dict]: e.g. [{"nprobe": 8, "recall": 0.97, "ms_per_query": 1.9, "exact_ms_per_query": 41.0}]
+    """
+    if index is None:
+        index = IVFPQIndex(vectors.shape[1])
+        index.train(vectors)
+        index.add(np.arange(len(vectors)), vectors)
+
+    start = time.perf_counter()
+    truth = [set(exact_search(vectors, query, k)[0].tolist()) for query in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    report = []
+    for nprobe in nprobes:
+        start = time.perf_counter()
+        found = [
+            index.search(query, k, nprobe=nprobe, vectors=vectors if refine else None, refine=refine or None)[0]
+            for query in queries
+        ]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        hits = sum(len(truth[i] & set(ids.tolist())) for i, ids in enumerate(found))
+        report.append({
+            "nprobe": nprobe,
+            "recall": round(hits / (k * len(queries)), 4),
+            "ms_per_query": round(elapsed_ms, 3),
+            "exact_ms_per_query": round(exact_ms, 3),
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k of the IVF-PQ index against exact search")
+    parser.add_argument("--vectors", type=int, default=200_000, help="corpus size")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--refine", type=int, default=DEFAULT_ANN_REFINE)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.vectors, args.dimension)
+    queries = synthetic_queries(vectors, args.queries)
+    start = time.perf_counter()
+    index = IVFPQIndex(args.dimension)
+    index.train(vectors)
+    index.add(np.arange(len(vectors)), vectors)
+    print(f"Built index: {len(index)} vectors, {index.nlist} lists, {time.perf_counter() - start:.1f}s")
+    for row in benchmark(vectors, queries, args.k, refine=args.refine, index=index):
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
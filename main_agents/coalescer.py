@@ -0,0 +1,165 @@
+"""
+Micro-batching of concurrent calls into one batched backend call.
+
+Sessions running in parallel each ask for one query embedding or one
+retrieval at a time. `MicroBatcher` holds the first request for at most
+`max_wait` seconds (or until `max_batch_size` requests are waiting), sends
+them all through one call of the batch function, and hands each caller its
+own result. A batch that fails fails every caller in it with the same error.
+
+Coroutines must use `acall`: a blocking `__call__` on the event loop holds
+the loop until its own batch returns, so no other request can join it.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Generic, List, Optional, TypeVar
+
+from .config import (
+    DEFAULT_COALESCE_MAX_BATCH,
+    DEFAULT_COALESCE_WINDOW,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+)
+from .resilience import DeadlineExceeded, call_deadline
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Collect concurrent requests and dispatch them in batches.
+
+    Args:
+        batch_fn (Callable[[List[T]], List[R]]): Processes a batch; returns one result per item, in order.
+        max_batch_size (int): Items per batch.
+        max_wait (float): Seconds the first item of a batch waits for others to join.
+        max_concurrent_batches (int): Batches in flight at once; the next batch keeps filling meanwhile.
+        name (str): Used in the dispatcher thread name and in logs.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[T]], List[R]],
+        max_batch_size: int = DEFAULT_COALESCE_MAX_BATCH,
+        max_wait: float = DEFAULT_COALESCE_WINDOW,
+        max_concurrent_batches: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+        name: str = "batcher",
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._slots = threading.BoundedSemaphore(max_concurrent_batches)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrent_batches, thread_name_prefix=f"{name}-batch"
+        )
+        self._lock = threading.Lock()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._batches = 0
+        self._items = 0
+
+    def _ensure_dispatcher(self) -> None:
+        with self._lock:
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._run, name=f"{self.name}-dispatcher", daemon=True)
+                self._dispatcher.start()
+
+    def submit(self, item: T) -> "concurrent.futures.Future[R]":
+        """Queue an item; the returned future resolves with its own result."""
+        future: "concurrent.futures.Future[R]" = concurrent.futures.Future()
+        self._queue.put((item, future))
+        self._ensure_dispatcher()
+        return future
+
+    def __call__(self, item: T) -> R:
+        """Submit an item and wait for its result, bounded by the session deadline."""
+        future = self.submit(item)
+        try:
+            return future.result(timeout=call_deadline(None).remaining())
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise DeadlineExceeded(f"{self.name}: no result before the deadline") from None
+
+    async def acall(self, item: T) -> R:
+        """
+        Submit an item and await its result, bounded by the session deadline.
+
+        The event loop stays free while the batch fills, so concurrent tool calls of
+        every session on the loop join the same batch. Cancelling the caller cancels
+        the item if its batch has not started.
+        """
+        future = self.submit(item)
+        timeout = asyncio.timeout(call_deadline(None).remaining())
+        try:
+            async with timeout:
+                return await asyncio.wrap_future(future)
+        except TimeoutError:
+            if not timeout.expired():
+                raise
+            future.cancel()
+            raise DeadlineExceeded(f"{self.name}: no result before the deadline") from None
+
+    def _collect(self) -> list:
+        """Block for the first item, then gather more until the batch is full or the window closes."""
+        batch = [self._queue.get()]
+        closes_at = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = closes_at - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            # Wait for a free slot first, so requests keep joining the next batch while all slots are busy
+            self._slots.acquire()
+            batch = [(item, future) for item, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                self._slots.release()
+                continue
+            with self._lock:
+                self._batches += 1
+                self._items += len(batch)
+            try:
+                self._executor.submit(self._dispatch, batch)
+            except RuntimeError as e:
+                # Interpreter shutdown: fail the waiting callers instead of leaving them blocked
+                self._slots.release()
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+
+    def _dispatch(self, batch: list) -> None:
+        try:
+            results = self.batch_fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name}: batch of {len(batch)} returned {len(results)} results")
+        except Exception as e:
+            logger.warning(f"{self.name}: batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "pending": self._queue.qsize(),
+            }
@@ -12,4 +12,73 @@ DEFAULT_TOP_K = 3
 DEFAULT_DISTANCE_THRESHOLD = 0.5
 DEFAULT_EMBEDDING_MODEL = "publishers/google/models/text-embedding-005"
 DEFAULT_EMBEDDING_REQUESTS_PER_MIN = 1000
+DEFAULT_EMBEDDING_DIMENSION = 768  # text-embedding-005
+DEFAULT_EMBEDDING_BATCH_SIZE = 100  # texts per embedding request
+# Words per embedding request: about 1.3 tokens per word keeps it under the 20,000-token request limit
+DEFAULT_EMBEDDING_BATCH_WORDS = 12_000
+DEFAULT_EMBEDDING_CACHE_MAX_BYTES = 1024 ** 3  # vector file size that triggers LRU compaction
 DEFAULT_CORPUS_NAME = "endpoint-documentation"
+DEFAULT_CORPUS_LIST_TTL = 60.0  # seconds a Vertex AI corpus listing is reused to resolve names and tags
+# Local retrieval backend ("vertex" uses the Vertex AI RAG corpus, "local" the on-disk ANN index)
+RETRIEVAL_BACKEND = os.environ.get("RETRIEVAL_BACKEND", "vertex")
+# Only files under this directory with one of these extensions can be added to a local corpus
+LOCAL_DOCS_DIR = os.environ.get("LOCAL_DOCS_DIR", os.path.dirname(os.path.abspath(__file__)))
+LOCAL_DOCS_EXTENSIONS = (".md", ".txt", ".rst", ".json", ".yaml", ".yml")
+DEFAULT_ANN_TRAIN_SIZE = 10_000  # chunks before the ANN index is built; below it search is exact
+DEFAULT_ANN_NPROBE = 16  # inverted lists scanned per query
+DEFAULT_ANN_REFINE = 10  # candidates re-ranked exactly per result
+DEFAULT_PQ_SUBVECTORS = 48  # bytes per vector in the index
+DEFAULT_COALESCE_WINDOW = 0.005  # seconds a query waits for concurrent queries to share its batch
+DEFAULT_COALESCE_MAX_BATCH = 64  # queries per coalesced batch
+DEFAULT_MERGE_MIN_OVERLAP_WORDS = 8  # repeated words that make two chunks of a source adjacent
+DEFAULT_DUPLICATE_SIMILARITY = 0.8  # share of a passage's shingles found in a better one that makes it a duplicate
+DEFAULT_FANOUT_TIMEOUT = 10.0  # seconds a multi-corpus rag_query waits before dropping slower corpora
+
+# Process pool for CPU-bound local work (index builds, batch search, column profiling, large queries)
+PROCESS_POOL_WORKERS = int(os.environ.get("PROCESS_POOL_WORKERS", max(1, (os.cpu_count() or 2) - 1)))  # 0 runs jobs inline
+DEFAULT_PROGRESS_INTERVAL = 0.5  # seconds between progress reports of a job
+DEFAULT_OFFLOAD_MIN_BATCH = 32  # coalesced queries before an indexed search is split across the pool
+DEFAULT_OFFLOAD_MIN_ROWS = 100_000  # rows a query visits (query guard estimate) before it runs in the pool
+
+
+
+def _per_model(variable: str, defaults: dict) -> dict:
+    """Per-model values from an env variable like "gemini-2.5-flash=300,text-embedding-005=1000"."""
+    values = dict(defaults)
+    for item in os.environ.get(variable, "").split(","):
+        model, _, value = item.partition("=")
+        if model.strip() and value.strip():
+            values[model.strip()] = float(value)
+    return values
+
+
+# Client-side rate limiting (shared by every Gemini instance and rag_query in the process)
+DEFAULT_MODEL_REQUESTS_PER_MIN = float(os.environ.get("DEFAULT_MODEL_REQUESTS_PER_MIN", 60))
+# Requests a model takes at once before the sustained rate applies: one agent turn calls the
+# root agent, a sub-agent and several tools back to back, which must not queue behind each other
+DEFAULT_MODEL_BURST = float(os.environ.get("DEFAULT_MODEL_BURST", 10))
+DEFAULT_MAX_CONCURRENT_REQUESTS = 8
+DEFAULT_MIN_CONCURRENT_REQUESTS = 1
+MODEL_REQUESTS_PER_MIN = _per_model("MODEL_REQUESTS_PER_MIN", {
+    "gemini-2.5-flash": DEFAULT_MODEL_REQUESTS_PER_MIN,
+    DEFAULT_EMBEDDING_MODEL: DEFAULT_EMBEDDING_REQUESTS_PER_MIN,
+})
+MODEL_BURST = _per_model("MODEL_BURST", {
+    DEFAULT_EMBEDDING_MODEL: DEFAULT_EMBEDDING_REQUESTS_PER_MIN / 60,  # one second of budget
+})
+
+# Deadlines, retries and circuit breaking
+DEFAULT_SESSION_TIMEOUT = 300.0  # seconds for a whole run_session call
+DEFAULT_EVENT_QUEUE_SIZE = 100  # events buffered by stream_session before the agent waits for the consumer
+DEFAULT_CALL_TIMEOUT = 60.0  # seconds for a single model or retrieval call, retries included
+DEFAULT_RETRY_ATTEMPTS = 4
+DEFAULT_RETRY_INITIAL_DELAY = 1.0
+DEFAULT_RETRY_MAX_DELAY = 8.0
+DEFAULT_BREAKER_FAILURE_THRESHOLD = 5
+DEFAULT_BREAKER_RESET_TIMEOUT = 30.0
+DEFAULT_RAG_HEDGE_AFTER = None  # seconds before a duplicate retrieval is sent; None disables hedging
+
+# HTTP test execution
+DEFAULT_HTTP_MAX_CONNECTIONS = 100
+DEFAULT_HTTP_PER_HOST_LIMIT = 10
+DEFAULT_HTTP_TIMEOUT = 30.0
@@ -0,0 +1,178 @@
+"""
+Post-retrieval merging of overlapping and near-duplicate contexts.
+
+Chunks are cut with an overlap, so a retrieval often returns neighbouring
+chunks of one source whose text repeats. `merge_contexts` groups contexts by
+corpus and `source_uri`, stitches chunks whose words overlap (the end of one is the start
+of the other, or one contains the other) into a single passage, and then drops
+passages that are near-duplicates of a better one: most of their word
+shingles already appear in it. Containment rather than Jaccard similarity, so a
+chunk is still caught when the better passage is a longer merged one. Each passage keeps the best score of the chunks it absorbed.
+
+Retrieval results carry no offsets, so overlaps are found on the text itself.
+"""
+
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from .config import (
+    DEFAULT_DUPLICATE_SIMILARITY,
+    DEFAULT_MERGE_MIN_OVERLAP_WORDS,
+)
+
+# Words per shingle for near-duplicate detection
+_SHINGLE_WORDS = 5
+_WORD = re.compile(r"\S+")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count, in words (as `chunk_text` counts chunk sizes)."""
+    return len(text.split())
+
+
+def _shingles(words: Sequence[str]) -> set:
+    if len(words) < _SHINGLE_WORDS:
+        return {tuple(words)}
+    return {tuple(words[i:i + _SHINGLE_WORDS]) for i in range(len(words) - _SHINGLE_WORDS + 1)}
+
+
+def _suffix_prefix_overlap(first: List[str], second: List[str], min_words: int) -> int:
+    """Words at the end of `first` that are repeated at the start of `second` (0 if fewer than min_words)."""
+    if not second:
+        return 0
+    head = second[0]
+    for start in range(max(0, len(first) - len(second)), len(first) - min_words + 1):
+        if first[start] == head and first[start:] == second[:len(first) - start]:
+            return len(first) - start
+    return 0
+
+
+def _contains(outer: List[str], inner: List[str]) -> bool:
+    return len(inner) <= len(outer) and f" {' '.join(inner)} " in f" {' '.join(outer)} "
+
+
+def _text_after(text: str, words: int) -> str:
+    """Text of `text` after its first `words` words, keeping the original spacing and newlines."""
+    for index, match in enumerate(_WORD.finditer(text)):
+        if index == words:
+            return text[match.start():]
+    return ""
+
+
+class _Passage:
+    __slots__ = ("result", "text", "words", "score", "chunks")
+
+    def __init__(self, result: dict):
+        self.result = result
+        self.text = result.get("text", "") or ""
+        self.words = self.text.split()
+        self.score = result.get("score", 0.0)
+        self.chunks = 1
+
+    def absorb(self, other: "_Passage", text: str) -> None:
+        self.text = text
+        self.words = text.split()
+        self.score = _best(self.score, other.score)
+        self.chunks += other.chunks
+
+
+def _best(first: Optional[float], second: Optional[float]) -> Optional[float]:
+    # Scores are vector distances: lower is better
+    if first is None:
+        return second
+    if second is None:
+        return first
+    return min(first, second)
+
+
+def _merge_pair(first: _Passage, second: _Passage, min_words: int) -> Optional[str]:
+    """Merged text of two passages of the same source, or None if they don't overlap."""
+    if _contains(first.words, second.words):
+        return first.text
+    if _contains(second.words, first.words):
+        return second.text
+    overlap = _suffix_prefix_overlap(first.words, second.words, min_words)
+    if overlap:
+        return first.text.rstrip() + " " + _text_after(second.text, overlap)
+    overlap = _suffix_prefix_overlap(second.words, first.words, min_words)
+    if overlap:
+        return second.text.rstrip() + " " + _text_after(first.text, overlap)
+    return None
+
+
+def _covered(shingles: set, kept: set) -> float:
+    """Share of a passage's shingles already present in a kept passage."""
+    if not shingles:
+        return 1.0
+    return len(shingles & kept) / len(shingles)
+
+
+def merge_contexts(
+    results: List[dict],
+    min_overlap_words: int = DEFAULT_MERGE_MIN_OVERLAP_WORDS,
+    duplicate_similarity: float = DEFAULT_DUPLICATE_SIMILARITY,
+) -> Tuple[List[dict], dict]:
+    """
+    Merge overlapping chunks per source and drop near-duplicate passages.
+
+    Args:
+        results (List[dict]): Contexts as returned by retrieval, with "source_uri", "text" and "score"
+                              (a distance: lower is better), and "corpus_name" when several corpora
+                              were queried.
+        min_overlap_words (int): Shortest word overlap that counts as adjacent chunks.
+        duplicate_similarity (float): Share of a passage's shingles found in a better passage above which it
+                                      is dropped.
+
+    Returns:
+        Tuple[List[dict], dict]: Passages sorted by score, each with a "merged_chunks" count, and
+            token stats, e.g. {"contexts": 5, "passages": 2, "tokens_retrieved": 1800, "tokens_returned": 950}
+    """
+    # The same source can be indexed in two corpora, e.g. two versions of one service's docs
+    groups = {}
+    for result in results:
+        key = (result.get("corpus_name", ""), result.get("source_uri", ""))
+        groups.setdefault(key, []).append(_Passage(result))
+
+    passages = []
+    for group in groups.values():
+        merged = True
+        while merged and len(group) > 1:
+            merged = False
+            for i in range(len(group)):
+                for j in range(i + 1, len(group)):
+                    text = _merge_pair(group[i], group[j], min_overlap_words)
+                    if text is not None:
+                        group[i].absorb(group[j], text)
+                        del group[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        passages.extend(group)
+
+    # Best passages first; a passage too similar to one already kept is dropped (across sources too)
+    passages.sort(key=lambda passage: float("inf") if passage.score is None else passage.score)
+    kept, kept_shingles = [], []
+    for passage in passages:
+        shingles = _shingles(passage.words)
+        if any(_covered(shingles, other) >= duplicate_similarity for other in kept_shingles):
+            continue
+        kept.append(passage)
+        kept_shingles.append(shingles)
+
+    merged_results = [
+        {
+            **passage.result,
+            "text": passage.text,
+            "score": passage.score,
+            "merged_chunks": passage.chunks,
+        }
+        for passage in kept
+    ]
+    stats = {
+        "contexts": len(results),
+        "passages": len(merged_results),
+        "tokens_retrieved": sum(count_tokens(result.get("text", "") or "") for result in results),
+        "tokens_returned": sum(count_tokens(result["text"]) for result in merged_results),
+    }
+    return merged_results, stats
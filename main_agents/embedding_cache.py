@@ -0,0 +1,324 @@
+"""
+On-disk embedding cache keyed by a hash of the embedded text.
+
+Vectors live in an append-only float32 file that is memory-mapped on open, so
+loading the cache costs nothing and the OS page cache shares it between
+worker processes. A small SQLite index maps each content hash to its row in
+the vector file. When the file grows past `max_bytes`, the least recently
+used vectors are dropped by rewriting the live rows into a new file
+generation; readers notice the new generation on their next lookup.
+"""
+
+import contextlib
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from .config import (
+    DEFAULT_EMBEDDING_CACHE_MAX_BYTES,
+    DEFAULT_EMBEDDING_DIMENSION,
+    DEFAULT_EMBEDDING_MODEL,
+)
+
+logger = logging.getLogger(__name__)
+
+# Fraction of max_bytes kept after a compaction, so the next one isn't immediate
+_COMPACT_TARGET = 0.75
+# Pending "last used" updates written to the index in one transaction
+_TOUCH_BATCH_SIZE = 1000
+# SQLite host parameters per "IN (...)" lookup
+_LOOKUP_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key BLOB PRIMARY KEY,
+    slot INTEGER NOT NULL,
+    last_used REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (name, value) VALUES ('generation', 0), ('rows', 0);
+"""
+
+
+def _default_cache_dir() -> str:
+    """Cache directory next to the agents package."""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache")
+
+
+def content_hash(text: str, model: str = DEFAULT_EMBEDDING_MODEL, task_type: str = "") -> bytes:
+    """
+    Cache key of a text. The model and task type are part of the key, since the
+    same text embeds differently under each.
+
+    Returns:
+        bytes: 16-byte digest.
+    """
+    return hashlib.blake2b(f"{model}\0{task_type}\0{text}".encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """
+    Memory-mapped float32 vectors plus a hash-to-row index.
+
+    Several processes may open the same directory. Appends and compactions are
+    serialized by SQLite's write lock; processes opened with `read_only=True`
+    never write, not even the "last used" timestamps that drive eviction.
+
+    Args:
+        directory (str): Where the vector files and the index live. Created if missing.
+        dimension (int): Length of every vector.
+        max_bytes (int): Size of the vector file that triggers a compaction. None disables eviction.
+        read_only (bool): Open for lookups only, e.g. in worker processes.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        dimension: int = DEFAULT_EMBEDDING_DIMENSION,
+        max_bytes: Optional[int] = DEFAULT_EMBEDDING_CACHE_MAX_BYTES,
+        read_only: bool = False,
+    ):
+        self.directory = directory or _default_cache_dir()
+        self.dimension = dimension
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.row_bytes = dimension * np.dtype(np.float32).itemsize
+        self._lock = threading.RLock()
+        self._touched: Dict[bytes, float] = {}
+        self._generation = None
+        self._vectors = None
+        self._hits = 0
+        self._misses = 0
+
+        index_path = os.path.join(self.directory, f"index-{dimension}.db")
+        if read_only:
+            self.index = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True, check_same_thread=False, isolation_level=None)
+        else:
+            os.makedirs(self.directory, exist_ok=True)
+            self.index = sqlite3.connect(index_path, check_same_thread=False, isolation_level=None, timeout=30)
+            self.index.execute("PRAGMA journal_mode=WAL")
+            self.index.execute("PRAGMA synchronous=NORMAL")
+            self.index.executescript(_SCHEMA)
+
+    def _vector_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"vectors-{self.dimension}-{generation}.f32")
+
+    def _meta(self, name: str) -> int:
+        return self.index.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()[0]
+
+    def _mapped(self, generation: int, rows: int) -> np.ndarray:
+        """Memory map of the vector file, reopened after a compaction or when it has grown."""
+        if self._generation != generation or self._vectors is None or len(self._vectors) < rows:
+            path = self._vector_path(generation)
+            available = os.path.getsize(path) // self.row_bytes if os.path.exists(path) else 0
+            if available == 0:
+                self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+            else:
+                self._vectors = np.memmap(path, dtype=np.float32, mode="r", shape=(available, self.dimension))
+            self._generation = generation
+        return self._vectors
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.index.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _slots(self, keys: List[bytes]) -> tuple:
+        """Current generation and the slot of every cached key, read in one transaction."""
+        slots = {}
+        self.index.execute("BEGIN")
+        try:
+            generation = self._meta("generation")
+            for start in range(0, len(keys), _LOOKUP_BATCH_SIZE):
+                batch = keys[start:start + _LOOKUP_BATCH_SIZE]
+                placeholders = ", ".join("?" for _ in batch)
+                slots.update(self.index.execute(
+                    f"SELECT key, slot FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall())
+        finally:
+            self.index.execute("COMMIT")
+        return generation, slots
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Look up vectors by key.
+
+        Args:
+            keys (Sequence[bytes]): Keys from `content_hash`.
+
+        Returns:
+            Dict[bytes, np.ndarray]: Vectors found, as read-only views into the memory map.
+        """
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for attempt in range(2):
+                generation, slots = self._slots(unique)
+                rows = max(slots.values()) + 1 if slots else 0
+                vectors = self._mapped(generation, rows)
+                if len(vectors) >= rows:
+                    break
+                # Another process compacted the cache between the lookup and the mapping
+                self._vectors = None
+            for key, slot in slots.items():
+                if slot < len(vectors):
+                    found[key] = vectors[slot]
+            self._hits += len(found)
+            self._misses += len(unique) - len(found)
+
+            if not self.read_only and found:
+                now = time.time()
+                self._touched.update(dict.fromkeys(found, now))
+                if len(self._touched) >= _TOUCH_BATCH_SIZE:
+                    self._flush_touched()
+        return found
+
+    def get(self, key: bytes) -> Optional[np.ndarray]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, keys: Sequence[bytes], vectors: Iterable[Sequence[float]]) -> None:
+        """
+        Append vectors to the file and index them. Keys already cached are skipped.
+
+        Args:
+            keys (Sequence[bytes]): Keys from `content_hash`.
+            vectors (Iterable[Sequence[float]]): One vector of `dimension` floats per key.
+        """
+        if self.read_only:
+            raise PermissionError("Embedding cache opened read-only")
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if len(matrix) != len(keys):
+            raise ValueError(f"Got {len(keys)} keys for {len(matrix)} vectors")
+
+        with self._lock:
+            self._flush_touched()
+            # BEGIN IMMEDIATE takes the write lock: no other process appends until COMMIT
+            self.index.execute("BEGIN IMMEDIATE")
+            try:
+                existing = set()
+                for start in range(0, len(keys), _LOOKUP_BATCH_SIZE):
+                    batch = list(keys[start:start + _LOOKUP_BATCH_SIZE])
+                    placeholders = ", ".join("?" for _ in batch)
+                    existing.update(key for (key,) in self.index.execute(
+                        f"SELECT key FROM entries WHERE key IN ({placeholders})", batch
+                    ))
+                new = {}
+                for position, key in enumerate(keys):
+                    if key not in existing and key not in new:
+                        new[key] = position
+                if not new:
+                    self.index.execute("COMMIT")
+                    return
+
+                generation = self._meta("generation")
+                first_slot = self._meta("rows")
+                with open(self._vector_path(generation), "r+b" if first_slot else "wb") as vector_file:
+                    # Rows past the indexed count are leftovers of an interrupted append
+                    vector_file.truncate(first_slot * self.row_bytes)
+                    vector_file.seek(first_slot * self.row_bytes)
+                    vector_file.write(matrix[list(new.values())].tobytes())
+                now = time.time()
+                self.index.executemany(
+                    "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(key, first_slot + offset, now) for offset, key in enumerate(new)],
+                )
+                self.index.execute("UPDATE meta SET value = ? WHERE name = 'rows'", (first_slot + len(new),))
+                self.index.execute("COMMIT")
+            except BaseException:
+                self.index.execute("ROLLBACK")
+                raise
+
+            if self.max_bytes is not None and (first_slot + len(new)) * self.row_bytes > self.max_bytes:
+                self.compact()
+
+    def put(self, key: bytes, vector: Sequence[float]) -> None:
+        self.put_many([key], [vector])
+
+    def _flush_touched(self) -> None:
+        if not self._touched:
+            return
+        touched = list(self._touched.items())
+        self._touched.clear()
+        self.index.execute("BEGIN IMMEDIATE")
+        self.index.executemany(
+            "UPDATE entries SET last_used = MAX(last_used, ?) WHERE key = ?",
+            [(last_used, key) for key, last_used in touched],
+        )
+        self.index.execute("COMMIT")
+
+    def compact(self, max_bytes: Optional[int] = None) -> dict:
+        """
+        Rewrite the cache keeping only the most recently used vectors that fit in
+        a fraction of `max_bytes`. The live rows go to a new file generation, so
+        processes still reading the old file are unaffected until their next lookup.
+
+        Returns:
+            dict: e.g. {"kept": 9000, "evicted": 3000, "bytes": 27648000}
+        """
+        if self.read_only:
+            raise PermissionError("Embedding cache opened read-only")
+        max_bytes = max_bytes or self.max_bytes
+        keep = len(self) if max_bytes is None else int(max_bytes * _COMPACT_TARGET) // self.row_bytes
+
+        with self._lock:
+            self._flush_touched()
+            self.index.execute("BEGIN IMMEDIATE")
+            try:
+                generation = self._meta("generation")
+                rows = self._meta("rows")
+                survivors = self.index.execute(
+                    "SELECT key, slot, last_used FROM entries ORDER BY last_used DESC LIMIT ?", (keep,)
+                ).fetchall()
+                vectors = self._mapped(generation, rows)
+                # Keep the file order of the survivors so the copy reads the old file sequentially
+                survivors.sort(key=lambda entry: entry[1])
+                new_generation = generation + 1
+                path = self._vector_path(new_generation)
+                with open(path, "wb") as vector_file:
+                    if survivors:
+                        vector_file.write(vectors[[slot for _, slot, _ in survivors]].tobytes())
+                self.index.execute("DELETE FROM entries")
+                self.index.executemany(
+                    "INSERT INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(key, new_slot, last_used) for new_slot, (key, _, last_used) in enumerate(survivors)],
+                )
+                self.index.execute("UPDATE meta SET value = ? WHERE name = 'generation'", (new_generation,))
+                self.index.execute("UPDATE meta SET value = ? WHERE name = 'rows'", (len(survivors),))
+                self.index.execute("COMMIT")
+            except BaseException:
+                self.index.execute("ROLLBACK")
+                raise
+
+            self._vectors = None
+            # On POSIX, processes that still map the old file keep reading it until they unmap it
+            with contextlib.suppress(OSError):
+                os.remove(self._vector_path(generation))
+
+        stats = {"kept": len(survivors), "evicted": rows - len(survivors), "bytes": len(survivors) * self.row_bytes}
+        logger.info(f"Embedding cache compacted: {stats}")
+        return stats
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self),
+                "bytes": self._meta("rows") * self.row_bytes,
+                "generation": self._meta("generation"),
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if not self.read_only:
+                self._flush_touched()
+            self._vectors = None
+            self.index.close()
@@ -0,0 +1,125 @@
+"""
+Text embeddings through DEFAULT_EMBEDDING_MODEL, with an on-disk cache.
+
+Only texts missing from the cache are sent to Vertex AI, in batches of at most
+DEFAULT_EMBEDDING_BATCH_SIZE texts and DEFAULT_EMBEDDING_BATCH_WORDS words, through the shared rate limiter and the
+retry/circuit-breaker policy used by the other backend calls.
+"""
+
+import threading
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import (
+    DEFAULT_EMBEDDING_BATCH_SIZE,
+    DEFAULT_EMBEDDING_BATCH_WORDS,
+    DEFAULT_EMBEDDING_MODEL,
+)
+from .context_merge import count_tokens
+from .embedding_cache import EmbeddingCache, content_hash
+from .rate_limiter import get_rate_limiter, is_rate_limit_error
+from .resilience import call_with_retries
+
+# Task types understood by text-embedding-005
+RETRIEVAL_DOCUMENT = "RETRIEVAL_DOCUMENT"
+RETRIEVAL_QUERY = "RETRIEVAL_QUERY"
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+_models = {}
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide embedding cache, opened on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
+
+
+def _model(model: str):
+    from vertexai.language_models import TextEmbeddingModel
+
+    if model not in _models:
+        # from_pretrained expects the short name, e.g. "text-embedding-005"
+        _models[model] = TextEmbeddingModel.from_pretrained(model.split("/")[-1])
+    return _models[model]
+
+
+def _embed_batch(texts: List[str], model: str, task_type: str) -> List[List[float]]:
+    from vertexai.language_models import TextEmbeddingInput
+
+    limiter = get_rate_limiter(model)
+    inputs = [TextEmbeddingInput(text, task_type) for text in texts]
+
+    def embed():
+        with limiter.limit():
+            try:
+                embeddings = _model(model).get_embeddings(inputs)
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    limiter.record_throttle()
+                raise
+        limiter.record_success()
+        return [embedding.values for embedding in embeddings]
+
+    return call_with_retries(embed, backend="vertex_embeddings")
+
+
+def _batches(pending: List[Tuple[str, str]]) -> Iterator[List[Tuple[str, str]]]:
+    """Split (key, text) pairs into requests within the text count and the word budget."""
+    batch, words = [], 0
+    for key, text in pending:
+        size = count_tokens(text)
+        # A text over the budget on its own still gets a request of its own
+        if batch and (len(batch) == DEFAULT_EMBEDDING_BATCH_SIZE or words + size > DEFAULT_EMBEDDING_BATCH_WORDS):
+            yield batch
+            batch, words = [], 0
+        batch.append((key, text))
+        words += size
+    if batch:
+        yield batch
+
+
+def embed_texts(
+    texts: Sequence[str],
+    task_type: str = RETRIEVAL_DOCUMENT,
+    model: str = DEFAULT_EMBEDDING_MODEL,
+    cache: Optional[EmbeddingCache] = None,
+) -> np.ndarray:
+    """
+    Embed texts, reusing cached vectors for any text embedded before.
+
+    Args:
+        texts (Sequence[str]): Chunks or queries to embed.
+        task_type (str): RETRIEVAL_DOCUMENT for chunks, RETRIEVAL_QUERY for queries.
+        model (str): Embedding model.
+        cache (EmbeddingCache): Cache to use. Defaults to the process-wide cache.
+
+    Returns:
+        np.ndarray: float32 matrix with one row per text, in the same order.
+    """
+    # An empty cache is falsy (it has a length), so test for None
+    cache = cache if cache is not None else get_embedding_cache()
+    keys = [content_hash(text, model, task_type) for text in texts]
+    cached = cache.get_many(keys)
+
+    # Identical texts are embedded once
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+    if missing:
+        for batch in _batches(list(missing.items())):
+            vectors = _embed_batch([text for _, text in batch], model, task_type)
+            batch_keys = [key for key, _ in batch]
+            if not cache.read_only:
+                cache.put_many(batch_keys, vectors)
+            cached.update(zip(batch_keys, np.asarray(vectors, dtype=np.float32)))
+
+    matrix = np.empty((len(texts), cache.dimension), dtype=np.float32)
+    for row, key in enumerate(keys):
+        matrix[row] = cached[key]
+    return matrix
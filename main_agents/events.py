@@ -0,0 +1,146 @@
+"""
+Typed events for streaming an agent session, and per-query latency metrics.
+
+ADK events mix model text, tool calls, tool responses and errors in one
+`Event` type. `translate()` splits each one into `SessionEvent`s that a
+consumer (a web UI, a batch runner) can dispatch on `type` without digging
+through `content.parts`. `QueryMetrics` tracks how quickly a query produced
+its first event and its final answer.
+"""
+
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, List, Optional
+
+QUERY_START = "query_start"
+TOOL_CALL_START = "tool_call_start"
+TOOL_CALL_END = "tool_call_end"
+PARTIAL_TEXT = "partial_text"
+FINAL_ANSWER = "final_answer"
+ERROR = "error"
+QUERY_END = "query_end"
+
+
+@dataclass
+class SessionEvent:
+    """
+    One typed event from a session.
+
+    Args:
+        type (str): One of QUERY_START, TOOL_CALL_START, TOOL_CALL_END, PARTIAL_TEXT, FINAL_ANSWER,
+            ERROR, QUERY_END.
+        query (str): User query that produced the event.
+        author (str): Agent that produced the event, e.g. "root_agent".
+        elapsed (float): Seconds between sending the query and the event arriving from the runner.
+        text (str): Model text for PARTIAL_TEXT and FINAL_ANSWER, error message for ERROR.
+        tool (str): Tool name for TOOL_CALL_START and TOOL_CALL_END.
+        call_id (str): Function call id, shared by the start and end events of one tool call.
+        data (dict): Tool arguments or response, error details, or the query metrics for QUERY_END.
+        exception (Exception): Exception that ended the stream, for ERROR events raised locally.
+    """
+
+    type: str
+    query: str
+    author: str = ""
+    elapsed: float = 0.0
+    text: Optional[str] = None
+    tool: Optional[str] = None
+    call_id: Optional[str] = None
+    data: Optional[dict] = None
+    exception: Optional[BaseException] = field(default=None, repr=False)
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form (without the exception object)."""
+        event = asdict(self)
+        event.pop("exception")
+        return {key: value for key, value in event.items() if value is not None}
+
+
+@dataclass
+class QueryMetrics:
+    """
+    Responsiveness of one query, measured when events arrive from the runner
+    (not when the consumer reads them, so a slow consumer doesn't skew them).
+
+    Args:
+        query (str): User query.
+        started_at (float): time.monotonic() when the query was sent.
+    """
+
+    query: str
+    started_at: float = field(default_factory=time.monotonic)
+    time_to_first_event: Optional[float] = None
+    time_to_final_answer: Optional[float] = None
+    total_time: Optional[float] = None
+    events: int = 0
+    tool_calls: int = 0
+    errors: int = 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def observe(self, event: SessionEvent) -> None:
+        self.events += 1
+        if self.time_to_first_event is None:
+            self.time_to_first_event = event.elapsed
+        if event.type == TOOL_CALL_START:
+            self.tool_calls += 1
+        elif event.type == FINAL_ANSWER and self.time_to_final_answer is None:
+            self.time_to_final_answer = event.elapsed
+        elif event.type == ERROR:
+            self.errors += 1
+
+    def finish(self) -> None:
+        self.total_time = self.elapsed()
+
+    def to_dict(self) -> dict:
+        metrics = asdict(self)
+        metrics.pop("started_at")
+        for key in ("time_to_first_event", "time_to_final_answer", "total_time"):
+            if metrics[key] is not None:
+                metrics[key] = round(metrics[key], 4)
+        return metrics
+
+
+def _text(event: Any) -> Optional[str]:
+    parts = event.content.parts if event.content and event.content.parts else []
+    text = "".join(part.text for part in parts if getattr(part, "text", None) and not getattr(part, "thought", False))
+    # The model sometimes answers the literal string "None"
+    return text if text and text != "None" else None
+
+
+def translate(event: Any, query: str, elapsed: float) -> List[SessionEvent]:
+    """
+    Split an ADK event into typed session events.
+
+    Args:
+        event (google.adk.events.Event): Event yielded by `Runner.run_async`.
+        query (str): User query being processed.
+        elapsed (float): Seconds since the query was sent.
+
+    Returns:
+        List[SessionEvent]: Zero or more events, in the order they appear in the ADK event.
+    """
+    author = event.author or ""
+    events = []
+    if event.error_code or event.error_message:
+        events.append(SessionEvent(
+            ERROR, query, author, elapsed,
+            text=event.error_message or event.error_code,
+            data={"error_code": event.error_code},
+        ))
+    for call in event.get_function_calls():
+        events.append(SessionEvent(
+            TOOL_CALL_START, query, author, elapsed,
+            tool=call.name, call_id=call.id, data={"args": dict(call.args or {})},
+        ))
+    for response in event.get_function_responses():
+        events.append(SessionEvent(
+            TOOL_CALL_END, query, author, elapsed,
+            tool=response.name, call_id=response.id, data={"response": response.response},
+        ))
+    text = _text(event)
+    if text:
+        final = not event.partial and event.is_final_response()
+        events.append(SessionEvent(FINAL_ANSWER if final else PARTIAL_TEXT, query, author, elapsed, text=text))
+    return events
@@ -0,0 +1,314 @@
+"""
+Concurrent execution engine for the API test cases produced by the agents.
+
+Test cases are sent over one pooled keep-alive `httpx.AsyncClient`, with a
+global connection limit plus a per-host concurrency limit, and each response
+is validated against the expectations declared in the case.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Iterable, Optional, Union
+from urllib.parse import urlsplit
+
+import httpx
+
+from utils.results_store import current_run_id, get_results_store
+
+from .config import (
+    DEFAULT_HTTP_MAX_CONNECTIONS,
+    DEFAULT_HTTP_PER_HOST_LIMIT,
+    DEFAULT_HTTP_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Characters of the response body kept in each result
+_BODY_EXCERPT_CHARS = 500
+
+
+@dataclass
+class ApiTestCase:
+    """A single HTTP request plus the expectations used to validate its response."""
+
+    method: str
+    url: str
+    name: str = ""
+    headers: dict = field(default_factory=dict)
+    params: dict = field(default_factory=dict)
+    body: Any = None
+    expected_status: Union[int, list, None] = None
+    expected_fields: list = field(default_factory=list)
+    timeout: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ApiTestCase":
+        """
+        Build a test case from the JSON object an agent produced, ignoring unknown keys.
+
+        Header and query parameter values are sent as text: numbers and booleans are
+        converted (e.g. 5 -> "5", true -> "true"), nested values are serialized to JSON
+        and null values are dropped.
+
+        Raises:
+            ValueError: The case is not an object, or its headers or params are not objects.
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"Test case must be an object, got {type(data).__name__}")
+        known = {key: data[key] for key in cls.__dataclass_fields__ if key in data}
+        known["method"] = str(known.get("method", "GET")).upper()
+        known["url"] = str(known.get("url", ""))
+        for key in ("headers", "params"):
+            if key in known:
+                known[key] = _text_values(key, known[key])
+        return cls(**known)
+
+
+def _text_values(key: str, values: Any) -> dict:
+    if values is None:
+        return {}
+    if not isinstance(values, dict):
+        raise ValueError(f"'{key}' must be an object, got {type(values).__name__}")
+    return {
+        str(name): value if isinstance(value, str) else json.dumps(value)
+        for name, value in values.items()
+        if value is not None
+    }
+
+
+@dataclass
+class ApiTestResult:
+    """Outcome of one executed test case."""
+
+    name: str
+    method: str
+    url: str
+    status_code: Optional[int]
+    latency_ms: float
+    passed: bool
+    errors: list = field(default_factory=list)
+    response_excerpt: str = ""
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def validate_response(case: ApiTestCase, response: httpx.Response) -> list[str]:
+    """
+    Check a response against the case expectations.
+
+    Returns:
+        list[str]: Validation errors; empty if the response is as expected.
+    """
+    errors = []
+    if case.expected_status is not None:
+        expected = case.expected_status if isinstance(case.expected_status, list) else [case.expected_status]
+        if response.status_code not in expected:
+            errors.append(f"Expected status {expected}, got {response.status_code}")
+    elif response.status_code >= 400:
+        errors.append(f"Unexpected error status {response.status_code}")
+
+    if case.expected_fields:
+        try:
+            payload = response.json()
+        except ValueError:
+            errors.append("Response body is not valid JSON")
+            return errors
+        if isinstance(payload, list):
+            payload = payload[0] if payload else {}
+        if not isinstance(payload, dict):
+            errors.append("Response body is not a JSON object")
+            return errors
+        missing = [name for name in case.expected_fields if name not in payload]
+        if missing:
+            errors.append(f"Missing fields in response: {missing}")
+    return errors
+
+
+class ApiTestExecutor:
+    """
+    Runs test cases concurrently over a pooled keep-alive HTTP client.
+
+    Use as an async context manager so the connection pool is closed afterwards:
+
+        async with ApiTestExecutor() as executor:
+            results = await executor.run(cases)
+
+    Args:
+        max_connections (int): Total connections kept by the pool.
+        per_host_limit (int): Requests in flight at once against a single host.
+        timeout (float): Default timeout in seconds for each request.
+        transport (httpx.AsyncBaseTransport): Optional transport, e.g. httpx.MockTransport for stubs.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_HTTP_MAX_CONNECTIONS,
+        per_host_limit: int = DEFAULT_HTTP_PER_HOST_LIMIT,
+        timeout: float = DEFAULT_HTTP_TIMEOUT,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=timeout,
+            transport=transport,
+        )
+        self._host_limits: dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> "ApiTestExecutor":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    async def execute(self, case: ApiTestCase) -> ApiTestResult:
+        """Send one test case and validate its response. Never raises: any error fails the case."""
+        name = case.name or f"{case.method} {case.url}"
+        start = time.perf_counter()
+        try:
+            request_kwargs = {"headers": case.headers, "params": case.params or None}
+            if case.body is not None:
+                if isinstance(case.body, (dict, list)):
+                    request_kwargs["json"] = case.body
+                else:
+                    request_kwargs["content"] = str(case.body)
+
+            async with self._host_limit(case.url):
+                start = time.perf_counter()
+                response = await self._client.request(
+                    case.method,
+                    case.url,
+                    timeout=case.timeout or self.timeout,
+                    **request_kwargs,
+                )
+                latency_ms = (time.perf_counter() - start) * 1000
+
+            errors = validate_response(case, response)
+            return ApiTestResult(
+                name=name,
+                method=case.method,
+                url=case.url,
+                status_code=response.status_code,
+                latency_ms=round(latency_ms, 3),
+                passed=not errors,
+                errors=errors,
+                response_excerpt=response.text[:_BODY_EXCERPT_CHARS],
+            )
+        except Exception as e:
+            # Request errors, but also a case httpx rejects (e.g. an invalid URL or header):
+            # one bad case must not fail the whole batch
+            latency_ms = (time.perf_counter() - start) * 1000
+            return ApiTestResult(
+                name=name,
+                method=case.method,
+                url=case.url,
+                status_code=None,
+                latency_ms=round(latency_ms, 3),
+                passed=False,
+                errors=[f"{type(e).__name__}: {e}"],
+            )
+
+    async def run(self, cases: Iterable[ApiTestCase]) -> list[ApiTestResult]:
+        """Run all cases concurrently and return the results in input order."""
+        return await asyncio.gather(*(self.execute(case) for case in cases))
+
+    async def run_stream(self, cases: Iterable[ApiTestCase]) -> AsyncIterator[ApiTestResult]:
+        """Run all cases concurrently and yield each result as soon as it completes."""
+        for next_result in asyncio.as_completed([self.execute(case) for case in cases]):
+            yield await next_result
+
+
+def _invalid_case_result(data: Any, error: Exception) -> ApiTestResult:
+    data = data if isinstance(data, dict) else {}
+    method = str(data.get("method", "GET")).upper()
+    url = str(data.get("url", ""))
+    return ApiTestResult(
+        name=str(data.get("name") or f"{method} {url}"),
+        method=method,
+        url=url,
+        status_code=None,
+        latency_ms=0.0,
+        passed=False,
+        errors=[f"Invalid test case: {error}"],
+    )
+
+
+def summarize_results(results: list[ApiTestResult]) -> dict:
+    """Counts and latency figures for a batch of results."""
+    latencies = sorted(result.latency_ms for result in results)
+    passed = sum(1 for result in results if result.passed)
+    return {
+        "total": len(results),
+        "passed": passed,
+        "failed": len(results) - passed,
+        "p50_latency_ms": latencies[len(latencies) // 2] if latencies else None,
+        "max_latency_ms": latencies[-1] if latencies else None,
+    }
+
+
+async def execute_test_cases(test_cases: list[dict]) -> dict:
+    """
+    Execute API test cases concurrently and report status, latency and validation per case.
+
+    Args:
+        test_cases (list[dict]): Test cases, each with "method", "url" and optionally "name",
+                                 "headers", "params", "body", "expected_status" (int or list)
+                                 and "expected_fields" (top-level keys expected in the JSON response).
+                                 e.g. [{"method": "GET", "url": "https://api.example.com/api/customer/1",
+                                        "expected_status": 200, "expected_fields": ["id", "email"]}]
+
+    Returns:
+        dict: Summary and per-case results
+    """
+    try:
+        if isinstance(test_cases, str):
+            test_cases = json.loads(test_cases)
+        if not isinstance(test_cases, list):
+            raise ValueError(f"expected a list of test cases, got {type(test_cases).__name__}")
+    except (TypeError, ValueError) as e:
+        return {
+            "status": "error",
+            "message": f"Invalid test cases: {str(e)}",
+        }
+
+    # A malformed case is reported as a failed result; the others still run
+    cases, invalid = [], {}
+    for index, data in enumerate(test_cases):
+        try:
+            cases.append(ApiTestCase.from_dict(data))
+        except (TypeError, ValueError) as e:
+            invalid[index] = _invalid_case_result(data, e)
+
+    async with ApiTestExecutor() as executor:
+        executed = iter(await executor.run(cases))
+    results = [invalid[index] if index in invalid else next(executed) for index in range(len(test_cases))]
+
+    store = get_results_store()
+    run_id = current_run_id() or store.start_run(label="execute_test_cases")
+    store.record_test_results(results, run_id=run_id)
+
+    return {
+        "status": "success",
+        "message": f"Executed {len(results)} test case(s)",
+        "run_id": run_id,
+        "summary": summarize_results(results),
+        "results": [result.to_dict() for result in results],
+    }
@@ -0,0 +1,504 @@
+"""
+Load generator for the full agent graph, with a simulated LLM.
+
+Every `Gemini` model in the `root_agent` graph is swapped for
+`SimulatedGemini`. It answers from a script (a tool call or a final text per
+step and per agent) after a latency drawn from a log-normal distribution, and
+raises a 429 at a configured rate. The rest is real: `SimulatedGemini` goes
+through the `ThrottledGemini` limiter, backoff and circuit breaker, and the
+sessions run through the `Runner`, `stream_session`, the tools, SQLite and the
+results store. Only the model is fake.
+
+The report covers:
+
+- sessions/sec and session latency percentiles
+- event-loop lag, sampled by a task that sleeps DEFAULT_LAG_INTERVAL at a time
+- memory per session: RSS growth over the baseline divided by the peak number of live sessions
+- where time goes, summed over sessions: simulated model latency, waiting for the limiter or
+  backing off after a 429, each tool, and the rest (ADK, the event stream, loop contention)
+
+Run with `python -m main_agents.load_test --sessions 2000 --concurrency 500`.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import resource
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, Dict, List, Optional, Sequence
+
+import numpy as np
+from google.adk.agents import LlmAgent
+from google.adk.models.google_llm import Gemini
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.adk.runners import Runner
+from google.adk.tools.agent_tool import AgentTool
+from google.genai import types
+from google.genai.errors import ClientError
+
+from utils.results_store import get_results_store
+
+from .agent import APP_NAME, root_agent, session_service, stream_session
+from .config import DEFAULT_MAX_CONCURRENT_REQUESTS
+from .events import ERROR, QUERY_END
+from .models import ThrottledGemini
+from .rate_limiter import get_rate_limiter, set_rate_limiter
+
+SIMULATED_MODEL = "simulated-llm"
+# Seconds between event-loop lag samples
+DEFAULT_LAG_INTERVAL = 0.01
+
+# Time spent in the backend calls made for the current model call, retries included
+_backend_seconds: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("backend_seconds", default=None)
+
+DEFAULT_QUERY = "What database tables are related to the /api/users endpoint?"
+
+# Steps per agent name: {"tool": name, "args": {...}} calls a tool, {"text": ...} answers.
+# "{query}" in a string argument is replaced with the agent's latest user message.
+DEFAULT_SCRIPT = {
+    "root_agent": [
+        {"tool": "Database_Analyst_Agent", "args": {"request": "{query}"}},
+        {"tool": "rag_agent", "args": {"request": "{query}"}},
+        {"text": "/api/users is backed by the users table (user_id, name, email)."},
+    ],
+    "Database_Analyst_Agent": [
+        {"tool": "map_endpoint", "args": {"endpoint": "/api/users/{id}", "fields": ["name", "email"]}},
+        {"tool": "query_database", "args": {"query": "SELECT user_id, name, email FROM users LIMIT 5"}},
+        {"text": "The users table backs the endpoint: name -> users.name, email -> users.email."},
+    ],
+    "rag_agent": [
+        {"text": "GET /api/users/{id} returns the user; 404 when it does not exist."},
+    ],
+}
+
+
+@dataclass
+class LatencyModel:
+    """
+    Log-normal model latency.
+
+    Args:
+        median (float): Median seconds per call.
+        p99 (float): 99th percentile seconds per call.
+    """
+
+    median: float = 0.5
+    p99: float = 2.0
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        # 2.326 is the 99th percentile of the standard normal distribution
+        sigma = max(0.0, np.log(self.p99 / self.median) / 2.326) if self.p99 > 0 else 0.0
+        return random.lognormvariate(float(np.log(self.median)), float(sigma))
+
+
+@dataclass
+class LoadStats:
+    """Time spent per category, summed over every session."""
+
+    model_calls: int = 0
+    model_seconds: float = 0.0
+    model_wait_seconds: float = 0.0
+    injected_429s: int = 0
+    tool_calls: Dict[str, int] = field(default_factory=dict)
+    tool_seconds: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class SimulationProfile:
+    """
+    What the simulated model answers, how fast, and how often it is throttled.
+
+    Args:
+        script (dict): Steps per agent name, see DEFAULT_SCRIPT.
+        latency (LatencyModel): Latency of every call.
+        error_rate (float): Share of calls that fail with a 429.
+    """
+
+    script: dict = field(default_factory=lambda: DEFAULT_SCRIPT)
+    latency: LatencyModel = field(default_factory=LatencyModel)
+    error_rate: float = 0.0
+    stats: LoadStats = field(default_factory=LoadStats)
+
+
+def _last_user_text(llm_request: LlmRequest) -> str:
+    for content in reversed(llm_request.contents):
+        if content.role == "user":
+            texts = [part.text for part in content.parts or [] if part.text]
+            if texts:
+                return " ".join(texts)
+    return ""
+
+
+def _step_index(llm_request: LlmRequest) -> int:
+    """Tool responses received since the latest user message, i.e. script steps already done."""
+    steps = 0
+    for content in reversed(llm_request.contents):
+        parts = content.parts or []
+        if any(part.function_response for part in parts):
+            steps += 1
+        elif content.role == "user" and any(part.text for part in parts):
+            break
+    return steps
+
+
+def _fill(value: Any, query: str) -> Any:
+    if isinstance(value, str):
+        return value.replace("{query}", query)
+    if isinstance(value, list):
+        return [_fill(item, query) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, query) for key, item in value.items()}
+    return value
+
+
+class _ScriptedBackend(Gemini):
+    """Stands in for the Gemini API call: sleeps, may raise a 429, then plays the next script step."""
+
+    agent_name: str = ""
+    profile: Optional[SimulationProfile] = None
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        stats = self.profile.stats
+        if random.random() < self.profile.error_rate:
+            stats.injected_429s += 1
+            raise ClientError(429, {"error": {"code": 429, "message": "Simulated quota exhaustion", "status": "RESOURCE_EXHAUSTED"}})
+
+        latency = self.profile.latency.sample()
+        start = time.perf_counter()
+        await asyncio.sleep(latency)
+        stats.model_calls += 1
+        stats.model_seconds += latency
+        backend_seconds = _backend_seconds.get()
+        if backend_seconds is not None:
+            # Including a late wake-up on a busy loop, so that it isn't counted as limiter wait
+            backend_seconds.append(time.perf_counter() - start)
+
+        steps = self.profile.script.get(self.agent_name) or [{"text": "Done."}]
+        step = steps[min(_step_index(llm_request), len(steps) - 1)]
+        if "tool" in step and step["tool"] in llm_request.tools_dict:
+            args = _fill(step.get("args", {}), _last_user_text(llm_request))
+            part = types.Part(function_call=types.FunctionCall(name=step["tool"], args=args))
+        else:
+            part = types.Part(text=step.get("text", "Done."))
+        # Words stand in for tokens, as elsewhere in the repo
+        prompt_tokens = sum(len(p.text.split()) for c in llm_request.contents for p in c.parts or [] if p.text)
+        output_tokens = len((part.text or json.dumps(part.function_call.args)).split())
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[part]),
+            turn_complete=True,
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=output_tokens,
+                total_token_count=prompt_tokens + output_tokens,
+            ),
+        )
+
+
+class SimulatedGemini(ThrottledGemini, _ScriptedBackend):
+    """`ThrottledGemini` (limiter, backoff, breaker) on top of the scripted backend instead of the API."""
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        stats = self.profile.stats
+        start = time.perf_counter()
+        backend_seconds = []
+        token = _backend_seconds.set(backend_seconds)
+        waiting = True
+        try:
+            async for llm_response in super().generate_content_async(llm_request, stream):
+                if waiting:
+                    # Up to the response only: the caller runs tools before resuming this generator
+                    waiting = False
+                    stats.model_wait_seconds += time.perf_counter() - start - sum(backend_seconds)
+                yield llm_response
+        finally:
+            if waiting:
+                stats.model_wait_seconds += time.perf_counter() - start - sum(backend_seconds)
+            _backend_seconds.reset(token)
+
+
+class _ToolTimingPlugin(BasePlugin):
+    """Times every function tool; agent tools are left out since their time is their agent's model and tools."""
+
+    def __init__(self, stats: LoadStats):
+        super().__init__(name="load_test_tool_timing")
+        self.stats = stats
+        self._started: Dict[int, float] = {}
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        if not isinstance(tool, AgentTool):
+            self._started[id(tool_context)] = time.perf_counter()
+        return None
+
+    def _finish(self, tool, tool_context) -> None:
+        start = self._started.pop(id(tool_context), None)
+        if start is not None:
+            self.stats.tool_calls[tool.name] = self.stats.tool_calls.get(tool.name, 0) + 1
+            self.stats.tool_seconds[tool.name] = self.stats.tool_seconds.get(tool.name, 0.0) + time.perf_counter() - start
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result):
+        self._finish(tool, tool_context)
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error):
+        self._finish(tool, tool_context)
+        return None
+
+
+def _llm_agents(agent) -> List[LlmAgent]:
+    """The agent plus every agent reachable through its sub-agents and agent tools."""
+    agents = [agent] if isinstance(agent, LlmAgent) else []
+    for sub_agent in getattr(agent, "sub_agents", []) or []:
+        agents += _llm_agents(sub_agent)
+    for tool in getattr(agent, "tools", []) or []:
+        if isinstance(tool, AgentTool):
+            agents += _llm_agents(tool.agent)
+    return agents
+
+
+@contextlib.contextmanager
+def simulated_models(agent, profile: SimulationProfile, model_name: str = SIMULATED_MODEL):
+    """Swap the model of every agent in the graph for a `SimulatedGemini`; restored on exit."""
+    originals = []
+    for llm_agent in _llm_agents(agent):
+        retry_options = getattr(llm_agent.model, "retry_options", None)
+        originals.append((llm_agent, llm_agent.model))
+        llm_agent.model = SimulatedGemini(
+            model=model_name, agent_name=llm_agent.name, profile=profile, retry_options=retry_options
+        )
+    try:
+        yield
+    finally:
+        for llm_agent, model in originals:
+            llm_agent.model = model
+
+
+def _rss_bytes() -> int:
+    """Current resident set size (peak size where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _percentiles_ms(values: List[float], percentiles: Sequence[int] = (50, 95, 99)) -> dict:
+    if not values:
+        return {f"p{p}": 0.0 for p in percentiles}
+    return {f"p{p}": round(float(np.percentile(values, p)) * 1000, 2) for p in percentiles}
+
+
+class _Monitor:
+    """Samples event-loop lag, RSS and live sessions while the load runs."""
+
+    def __init__(self, interval: float = DEFAULT_LAG_INTERVAL):
+        self.interval = interval
+        self.lags: List[float] = []
+        self.active = 0
+        self.peak_active = 0
+        self.baseline_rss = _rss_bytes()
+        self.peak_rss = self.baseline_rss
+        self.rss_per_session: List[float] = []
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - start - self.interval))
+            if len(self.lags) % 10 == 0:
+                rss = _rss_bytes()
+                self.peak_rss = max(self.peak_rss, rss)
+                if self.active:
+                    self.rss_per_session.append((rss - self.baseline_rss) / self.active)
+
+
+async def run_load(
+    sessions: int = 100,
+    concurrency: int = 100,
+    queries: Sequence[str] = (DEFAULT_QUERY,),
+    profile: Optional[SimulationProfile] = None,
+    requests_per_min: float = 1_000_000,
+    max_model_concurrency: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+    isolated: bool = False,
+    session_timeout: float = 120.0,
+) -> dict:
+    """
+    Drive `root_agent` through many concurrent sessions with a simulated LLM.
+
+    Args:
+        sessions (int): Sessions to run.
+        concurrency (int): Sessions in flight at once.
+        queries (Sequence[str]): Queries sent in order in every session.
+        profile (SimulationProfile): Script, latency and 429 rate of the simulated model.
+        requests_per_min (float): Budget of the simulated model's rate limiter.
+        max_model_concurrency (int): In-flight model calls allowed by that limiter. Defaults to the
+            production limit, so the simulated sessions queue on the limiter as real ones would.
+        isolated (bool): Give each session its own in-memory copy of the database.
+        session_timeout (float): Seconds per session.
+
+    Returns:
+        dict: Throughput, latency, event-loop lag, memory and time breakdown.
+    """
+    profile = profile or SimulationProfile()
+    stats = profile.stats
+    set_rate_limiter(SIMULATED_MODEL, requests_per_min, max_concurrency=max_model_concurrency)
+    runner = Runner(
+        agent=root_agent, app_name=APP_NAME, session_service=session_service,
+        plugins=[_ToolTimingPlugin(stats)],
+    )
+    run_id = get_results_store().start_run(label="load-test")
+    monitor = _Monitor()
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    # Time of every session, failed ones included, to compare with the per-category totals
+    session_seconds = 0.0
+
+    async def one_session(index: int) -> None:
+        nonlocal session_seconds
+        async with slots:
+            monitor.active += 1
+            monitor.peak_active = max(monitor.peak_active, monitor.active)
+            start = time.perf_counter()
+            # One reason per failed session: the exception that ended it, else the ADK error code
+            reason = None
+            try:
+                async for event in stream_session(
+                    runner, list(queries), session_name=f"load-{run_id}-{index}",
+                    session_timeout=session_timeout, run_id=run_id, isolated=isolated,
+                ):
+                    if event.type == ERROR:
+                        data = event.data or {}
+                        reason = data.get("exception") or reason or data.get("error_code") or "error"
+                    elif event.type == QUERY_END and event.data.get("time_to_final_answer") is None:
+                        # Ended without an answer, e.g. cancelled inside ADK without an error event
+                        reason = reason or "no_final_answer"
+            finally:
+                monitor.active -= 1
+                session_seconds += time.perf_counter() - start
+            if reason is None:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[reason] = errors.get(reason, 0) + 1
+
+    with simulated_models(root_agent, profile):
+        monitor_task = asyncio.create_task(monitor.run())
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(one_session(index) for index in range(sessions)))
+        finally:
+            wall = time.perf_counter() - start
+            monitor_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await monitor_task
+
+    tool_seconds = sum(stats.tool_seconds.values())
+    accounted = stats.model_seconds + stats.model_wait_seconds + tool_seconds
+    breakdown = {
+        "model": round(stats.model_seconds, 3),
+        "model_wait": round(stats.model_wait_seconds, 3),
+        "tools": {name: round(seconds, 3) for name, seconds in sorted(stats.tool_seconds.items())},
+        "other": round(max(0.0, session_seconds - accounted), 3),
+    }
+    return {
+        "sessions": sessions,
+        "completed": len(latencies),
+        "failed": sessions - len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 3),
+        "sessions_per_sec": round(len(latencies) / wall, 2) if wall else 0.0,
+        "session_latency_ms": _percentiles_ms(latencies),
+        "event_loop_lag_ms": {**_percentiles_ms(monitor.lags, (50, 99)), "max": round(max(monitor.lags, default=0.0) * 1000, 2)},
+        "memory": {
+            "baseline_mb": round(monitor.baseline_rss / 2**20, 1),
+            "peak_mb": round(monitor.peak_rss / 2**20, 1),
+            "peak_sessions": monitor.peak_active,
+            "per_session_kb": round(float(np.median(monitor.rss_per_session)) / 1024, 1) if monitor.rss_per_session else 0.0,
+        },
+        "time_seconds": breakdown,
+        "time_share": {
+            "model": round(stats.model_seconds / session_seconds, 3) if session_seconds else 0.0,
+            "model_wait": round(stats.model_wait_seconds / session_seconds, 3) if session_seconds else 0.0,
+            "tools": round(tool_seconds / session_seconds, 3) if session_seconds else 0.0,
+            "other": round(breakdown["other"] / session_seconds, 3) if session_seconds else 0.0,
+        },
+        "model_calls": stats.model_calls,
+        "injected_429s": stats.injected_429s,
+        "tool_calls": dict(sorted(stats.tool_calls.items())),
+        "rate_limiter": get_rate_limiter(SIMULATED_MODEL).stats(),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Load-test the agent graph with a simulated LLM")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200, help="sessions in flight at once")
+    parser.add_argument("--query", action="append", help="query sent in every session (repeatable)")
+    parser.add_argument("--latency-median", type=float, default=0.5, help="seconds per model call")
+    parser.add_argument("--latency-p99", type=float, default=2.0, help="seconds per model call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of model calls that get a 429")
+    parser.add_argument("--requests-per-min", type=float, default=1_000_000, help="simulated model budget")
+    parser.add_argument(
+        "--max-model-concurrency", type=int, default=DEFAULT_MAX_CONCURRENT_REQUESTS,
+        help="in-flight model calls allowed by the limiter (default: the production limit)",
+    )
+    parser.add_argument("--script", help="JSON file with the steps per agent (see DEFAULT_SCRIPT)")
+    parser.add_argument("--isolated", action="store_true", help="one in-memory database copy per session")
+    parser.add_argument("--session-timeout", type=float, default=120.0, help="seconds per session")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--profile", action="store_true", help="also print the top functions by CPU time")
+    parser.add_argument("--output", help="also write the report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    script = DEFAULT_SCRIPT
+    if args.script:
+        with open(args.script, encoding="utf-8") as file:
+            script = json.load(file)
+    profile = SimulationProfile(
+        script=script,
+        latency=LatencyModel(args.latency_median, args.latency_p99),
+        error_rate=args.error_rate,
+    )
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    report = asyncio.run(run_load(
+        args.sessions, args.concurrency, args.query or [DEFAULT_QUERY], profile,
+        args.requests_per_min, args.max_model_concurrency, args.isolated, args.session_timeout,
+    ))
+    if profiler:
+        profiler.disable()
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("tottime").print_stats(25)
+        report["profile"] = output.getvalue()
+
+    print(json.dumps({key: value for key, value in report.items() if key != "profile"}, indent=2))
+    if profiler:
+        print(report["profile"])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,536 @@
+"""
+Local retrieval backend: document chunks on disk, searched with the ANN index.
+
+Files are split into overlapping word windows, embedded through the cached
+`embed_texts`, and appended to a float32 vector file. Below
+DEFAULT_ANN_TRAIN_SIZE chunks, queries scan every vector exactly. Past it,
+an IVF-PQ index is trained once and then grows incrementally with each
+`add_files` call; it is retrained when the corpus has grown well beyond the
+data it was trained on.
+
+Training runs in the process pool (the worker maps the vector file itself)
+without holding the corpus lock: queries keep using the previous index, or
+exact search, until the new one is swapped in. Coalesced batches of
+DEFAULT_OFFLOAD_MIN_BATCH or more indexed queries are split across the
+workers, which map the index from shared memory once per version instead of
+receiving it with every batch.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from .ann_index import IVFPQIndex, exact_search_batch, normalize
+from .config import (
+    DEFAULT_ANN_TRAIN_SIZE,
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_CORPUS_NAME,
+    DEFAULT_DISTANCE_THRESHOLD,
+    DEFAULT_EMBEDDING_DIMENSION,
+    DEFAULT_OFFLOAD_MIN_BATCH,
+    DEFAULT_TOP_K,
+)
+from .coalescer import MicroBatcher
+from .embeddings import RETRIEVAL_DOCUMENT, RETRIEVAL_QUERY, embed_texts
+from .process_pool import SharedArrays, get_process_pool, log_progress
+
+# Retrain the index once the corpus is this many times larger than its training set
+_RETRAIN_GROWTH = 10
+# SQLite host parameters per "IN (...)" lookup
+_LOOKUP_BATCH_SIZE = 500
+# Corpus names become directory names: no separators, no "..", no hidden directories
+_CORPUS_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    chunks INTEGER NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,  -- row of the chunk in the vector file
+    source TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    active INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source);
+"""
+
+
+# Worker side: index of each shared corpus -> (version, IVFPQIndex over the shared arrays)
+_worker_indexes: Dict[str, tuple] = {}
+
+
+def _default_corpora_dir() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "local_corpora")
+
+
+def chunk_text(text: str, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[str]:
+    """
+    Split text into windows of `chunk_size` words that overlap by `overlap` words
+    (words approximate the token counts used by the Vertex AI corpus).
+    """
+    words = text.split()
+    step = max(1, chunk_size - overlap)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_size]))
+        if start + chunk_size >= len(words):
+            break
+    return chunks
+
+
+def _build_index(vector_path: str, rows: int, dimension: int, progress=None) -> dict:
+    """Process-pool job: train an index on the first `rows` vectors of a vector file and add them all."""
+    vectors = np.memmap(vector_path, dtype=np.float32, mode="r", shape=(rows, dimension))
+    index = IVFPQIndex(dimension)
+    index.train(vectors, progress=progress)
+    index.add(np.arange(rows), vectors)
+    return index.to_arrays()
+
+
+def _search_shared(
+    shared: SharedArrays,
+    vector_path: str,
+    rows: int,
+    dimension: int,
+    queries: np.ndarray,
+    searches: List[tuple],
+    progress=None,
+) -> list:
+    """Process-pool job: search several queries in a shared index, re-ranking with the vector file."""
+    if _worker_indexes.get(shared.key, (None,))[0] != shared.version:
+        # Drop the views of the previous version first, so its shared memory can be unmapped
+        _worker_indexes.pop(shared.key, None)
+        _worker_indexes[shared.key] = (shared.version, IVFPQIndex.from_arrays(shared.attach()))
+    index = _worker_indexes[shared.key][1]
+    vectors = np.memmap(vector_path, dtype=np.float32, mode="r", shape=(rows, dimension))
+    hits = []
+    for position, (query, (k, nprobe)) in enumerate(zip(queries, searches)):
+        if progress:
+            progress(position, len(queries))
+        hits.append(index.search(query, k, nprobe=nprobe, vectors=vectors))
+    return hits
+
+
+class LocalCorpus:
+    """
+    Chunks of local files plus their embeddings and ANN index.
+
+    Args:
+        name (str): Corpus name, e.g. DEFAULT_CORPUS_NAME. It names the corpus directory, so only
+            letters, digits, "-", "_" and "." are accepted.
+        directory (str): Where the corpus lives. Defaults to main_agents/local_corpora/<name>.
+        dimension (int): Embedding length.
+        train_size (int): Chunks needed before the ANN index is built.
+    """
+
+    def __init__(
+        self,
+        name: str = DEFAULT_CORPUS_NAME,
+        directory: Optional[str] = None,
+        dimension: int = DEFAULT_EMBEDDING_DIMENSION,
+        train_size: int = DEFAULT_ANN_TRAIN_SIZE,
+    ):
+        if directory is None and (not _CORPUS_NAME.match(name) or ".." in name):
+            raise ValueError(f"Invalid local corpus name: {name!r}")
+        self.name = name
+        self.directory = directory or os.path.join(_default_corpora_dir(), name)
+        self.dimension = dimension
+        self.train_size = train_size
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._building = False
+        self._shared_index: Optional[SharedArrays] = None
+        self._batcher = MicroBatcher(self.query_many, name=f"corpus-{name}")
+        os.makedirs(self.directory, exist_ok=True)
+        self.vector_path = os.path.join(self.directory, "vectors.f32")
+        self.index_path = os.path.join(self.directory, "index.npz")
+        self.db = sqlite3.connect(
+            os.path.join(self.directory, "chunks.db"), check_same_thread=False, isolation_level=None
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(_SCHEMA)
+        self.index = IVFPQIndex.load(self.index_path) if os.path.exists(self.index_path) else None
+
+    def __len__(self) -> int:
+        return self._rows()
+
+    def _rows(self) -> int:
+        row_bytes = self.dimension * np.dtype(np.float32).itemsize
+        return os.path.getsize(self.vector_path) // row_bytes if os.path.exists(self.vector_path) else 0
+
+    def vectors(self) -> np.ndarray:
+        """Memory map of every chunk vector, indexed by chunk id."""
+        rows = self._rows()
+        if self._vectors is None or len(self._vectors) != rows:
+            if rows == 0:
+                self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+            else:
+                self._vectors = np.memmap(self.vector_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+        return self._vectors
+
+    def _changed_source(self, path: str) -> Optional[tuple]:
+        """(source, chunks, sha256) of a file, or None if it is unchanged since it was added."""
+        with open(path, encoding="utf-8") as file:
+            text = file.read()
+        source = os.path.abspath(path)
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        previous = self.db.execute("SELECT sha256 FROM sources WHERE source = ?", (source,)).fetchone()
+        if previous and previous[0] == digest:
+            return None
+        return source, chunk_text(text), digest
+
+    def add_files(self, paths: Sequence[str]) -> dict:
+        """
+        Chunk, embed and index local files. Unchanged files are skipped; a changed
+        file replaces its previous chunks.
+
+        Args:
+            paths (Sequence[str]): Paths of text or markdown files.
+
+        Returns:
+            dict: e.g. {"files_added": 1, "files_skipped": 0, "chunks_added": 42, "indexed": False}
+        """
+        added = skipped = chunks_added = 0
+        for path in paths:
+            change = self._changed_source(path)
+            if change is None:
+                skipped += 1
+                continue
+            chunks_added += self.add_texts(*change)
+            added += 1
+        return {
+            "files_added": added,
+            "files_skipped": skipped,
+            "chunks_added": chunks_added,
+            "indexed": self.index is not None,
+        }
+
+    async def aadd_files(self, paths: Sequence[str]) -> dict:
+        """
+        `add_files` for coroutines: reading, embedding and writing run in threads, and an
+        index (re)build is awaited in the process pool without blocking the event loop.
+        """
+        added = skipped = chunks_added = 0
+        for path in paths:
+            change = await asyncio.to_thread(self._changed_source, path)
+            if change is None:
+                skipped += 1
+                continue
+            chunks_added += await self.aadd_texts(*change)
+            added += 1
+        return {
+            "files_added": added,
+            "files_skipped": skipped,
+            "chunks_added": chunks_added,
+            "indexed": self.index is not None,
+        }
+
+    def _append(self, source: str, chunks: List[str], digest: str) -> tuple:
+        """
+        Embed and store the chunks of one source, replacing its previous chunks, and add
+        them to the current index.
+
+        Returns:
+            tuple: (chunks added, rows a new index must be trained on, or None).
+        """
+        vectors = normalize(embed_texts(chunks, RETRIEVAL_DOCUMENT))
+        row_bytes = self.dimension * np.dtype(np.float32).itemsize
+        with self._lock:
+            first_id = self._rows()
+            ids = np.arange(first_id, first_id + len(chunks))
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                self.db.execute("UPDATE chunks SET active = 0 WHERE source = ?", (source,))
+                self.db.executemany(
+                    "INSERT INTO chunks (id, source, position, text) VALUES (?, ?, ?, ?)",
+                    [(int(chunk_id), source, position, chunk) for position, (chunk_id, chunk) in enumerate(zip(ids, chunks))],
+                )
+                self.db.execute(
+                    "INSERT OR REPLACE INTO sources (source, sha256, chunks, added_at) VALUES (?, ?, ?, ?)",
+                    (source, digest, len(chunks), time.time()),
+                )
+                with open(self.vector_path, "ab") as vector_file:
+                    vector_file.write(vectors.tobytes())
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                # Chunk ids are rows of the vector file: drop the rows of the rolled back chunks
+                if os.path.exists(self.vector_path) and os.path.getsize(self.vector_path) > first_id * row_bytes:
+                    os.truncate(self.vector_path, first_id * row_bytes)
+                raise
+            return len(chunks), self._update_index(ids, vectors)
+
+    def add_texts(self, source: str, chunks: List[str], digest: str = "") -> int:
+        """Embed and index the chunks of one source, replacing its previous chunks."""
+        if not chunks:
+            return 0
+        count, rows = self._append(source, chunks, digest)
+        if rows is not None:
+            arrays = None
+            try:
+                arrays = self._submit_build(rows).result()
+            finally:
+                self._install_index(arrays, rows)
+        return count
+
+    async def aadd_texts(self, source: str, chunks: List[str], digest: str = "") -> int:
+        """`add_texts` for coroutines (see `aadd_files`)."""
+        if not chunks:
+            return 0
+        count, rows = await asyncio.to_thread(self._append, source, chunks, digest)
+        if rows is not None:
+            arrays = None
+            try:
+                arrays = await self._submit_build(rows).wait()
+            finally:
+                await asyncio.to_thread(self._install_index, arrays, rows)
+        return count
+
+    def _update_index(self, ids: np.ndarray, vectors: np.ndarray) -> Optional[int]:
+        """
+        Add new vectors to the current index. Called with `self._lock` held.
+
+        Returns:
+            Optional[int]: Rows to train a new index on when the corpus has reached the training size
+                or outgrown the index, unless a build is already running. The caller builds it without
+                the lock (queries keep using the current index or exact search) and swaps it in
+                with `_install_index`.
+        """
+        rows = self._rows()
+        if rows < self.train_size:
+            return None
+        if self.index is not None:
+            self.index.add(ids, vectors)
+            self.index.save(self.index_path)
+            self._unshare_index()
+        if self._building or (self.index is not None and rows <= self.index.trained_size * _RETRAIN_GROWTH):
+            return None
+        self._building = True
+        return rows
+
+    def _submit_build(self, rows: int):
+        return get_process_pool().submit(_build_index, self.vector_path, rows, self.dimension, on_progress=log_progress)
+
+    def _install_index(self, arrays: Optional[dict], rows: int) -> None:
+        """
+        Swap in an index trained on the first `rows` vectors, after adding the rows appended
+        while it was built. None (the build failed or was cancelled) keeps the current index.
+        """
+        index = IVFPQIndex.from_arrays(arrays) if arrays is not None else None
+        with self._lock:
+            self._building = False
+            if index is None:
+                return
+            current = self._rows()
+            if current > rows:
+                index.add(np.arange(rows, current), self.vectors()[rows:current])
+            self.index = index
+            index.save(self.index_path)
+            self._unshare_index()
+
+    def _unshare_index(self) -> None:
+        if self._shared_index is not None:
+            get_process_pool().unshare(self._shared_index.key)
+            self._shared_index = None
+
+    def _search_in_pool(self, queries: np.ndarray, searches: List[tuple]) -> list:
+        """Split an indexed batch search across the process pool. Called with `self._lock` held."""
+        pool = get_process_pool()
+        if self._shared_index is None:
+            self._shared_index = pool.share(f"corpus-{self.name}", self.index.to_arrays())
+        bounds = np.linspace(0, len(queries), min(pool.workers, len(queries)) + 1).astype(int)
+        jobs = [
+            pool.submit(
+                _search_shared, self._shared_index, self.vector_path, self._rows(), self.dimension,
+                queries[start:end], searches[start:end],
+            )
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        try:
+            return [hit for job in jobs for hit in job.result()]
+        except BaseException:
+            for job in jobs:
+                job.cancel()
+            raise
+
+    def query(
+        self,
+        text: str,
+        top_k: int = DEFAULT_TOP_K,
+        distance_threshold: float = DEFAULT_DISTANCE_THRESHOLD,
+        nprobe: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        Chunks closest to a query, in the format returned by `rag_query`.
+
+        Concurrent queries are coalesced: their embeddings go out in one request and
+        the search runs once for the whole batch (see `MicroBatcher`).
+
+        Args:
+            text (str): Query text.
+            top_k (int): Maximum results.
+            distance_threshold (float): Maximum cosine distance, as in the Vertex AI retrieval config.
+            nprobe (int): Lists scanned by the ANN index; more is slower and more accurate.
+
+        Returns:
+            List[dict]: e.g. [{"source_uri": "/.../api_docs.md", "source_name": "api_docs.md",
+                               "text": "...", "score": 0.21}], score being the cosine distance.
+        """
+        return self._batcher((text, top_k, distance_threshold, nprobe))
+
+    async def aquery(
+        self,
+        text: str,
+        top_k: int = DEFAULT_TOP_K,
+        distance_threshold: float = DEFAULT_DISTANCE_THRESHOLD,
+        nprobe: Optional[int] = None,
+    ) -> List[dict]:
+        """
+        `query` for coroutines: awaits the micro-batch instead of blocking a thread on it,
+        so concurrent sessions on one event loop share a batch (see `MicroBatcher.acall`).
+        """
+        return await self._batcher.acall((text, top_k, distance_threshold, nprobe))
+
+    def query_many(self, requests: List[tuple]) -> List[List[dict]]:
+        """
+        Run several queries at once.
+
+        Args:
+            requests (List[tuple]): (text, top_k, distance_threshold, nprobe) per query.
+
+        Returns:
+            List[List[dict]]: Results of each query, in order.
+        """
+        return self.search_many(embed_texts([request[0] for request in requests], RETRIEVAL_QUERY), requests)
+
+    def search_many(self, queries: np.ndarray, requests: List[tuple]) -> List[List[dict]]:
+        """
+        `query_many` with the query embeddings already computed, e.g. to time the search alone.
+
+        Args:
+            queries (np.ndarray): One query embedding per request.
+            requests (List[tuple]): (text, top_k, distance_threshold, nprobe) per query.
+
+        Returns:
+            List[List[dict]]: Results of each query, in order.
+        """
+        queries = normalize(np.asarray(queries, dtype=np.float32))
+        with self._lock:
+            inactive = self.db.execute("SELECT COUNT(*) FROM chunks WHERE active = 0").fetchone()[0]
+        # Replaced chunks are still in the vector file and are filtered out after the search:
+        # start with extra results if there are any, and search again with twice as many for the
+        # queries left with fewer than top_k active hits until the index has no more to give
+        ks = [top_k * (4 if inactive else 1) for _, top_k, _, _ in requests]
+        hits: List[Optional[tuple]] = [None] * len(requests)
+        rows: Dict[int, tuple] = {}
+        looked_up = set()
+        pending = list(range(len(requests)))
+        while pending:
+            searches = [(ks[i], requests[i][3]) for i in pending]
+            with self._lock:
+                total = self._rows()
+                found = self._search(queries[pending], searches)
+            self._lookup_active(found, rows, looked_up)
+
+            retry = []
+            for i, (ids, scores) in zip(pending, found):
+                hits[i] = (ids, scores)
+                _, top_k, distance_threshold, _ = requests[i]
+                active = sum(int(chunk_id) in rows for chunk_id in ids.tolist())
+                exhausted = len(ids) < ks[i] or ks[i] >= total
+                # Hits come closest first: past the threshold, further hits can't match either
+                beyond = len(scores) > 0 and 1.0 - float(scores[-1]) > distance_threshold
+                if active < top_k and not exhausted and not beyond:
+                    ks[i] = min(ks[i] * 2, total)
+                    retry.append(i)
+            pending = retry
+
+        results = []
+        for (ids, scores), (_, top_k, distance_threshold, _) in zip(hits, requests):
+            matches = []
+            for chunk_id, score in zip(ids.tolist(), scores.tolist()):
+                distance = 1.0 - score
+                if chunk_id in rows and distance <= distance_threshold:
+                    source, chunk = rows[chunk_id]
+                    matches.append({
+                        "source_uri": source,
+                        "source_name": os.path.basename(source),
+                        "text": chunk,
+                        "score": round(distance, 4),
+                    })
+            results.append(matches[:top_k])
+        return results
+
+    def _search(self, queries: np.ndarray, searches: List[tuple]) -> list:
+        """(ids, similarities) of the `k` nearest vectors per (k, nprobe) search. Called with `self._lock` held."""
+        vectors = self.vectors()
+        if self.index is None:
+            return exact_search_batch(vectors, queries, max(k for k, _ in searches))
+        if len(searches) >= DEFAULT_OFFLOAD_MIN_BATCH and get_process_pool().workers:
+            return self._search_in_pool(queries, searches)
+        return [
+            self.index.search(query, k, nprobe=nprobe, vectors=vectors)
+            for query, (k, nprobe) in zip(queries, searches)
+        ]
+
+    def _lookup_active(self, hits: list, rows: Dict[int, tuple], looked_up: set) -> None:
+        """Add (source, text) of the active chunks among the hits to `rows`, reading each id once."""
+        chunk_ids = sorted({int(chunk_id) for ids, _ in hits for chunk_id in ids} - looked_up)
+        looked_up.update(chunk_ids)
+        for start in range(0, len(chunk_ids), _LOOKUP_BATCH_SIZE):
+            batch = chunk_ids[start:start + _LOOKUP_BATCH_SIZE]
+            placeholders = ", ".join("?" for _ in batch)
+            for row in self.db.execute(
+                f"SELECT id, source, text FROM chunks WHERE active = 1 AND id IN ({placeholders})", batch
+            ):
+                rows[row[0]] = row[1:]
+
+    def stats(self) -> dict:
+        return {
+            "corpus_name": self.name,
+            "chunks": self._rows(),
+            "active_chunks": self.db.execute("SELECT COUNT(*) FROM chunks WHERE active = 1").fetchone()[0],
+            "sources": self.db.execute("SELECT COUNT(*) FROM sources").fetchone()[0],
+            "indexed": self.index is not None,
+            "index_lists": self.index.nlist if self.index is not None else 0,
+        }
+
+    def close(self) -> None:
+        self._unshare_index()
+        self._vectors = None
+        self.db.close()
+
+
+_corpora: Dict[str, LocalCorpus] = {}
+_corpora_lock = threading.Lock()
+
+
+def get_local_corpus(name: str = DEFAULT_CORPUS_NAME) -> LocalCorpus:
+    """Process-wide local corpus by name, opened on first use."""
+    with _corpora_lock:
+        if name not in _corpora:
+            _corpora[name] = LocalCorpus(name)
+        return _corpora[name]
+
+
+def list_local_corpora() -> List[str]:
+    """Names of the local corpora on disk."""
+    directory = _default_corpora_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        name for name in os.listdir(directory)
+        if os.path.exists(os.path.join(directory, name, "chunks.db"))
+    )
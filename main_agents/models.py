@@ -0,0 +1,119 @@
+"""
+Gemini model wrapper that routes every request through the shared rate limiter,
+the call deadline and the model's circuit breaker.
+"""
+
+import asyncio
+import contextlib
+from typing import AsyncGenerator
+
+from google.adk.models.google_llm import Gemini
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai.errors import APIError
+
+from .rate_limiter import get_rate_limiter, is_rate_limit_error
+from .resilience import (
+    CircuitOpenError,
+    DeadlineExceeded,
+    RetryPolicy,
+    call_deadline,
+    get_circuit_breaker,
+    get_metrics,
+    is_transient_error,
+)
+
+# Marks the end of the responses of one request
+_DONE = object()
+
+
+class ThrottledGemini(Gemini):
+    """
+    Gemini model that draws from the process-wide limiter for its model name.
+
+    429 responses are handled here instead of by the HTTP retry options: the
+    limiter shrinks its concurrency window and pauses the bucket, then the
+    request is retried with jittered backoff once a slot is free again. Each
+    call, transport retries included, is cancelled at its deadline, and calls
+    fail fast while the model's circuit breaker is open.
+    """
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        # The caller runs tools and agent tools (whose agents call models too) while this
+        # generator is suspended at `yield`. The request therefore runs in its own task, which
+        # holds the limiter slot only until the backend is done: a slot held across `yield`
+        # deadlocks nested agents once every slot belongs to a waiting parent.
+        responses: asyncio.Queue = asyncio.Queue()
+        producer = asyncio.create_task(self._produce(llm_request, stream, responses))
+        try:
+            while (llm_response := await responses.get()) is not _DONE:
+                yield llm_response
+            await producer
+        finally:
+            if not producer.done():
+                producer.cancel()
+            # Retrieve the outcome of an abandoned request so that it isn't logged as never retrieved
+            with contextlib.suppress(Exception, asyncio.CancelledError):
+                await producer
+
+    async def _produce(self, llm_request: LlmRequest, stream: bool, responses: asyncio.Queue) -> None:
+        """Run the request with retries, putting every response in `responses` and `_DONE` at the end."""
+        limiter = get_rate_limiter(self.model)
+        breaker = get_circuit_breaker(self.model)
+        metrics = get_metrics(self.model)
+        policy = RetryPolicy(attempts=(self.retry_options.attempts if self.retry_options else None) or 1)
+        deadline = call_deadline(policy.call_timeout)
+
+        try:
+            for attempt in range(1, policy.attempts + 1):
+                if not breaker.allow():
+                    metrics.incr("circuit_rejections")
+                    raise CircuitOpenError(f"Circuit for '{self.model}' is open; failing fast")
+                metrics.incr("calls")
+                admitted = produced = False
+                try:
+                    # Covers the wait for the limiter and the request, not the caller's work between responses
+                    async with asyncio.timeout(deadline.remaining()):
+                        async with limiter.alimit():
+                            admitted = True
+                            async for llm_response in super().generate_content_async(llm_request, stream):
+                                produced = True
+                                responses.put_nowait(llm_response)
+                except asyncio.CancelledError:
+                    # The caller went away mid-call
+                    breaker.release()
+                    raise
+                except TimeoutError as e:
+                    metrics.incr("deadline_exceeded")
+                    if admitted:
+                        breaker.record_failure()
+                    else:
+                        # Queued behind other calls: the model was never asked
+                        breaker.release()
+                    raise DeadlineExceeded(f"Call to '{self.model}' exceeded its deadline") from e
+                except APIError as e:
+                    if not is_rate_limit_error(e):
+                        if is_transient_error(e):
+                            metrics.incr("failures")
+                            breaker.record_failure()
+                        else:
+                            breaker.release()
+                        raise
+                    metrics.incr("failures")
+                    limiter.record_throttle()
+                    # A partially streamed response can't be replayed
+                    delay = policy.backoff(attempt, deadline) if attempt < policy.attempts else None
+                    if produced or delay is None:
+                        raise
+                    metrics.incr("retries")
+                    metrics.add_backoff(delay)
+                    await asyncio.sleep(delay)
+                    continue
+                metrics.incr("successes")
+                limiter.record_success()
+                breaker.record_success()
+                return
+        finally:
+            responses.put_nowait(_DONE)
@@ -0,0 +1,523 @@
+"""
+Process pool for CPU-bound local work.
+
+Sync tools run on the event loop that also serves `run_session`, and the
+retrieval batches run on threads that share its GIL, so index training,
+batch ANN search, column profiling and queries over large tables keep the
+whole process on one core and stall every session while they run.
+`ProcessPool` keeps PROCESS_POOL_WORKERS spawn workers warm: each imports
+its job modules once and maps shared arrays (e.g. an ANN index, see
+`ProcessPool.share`) once per version, so a job only ships its own arguments.
+
+A job is a picklable module-level function that accepts a `progress`
+keyword. Calling `progress(done, total, message)` reports progress to the
+caller and raises `JobCancelled` once the caller has cancelled the job;
+`progress.cancelled()` checks without reporting. `progress` is None when the
+job runs inline: with no workers, or for an isolated session whose
+in-memory database the workers cannot see.
+"""
+
+import asyncio
+import atexit
+import concurrent.futures
+import importlib
+import itertools
+import logging
+import multiprocessing
+import multiprocessing.context
+import os
+import threading
+import time
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import DEFAULT_PROGRESS_INTERVAL, PROCESS_POOL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Modules every worker imports before its first job
+DEFAULT_WARM_MODULES = ("numpy", "main_agents.local_corpus", "utils.database_jobs")
+# Name of the worker processes; `main_agents/__init__` checks it to skip Vertex AI and the agents
+_WORKER_NAME = "process-pool-worker"
+# Slots of the shared cancellation table: job `id` is cancelled when slot `id % _CANCEL_SLOTS` holds `id`
+_CANCEL_SLOTS = 4096
+
+
+class JobCancelled(Exception):
+    """Raised inside a job, at its next progress report, after the caller cancelled it."""
+
+
+class _WorkerProcess(multiprocessing.context.SpawnProcess):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Spawn hands the name to the child before it imports anything
+        self.name = f"{_WORKER_NAME}-{self._identity[-1]}"
+
+
+class _WorkerContext(multiprocessing.context.SpawnContext):
+    Process = _WorkerProcess
+
+
+def in_pool_worker() -> bool:
+    """True inside a worker process of `ProcessPool`."""
+    return multiprocessing.current_process().name.startswith(_WORKER_NAME)
+
+
+# ------------------------------------------------------------------ worker side
+
+_progress_queue = None
+_cancelled = None
+# key -> (version, shared memory blocks, arrays) of the arrays mapped by this worker
+_attached: Dict[str, tuple] = {}
+# Blocks of replaced versions, closed once no array views them anymore
+_retired: list = []
+
+
+def _init_worker(progress_queue, cancelled, modules: Sequence[str]) -> None:
+    global _progress_queue, _cancelled
+    _progress_queue = progress_queue
+    _cancelled = cancelled
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            logger.warning(f"Process pool worker could not preload {module}: {e}")
+
+
+class _Progress:
+    """The `progress` callable handed to a job running in a worker."""
+
+    def __init__(self, job_id: int, interval: float):
+        self.job_id = job_id
+        self.interval = interval
+        self._reported = 0.0
+
+    def cancelled(self) -> bool:
+        return _cancelled is not None and _cancelled[self.job_id % _CANCEL_SLOTS] == self.job_id
+
+    def __call__(self, done: int, total: int, message: str = "") -> None:
+        if self.cancelled():
+            raise JobCancelled(f"Job {self.job_id} cancelled")
+        now = time.monotonic()
+        # Throttled, but the last step always gets through
+        if _progress_queue is not None and (done >= total or now - self._reported >= self.interval):
+            self._reported = now
+            _progress_queue.put((self.job_id, done, total, message))
+
+
+def _run_job(job_id: int, interval: float, fn: Callable, args: tuple, kwargs: dict):
+    progress = _Progress(job_id, interval)
+    if progress.cancelled():
+        raise JobCancelled(f"Job {job_id} cancelled before it started")
+    result = fn(*args, progress=progress, **kwargs)
+    # A job may end early when cancelled (e.g. an interrupted SQLite query returns no rows): never hand that back
+    if progress.cancelled():
+        raise JobCancelled(f"Job {job_id} cancelled")
+    return result
+
+
+def _ping(delay: float) -> int:
+    time.sleep(delay)
+    return os.getpid()
+
+
+def _release_retired() -> None:
+    still_viewed = []
+    for memory in _retired:
+        try:
+            memory.close()
+        except BufferError:
+            still_viewed.append(memory)
+    _retired[:] = still_viewed
+
+
+@dataclass(frozen=True)
+class SharedArrays:
+    """
+    Picklable handle to NumPy arrays copied into shared memory by `ProcessPool.share`.
+
+    Args:
+        key (str): What the arrays hold, e.g. "corpus-endpoint-documentation"; a worker maps one version per key.
+        version (int): Changes each time the key is shared again.
+        specs (Tuple[tuple, ...]): (array name, block name, shape, dtype) of each array.
+    """
+
+    key: str
+    version: int
+    specs: Tuple[tuple, ...]
+
+    def attach(self) -> Dict[str, np.ndarray]:
+        """Read-only views of the arrays, mapped once per worker and version."""
+        cached = _attached.get(self.key)
+        if cached is not None and cached[0] == self.version:
+            return cached[2]
+        if cached is not None:
+            del _attached[self.key]
+            _retired.extend(cached[1])
+            cached = None
+        _release_retired()
+
+        blocks, arrays = [], {}
+        for name, block, shape, dtype in self.specs:
+            # The parent owns the blocks: workers must not unlink them when they exit
+            memory = shared_memory.SharedMemory(name=block, track=False)
+            array = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+            array.flags.writeable = False
+            blocks.append(memory)
+            arrays[name] = array
+        _attached[self.key] = (self.version, blocks, arrays)
+        return arrays
+
+
+# ------------------------------------------------------------------ caller side
+
+class Job:
+    """
+    Handle to a submitted job.
+
+    Attributes:
+        id (int): Job id, unique in the process.
+        name (str): Name of the job function.
+        progress (Tuple[int, int, str]): Last (done, total, message) reported by the job.
+        future (concurrent.futures.Future): Resolves with the job's return value.
+    """
+
+    def __init__(self, job_id: int, name: str, future: concurrent.futures.Future, pool: "ProcessPool",
+                 on_progress: Optional[Callable[["Job"], None]] = None):
+        self.id = job_id
+        self.name = name
+        self.future = future
+        self.progress: Tuple[int, int, str] = (0, 0, "")
+        self.submitted_at = time.monotonic()
+        self._pool = pool
+        self._on_progress = on_progress
+
+    def _report(self, done: int, total: int, message: str) -> None:
+        self.progress = (done, total, message)
+        if self._on_progress is not None:
+            try:
+                self._on_progress(self)
+            except Exception as e:
+                logger.warning(f"Progress callback of job {self.id} failed: {e}")
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def cancel(self) -> bool:
+        """
+        Cancel the job: dropped if still queued, stopped at its next progress report if running.
+
+        Returns:
+            bool: False if the job had already finished.
+        """
+        if self.future.cancel():
+            return True
+        if self.future.done():
+            return False
+        self._pool._cancel(self.id)
+        return True
+
+    def result(self, timeout: Optional[float] = None):
+        """Block until the job finishes and return its result (or raise its error)."""
+        return self.future.result(timeout)
+
+    async def wait(self):
+        """Await the result without blocking the event loop; cancelling the awaiting task cancels the job."""
+        try:
+            return await asyncio.wrap_future(self.future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def describe(self) -> dict:
+        done, total, message = self.progress
+        return {
+            "id": self.id,
+            "name": self.name,
+            "done": done,
+            "total": total,
+            "message": message,
+            "seconds": round(time.monotonic() - self.submitted_at, 3),
+        }
+
+
+class ProcessPool:
+    """
+    Warm spawn workers for CPU-bound jobs, with progress reports, cancellation and shared arrays.
+
+    Workers start on the first job (or on `warm()`) and import `warm_modules` once.
+
+    Args:
+        workers (int): Worker processes; 0 runs every job inline in the caller's thread.
+        warm_modules (Sequence[str]): Modules each worker imports when it starts.
+        progress_interval (float): Minimum seconds between two progress reports of a job.
+    """
+
+    def __init__(
+        self,
+        workers: int = PROCESS_POOL_WORKERS,
+        warm_modules: Sequence[str] = DEFAULT_WARM_MODULES,
+        progress_interval: float = DEFAULT_PROGRESS_INTERVAL,
+    ):
+        self.workers = workers
+        self.warm_modules = tuple(warm_modules)
+        self.progress_interval = progress_interval
+        self._context = _WorkerContext()
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._progress_queue = None
+        self._cancelled = None
+        self._listener: Optional[threading.Thread] = None
+        self._jobs: Dict[int, Job] = {}
+        self._ids = itertools.count(1)
+        self._versions = itertools.count(1)
+        self._shared: Dict[str, list] = {}
+        self._counts = {"submitted": 0, "inline": 0, "completed": 0, "failed": 0, "cancelled": 0}
+
+    def _ensure_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        # Called with self._lock held
+        if self._executor is None:
+            self._progress_queue = self._context.SimpleQueue()
+            self._cancelled = self._context.RawArray("q", _CANCEL_SLOTS)
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=self._context,
+                initializer=_init_worker,
+                initargs=(self._progress_queue, self._cancelled, self.warm_modules),
+            )
+            self._listener = threading.Thread(
+                target=self._listen, args=(self._progress_queue,), name="process-pool-progress", daemon=True
+            )
+            self._listener.start()
+        return self._executor
+
+    def _detach_executor(self) -> tuple:
+        # Called with self._lock held; the caller stops what it returns once the lock is released
+        state = (self._executor, self._progress_queue, self._listener)
+        self._executor = self._progress_queue = self._listener = self._cancelled = None
+        return state
+
+    @staticmethod
+    def _stop(state: tuple, wait: bool) -> None:
+        executor, progress_queue, listener = state
+        if executor is None:
+            return
+        executor.shutdown(wait=wait, cancel_futures=True)
+        progress_queue.put(None)
+        if wait:
+            listener.join()
+
+    def _listen(self, progress_queue) -> None:
+        while True:
+            message = progress_queue.get()
+            if message is None:
+                return
+            job_id, done, total, text = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+            if job is not None:
+                job._report(done, total, text)
+
+    def _cancel(self, job_id: int) -> None:
+        with self._lock:
+            if self._cancelled is not None:
+                self._cancelled[job_id % _CANCEL_SLOTS] = job_id
+
+    def _finished(self, job: Job) -> None:
+        future = job.future
+        if future.cancelled() or isinstance(future.exception(), JobCancelled):
+            outcome = "cancelled"
+        elif future.exception() is not None:
+            outcome = "failed"
+        else:
+            outcome = "completed"
+        with self._lock:
+            self._jobs.pop(job.id, None)
+            self._counts[outcome] += 1
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        on_progress: Optional[Callable[[Job], None]] = None,
+        inline: bool = False,
+        **kwargs,
+    ) -> Job:
+        """
+        Run `fn(*args, progress=..., **kwargs)` in a worker.
+
+        Args:
+            fn (Callable): Module-level function that accepts a `progress` keyword.
+            on_progress (Callable[[Job], None]): Called with the job on each report, on the listener thread.
+            inline (bool): Run in the calling thread instead, e.g. when the job reads an isolated session's
+                           in-memory database. Jobs also run inline when the pool has no workers.
+
+        Returns:
+            Job: Handle with the result future, the last progress report and `cancel()`.
+        """
+        job_id = next(self._ids)
+        name = getattr(fn, "__name__", repr(fn))
+        if inline or self.workers <= 0:
+            future: concurrent.futures.Future = concurrent.futures.Future()
+            job = Job(job_id, name, future, self, on_progress)
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(fn(*args, progress=None, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            with self._lock:
+                self._counts["inline"] += 1
+            return job
+
+        stale = None
+        with self._lock:
+            executor = self._ensure_executor()
+            self._cancelled[job_id % _CANCEL_SLOTS] = 0
+            try:
+                future = executor.submit(_run_job, job_id, self.progress_interval, fn, args, kwargs)
+            except BrokenProcessPool:
+                # A worker died (e.g. out of memory): start a fresh pool for this and later jobs
+                logger.warning("Process pool was broken, restarting its workers")
+                stale = self._detach_executor()
+                executor = self._ensure_executor()
+                self._cancelled[job_id % _CANCEL_SLOTS] = 0
+                future = executor.submit(_run_job, job_id, self.progress_interval, fn, args, kwargs)
+            job = Job(job_id, name, future, self, on_progress)
+            self._jobs[job_id] = job
+            self._counts["submitted"] += 1
+        if stale is not None:
+            self._stop(stale, wait=False)
+        future.add_done_callback(lambda _: self._finished(job))
+        return job
+
+    def share(self, key: str, arrays: Dict[str, np.ndarray]) -> SharedArrays:
+        """
+        Copy arrays into shared memory so workers map them instead of receiving them with every job.
+
+        Sharing a key again replaces (and unlinks) its previous version; workers still mapping it
+        keep their copy until they attach the new one.
+
+        Args:
+            key (str): What the arrays hold, e.g. "corpus-endpoint-documentation".
+            arrays (Dict[str, np.ndarray]): Arrays by name.
+
+        Returns:
+            SharedArrays: Picklable handle to pass to jobs.
+        """
+        specs, blocks = [], []
+        for name, array in arrays.items():
+            array = np.asarray(array, order="C")
+            memory = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+            blocks.append(memory)
+            specs.append((name, memory.name, array.shape, array.dtype.str))
+        with self._lock:
+            version = next(self._versions)
+            previous = self._shared.pop(key, None)
+            self._shared[key] = blocks
+        if previous:
+            self._unlink(previous)
+        return SharedArrays(key, version, tuple(specs))
+
+    def unshare(self, key: str) -> None:
+        """Unlink the shared arrays of a key."""
+        with self._lock:
+            blocks = self._shared.pop(key, None)
+        if blocks:
+            self._unlink(blocks)
+
+    @staticmethod
+    def _unlink(blocks: List[shared_memory.SharedMemory]) -> None:
+        for memory in blocks:
+            memory.close()
+            memory.unlink()
+
+    def warm(self) -> int:
+        """
+        Start the workers now rather than on the first jobs, so their imports are paid up front.
+
+        Returns:
+            int: Workers that answered.
+        """
+        if self.workers <= 0:
+            return 0
+        with self._lock:
+            executor = self._ensure_executor()
+            # Each ping holds its worker briefly, so the executor spawns them all
+            futures = [executor.submit(_ping, 0.05) for _ in range(self.workers)]
+        return len({future.result() for future in futures})
+
+    def jobs(self) -> List[dict]:
+        """Jobs queued or running in the workers, with their last progress report."""
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.describe() for job in jobs]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "started": self._executor is not None,
+                "running": len(self._jobs),
+                **self._counts,
+                "shared_arrays": len(self._shared),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers (dropping queued jobs) and unlink the shared arrays."""
+        with self._lock:
+            state = self._detach_executor()
+            shared, self._shared = self._shared, {}
+        self._stop(state, wait)
+        for blocks in shared.values():
+            self._unlink(blocks)
+
+
+_pool: Optional[ProcessPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> ProcessPool:
+    """Process-wide pool, created on first use and shut down at exit."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def log_progress(job: Job) -> None:
+    """`on_progress` callback that logs each report, e.g. "Job 7 profile_tables: 3/8 sales"."""
+    done, total, message = job.progress
+    logger.info(f"Job {job.id} {job.name}: {done}/{total} {message}".rstrip())
+
+
+async def run_offloaded(
+    fn: Callable,
+    *args,
+    inline: bool = False,
+    on_progress: Optional[Callable[[Job], None]] = None,
+    **kwargs,
+):
+    """
+    Run a job in the shared pool and await its result from a coroutine, e.g. an async tool.
+
+    Args:
+        fn (Callable): Module-level function that accepts a `progress` keyword.
+        inline (bool): Run it in the current thread instead (see `ProcessPool.submit`).
+        on_progress (Callable[[Job], None]): Called on the event loop with each progress report.
+
+    Returns:
+        The job's return value. Cancelling the awaiting task cancels the job.
+    """
+    callback = None
+    if on_progress is not None:
+        loop = asyncio.get_running_loop()
+        callback = lambda job: loop.call_soon_threadsafe(on_progress, job)
+    job = get_process_pool().submit(fn, *args, on_progress=callback, inline=inline, **kwargs)
+    return await job.wait()
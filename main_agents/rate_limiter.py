@@ -0,0 +1,339 @@
+"""
+Process-wide client-side rate limiting for Gemini and RAG calls.
+
+Every model (Gemini or embedding) gets one shared limiter per process, so all
+`Gemini` instances and `rag_query` calls draw from the same budget instead of
+discovering the quota through 429 responses.
+"""
+
+import asyncio
+import collections
+import contextlib
+import logging
+import threading
+import time
+
+from .config import (
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_MIN_CONCURRENT_REQUESTS,
+    DEFAULT_MODEL_BURST,
+    DEFAULT_MODEL_REQUESTS_PER_MIN,
+    MODEL_BURST,
+    MODEL_REQUESTS_PER_MIN,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that hands out one token per request.
+
+    Args:
+        requests_per_min (float): Sustained request budget.
+        burst (float): Maximum number of tokens that can accumulate.
+    """
+
+    def __init__(self, requests_per_min: float, burst: float = None):
+        self.rate = requests_per_min / 60.0
+        self.capacity = burst if burst is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """
+        Take one token, going into debt if none is available.
+
+        Returns:
+            float: Seconds the caller must wait before using the token.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def drain(self) -> None:
+        """Drop all accumulated tokens so the next callers wait for a refill."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, 0.0)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency window: grows by one slot per window of successes and is
+    cut multiplicatively on throttling, at most once per cooldown period.
+
+    Args:
+        initial (int): Starting number of in-flight requests allowed.
+        minimum (int): Lower bound for the window.
+        maximum (int): Upper bound for the window.
+        decrease_factor (float): Multiplier applied to the window on a 429.
+        cooldown (float): Seconds during which further 429s don't shrink the window again.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int = 1,
+        maximum: int = 64,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._limit = float(max(minimum, min(initial, maximum)))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        # (loop, future) of coroutines waiting for a slot, woken one at a time like the threads
+        self._async_waiters: collections.deque = collections.deque()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self._in_flight < int(self._limit):
+                self._in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    async def acquire_async(self) -> None:
+        """Wait for a slot without blocking the event loop; woken by `release` and `on_success`."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._cond:
+                if self._in_flight < int(self._limit):
+                    self._in_flight += 1
+                    return
+                waiter = (loop, loop.create_future())
+                self._async_waiters.append(waiter)
+            try:
+                await waiter[1]
+            except asyncio.CancelledError:
+                with self._cond:
+                    if waiter in self._async_waiters:
+                        self._async_waiters.remove(waiter)
+                    else:
+                        # Already woken: pass the wake-up on so that the free slot isn't left idle
+                        self._notify()
+                raise
+
+    def _notify(self) -> None:
+        """Wake one waiting thread and one waiting coroutine; called with `_cond` held."""
+        self._cond.notify()
+        if self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(_wake, future)
+
+    def release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._notify()
+
+    def on_success(self) -> None:
+        with self._cond:
+            grew = int(self._limit + 1.0 / self._limit) > int(self._limit)
+            self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+            if grew:
+                self._notify()
+
+    def on_throttle(self) -> bool:
+        """
+        Shrink the window after a 429.
+
+        Returns:
+            bool: True if the window was reduced, False if still in cooldown.
+        """
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease < self.cooldown:
+                return False
+            self._last_decrease = now
+            self._limit = max(self.minimum, self._limit * self.decrease_factor)
+            return True
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class RateLimiter:
+    """
+    Token bucket plus adaptive concurrency for a single model budget.
+
+    Use `limit()` from synchronous code and `alimit()` from coroutines. Report
+    the outcome of every call with `record_success()` or `record_throttle()`.
+
+    Args:
+        name (str): Model or backend name, used in logs and stats.
+        requests_per_min (float): Request budget for this model.
+        max_concurrency (int): Upper bound for in-flight requests.
+        min_concurrency (int): Lower bound for in-flight requests.
+        burst (float): Requests let through at once before the sustained rate applies.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_min: float,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+        min_concurrency: int = DEFAULT_MIN_CONCURRENT_REQUESTS,
+        burst: float = DEFAULT_MODEL_BURST,
+    ):
+        self.name = name
+        self.requests_per_min = requests_per_min
+        self.bucket = TokenBucket(requests_per_min, burst=burst)
+        self.concurrency = AdaptiveConcurrency(
+            initial=max_concurrency,
+            minimum=min_concurrency,
+            maximum=max_concurrency,
+        )
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._throttled = 0
+        self._wait_seconds = 0.0
+
+    def _account(self, waited: float) -> None:
+        with self._stats_lock:
+            self._requests += 1
+            self._wait_seconds += waited
+
+    @contextlib.contextmanager
+    def limit(self):
+        """Block the current thread until a concurrency slot and a token are available."""
+        start = time.monotonic()
+        self.concurrency.acquire()
+        try:
+            delay = self.bucket.reserve()
+            if delay:
+                time.sleep(delay)
+            self._account(time.monotonic() - start)
+            yield self
+        finally:
+            self.concurrency.release()
+
+    @contextlib.asynccontextmanager
+    async def alimit(self):
+        """Wait without blocking the event loop until a slot and a token are available."""
+        start = time.monotonic()
+        await self.concurrency.acquire_async()
+        try:
+            delay = self.bucket.reserve()
+            if delay:
+                await asyncio.sleep(delay)
+            self._account(time.monotonic() - start)
+            yield self
+        finally:
+            self.concurrency.release()
+
+    def record_success(self) -> None:
+        self.concurrency.on_success()
+
+    def record_throttle(self) -> None:
+        """Back off after a 429: shrink the window and pause the bucket."""
+        with self._stats_lock:
+            self._throttled += 1
+        if self.concurrency.on_throttle():
+            self.bucket.drain()
+            logger.warning(
+                f"Rate limit hit for '{self.name}', concurrency reduced to {self.concurrency.limit}"
+            )
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "name": self.name,
+                "requests_per_min": self.requests_per_min,
+                "burst": self.bucket.capacity,
+                "concurrency_limit": self.concurrency.limit,
+                "in_flight": self.concurrency.in_flight,
+                "requests": self._requests,
+                "throttled": self._throttled,
+                "wait_seconds": round(self._wait_seconds, 3),
+            }
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model: str) -> RateLimiter:
+    """
+    Return the process-wide limiter for a model, creating it on first use.
+
+    Args:
+        model (str): Model name, e.g. "gemini-2.5-flash" or DEFAULT_EMBEDDING_MODEL.
+
+    Returns:
+        RateLimiter: The shared limiter for that model's budget.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            requests_per_min = MODEL_REQUESTS_PER_MIN.get(model, DEFAULT_MODEL_REQUESTS_PER_MIN)
+            limiter = RateLimiter(model, requests_per_min, burst=MODEL_BURST.get(model, DEFAULT_MODEL_BURST))
+            _limiters[model] = limiter
+        return limiter
+
+
+def set_rate_limiter(
+    model: str,
+    requests_per_min: float,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+    burst: float = DEFAULT_MODEL_BURST,
+) -> RateLimiter:
+    """
+    Replace the process-wide limiter for a model, e.g. to give a simulated model its own budget.
+
+    Args:
+        model (str): Model name.
+        requests_per_min (float): Request budget.
+        max_concurrency (int): Upper bound for in-flight requests.
+        burst (float): Requests let through at once before the sustained rate applies.
+
+    Returns:
+        RateLimiter: The new limiter.
+    """
+    with _limiters_lock:
+        limiter = RateLimiter(model, requests_per_min, max_concurrency=max_concurrency, burst=burst)
+        _limiters[model] = limiter
+        return limiter
+
+
+def get_rate_limiter_stats() -> list[dict]:
+    """Snapshot of every limiter created in this process."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return [limiter.stats() for limiter in limiters]
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True if the exception is a 429 / RESOURCE_EXHAUSTED from Vertex AI or google-genai."""
+    code = getattr(error, "code", None)
+    if code == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    return "429" in str(error) or "RESOURCE_EXHAUSTED" in str(error)
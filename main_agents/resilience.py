@@ -0,0 +1,489 @@
+"""
+Deadline-aware retries, hedged requests and circuit breaking for backend calls.
+
+A session deadline is set with `session_deadline()` and inherited by every call
+made inside it (including sub-agents, since it lives in a context variable).
+Each call is further bounded by its own timeout, and retries never sleep past
+whichever deadline comes first.
+"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import AsyncContextManager, Awaitable, Callable, Optional, TypeVar
+
+from .config import (
+    DEFAULT_BREAKER_FAILURE_THRESHOLD,
+    DEFAULT_BREAKER_RESET_TIMEOUT,
+    DEFAULT_CALL_TIMEOUT,
+    DEFAULT_RETRY_ATTEMPTS,
+    DEFAULT_RETRY_INITIAL_DELAY,
+    DEFAULT_RETRY_MAX_DELAY,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+_TRANSIENT_STATUS_NAMES = {"RESOURCE_EXHAUSTED", "UNAVAILABLE", "DEADLINE_EXCEEDED", "INTERNAL"}
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call or session runs out of time budget."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the backend while its circuit breaker is open."""
+
+
+class Deadline:
+    """
+    Absolute point in time by which work must be finished.
+
+    Args:
+        timeout (float): Seconds from now. None means no deadline.
+    """
+
+    def __init__(self, timeout: Optional[float]):
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+
+    def remaining(self) -> Optional[float]:
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def bounded(self, timeout: Optional[float]) -> "Deadline":
+        """Return the earlier of this deadline and `timeout` seconds from now."""
+        remaining = self.remaining()
+        if timeout is None:
+            return self
+        if remaining is not None and remaining < timeout:
+            timeout = remaining
+        return Deadline(timeout)
+
+
+_session_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    "session_deadline", default=None
+)
+
+
+@contextlib.contextmanager
+def session_deadline(timeout: Optional[float]):
+    """Set the deadline inherited by every call made within this context."""
+    token = _session_deadline.set(Deadline(timeout))
+    try:
+        yield _session_deadline.get()
+    finally:
+        _session_deadline.reset(token)
+
+
+def call_deadline(timeout: Optional[float] = DEFAULT_CALL_TIMEOUT) -> Deadline:
+    """Deadline for a single call: its own timeout, capped by the session deadline."""
+    session = _session_deadline.get()
+    if session is None:
+        return Deadline(timeout)
+    return session.bounded(timeout)
+
+
+@dataclass
+class RetryPolicy:
+    """Capped exponential backoff with full jitter."""
+
+    attempts: int = DEFAULT_RETRY_ATTEMPTS
+    initial_delay: float = DEFAULT_RETRY_INITIAL_DELAY
+    max_delay: float = DEFAULT_RETRY_MAX_DELAY
+    exp_base: float = 2.0
+    call_timeout: Optional[float] = DEFAULT_CALL_TIMEOUT
+
+    def backoff(self, attempt: int, deadline: Deadline) -> Optional[float]:
+        """
+        Delay before the next attempt.
+
+        Returns:
+            Optional[float]: Seconds to sleep, or None if the deadline would be passed.
+        """
+        cap = min(self.max_delay, self.initial_delay * self.exp_base ** (attempt - 1))
+        delay = random.uniform(0, cap)
+        remaining = deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `failure_threshold` consecutive failures; after
+    `reset_timeout` seconds one probe call is let through (half-open) and its
+    outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = DEFAULT_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_BREAKER_RESET_TIMEOUT,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release(self) -> None:
+        """End a call that says nothing about the backend's health, e.g. a rejected request."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit '{self.name}' opened after {self._failures} failure(s)")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ResilienceMetrics:
+    """Thread-safe counters for one backend."""
+
+    FIELDS = (
+        "calls",
+        "successes",
+        "failures",
+        "retries",
+        "deadline_exceeded",
+        "circuit_rejections",
+        "hedges_launched",
+        "hedges_won",
+        "abandoned",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+        self._backoff_seconds = 0.0
+
+    def incr(self, field: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[field] += amount
+
+    def add_backoff(self, seconds: float) -> None:
+        with self._lock:
+            self._backoff_seconds += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self._counts, "backoff_seconds": round(self._backoff_seconds, 3)}
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_metrics: dict[str, ResilienceMetrics] = {}
+_registry_lock = threading.Lock()
+
+# Shared pool for sync calls that need a timeout or a hedge
+_executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="resilience")
+
+
+def get_circuit_breaker(backend: str) -> CircuitBreaker:
+    with _registry_lock:
+        if backend not in _breakers:
+            _breakers[backend] = CircuitBreaker(backend)
+        return _breakers[backend]
+
+
+def get_metrics(backend: str) -> ResilienceMetrics:
+    with _registry_lock:
+        if backend not in _metrics:
+            _metrics[backend] = ResilienceMetrics()
+        return _metrics[backend]
+
+
+def get_resilience_metrics() -> dict:
+    """Counters and breaker state for every backend used in this process."""
+    with _registry_lock:
+        backends = sorted(set(_metrics) | set(_breakers))
+    return {
+        backend: {
+            **get_metrics(backend).snapshot(),
+            "circuit_state": get_circuit_breaker(backend).state,
+        }
+        for backend in backends
+    }
+
+
+def _status(error: Exception):
+    code = getattr(error, "code", None)
+    if callable(code):
+        code = code()
+    return getattr(code, "name", None) if code is not None and not isinstance(code, int) else code
+
+
+def is_transient_error(error: Exception) -> bool:
+    """True for timeouts, connection errors and 429/5xx responses."""
+    if isinstance(error, (TimeoutError, ConnectionError, concurrent.futures.TimeoutError)):
+        return True
+    status = _status(error)
+    if status is None:
+        status = getattr(error, "status_code", None)
+    return status in _TRANSIENT_STATUS_CODES or status in _TRANSIENT_STATUS_NAMES
+
+
+def _wait_first_success(futures: list, deadline: Deadline):
+    """Return (index, result) of the first future to succeed, or raise the last error."""
+    pending = set(futures)
+    error = None
+    while pending:
+        done, pending = concurrent.futures.wait(
+            pending, timeout=deadline.remaining(), return_when=concurrent.futures.FIRST_COMPLETED
+        )
+        if not done:
+            raise DeadlineExceeded("Call deadline exceeded")
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return futures.index(future), future.result()
+            error = future.exception()
+    raise error
+
+
+def _attempt(fn: Callable[[], T], deadline: Deadline, hedge_after: Optional[float], metrics) -> T:
+    if deadline.remaining() is None and hedge_after is None:
+        return fn()
+
+    futures = [_executor.submit(fn)]
+    if hedge_after is not None:
+        remaining = deadline.remaining()
+        wait = hedge_after if remaining is None else min(hedge_after, remaining)
+        done, _ = concurrent.futures.wait(futures, timeout=wait)
+        if not done and not deadline.expired():
+            metrics.incr("hedges_launched")
+            futures.append(_executor.submit(fn))
+    try:
+        index, result = _wait_first_success(futures, deadline)
+    except DeadlineExceeded:
+        for future in futures:
+            # Queued attempts never start; running ones can't be interrupted and are left to finish
+            if not future.cancel() and not future.done():
+                metrics.incr("abandoned")
+        raise
+    if index > 0:
+        metrics.incr("hedges_won")
+    return result
+
+
+def call_with_retries(
+    fn: Callable[[], T],
+    backend: str,
+    policy: Optional[RetryPolicy] = None,
+    is_retryable: Callable[[Exception], bool] = is_transient_error,
+    hedge_after: Optional[float] = None,
+) -> T:
+    """
+    Run a synchronous call with deadline-aware retries and a circuit breaker.
+
+    Args:
+        fn (Callable): Zero-argument function performing the call.
+        backend (str): Name used for the circuit breaker and metrics, e.g. "vertex_rag".
+        policy (RetryPolicy): Attempts, backoff and per-call timeout. Defaults from config.
+        is_retryable (Callable): Decides whether an exception is worth retrying.
+        hedge_after (float): Only for idempotent calls. If the call hasn't finished after
+                             this many seconds, send a duplicate and keep the first result.
+
+    Returns:
+        The value returned by `fn`.
+
+    Raises:
+        CircuitOpenError: The backend is considered down.
+        DeadlineExceeded: The call or session deadline passed.
+
+    A thread can't be interrupted, so an attempt still running at the deadline is abandoned
+    (counted in "abandoned") and runs until `fn` returns. Whatever `fn` holds stays held
+    until then, e.g. its rate limiter slot: the request is still in flight at the backend,
+    so abandoned attempts count against the limiter's concurrency window, which also bounds
+    how many of them can pile up. Use `acall_with_retries` for calls that can be cancelled.
+    """
+    policy = policy or RetryPolicy()
+    breaker = get_circuit_breaker(backend)
+    metrics = get_metrics(backend)
+    deadline = call_deadline(policy.call_timeout)
+
+    for attempt in range(1, policy.attempts + 1):
+        if not breaker.allow():
+            metrics.incr("circuit_rejections")
+            raise CircuitOpenError(f"Circuit for '{backend}' is open; failing fast")
+        metrics.incr("calls")
+        try:
+            result = _attempt(fn, deadline, hedge_after, metrics)
+        except DeadlineExceeded:
+            metrics.incr("deadline_exceeded")
+            breaker.record_failure()
+            raise
+        except Exception as e:
+            if not is_retryable(e):
+                breaker.release()
+                raise
+            metrics.incr("failures")
+            breaker.record_failure()
+            delay = policy.backoff(attempt, deadline) if attempt < policy.attempts else None
+            if delay is None:
+                if deadline.expired():
+                    metrics.incr("deadline_exceeded")
+                raise
+            metrics.incr("retries")
+            metrics.add_backoff(delay)
+            logger.warning(f"Retrying '{backend}' in {delay:.2f}s after: {e}")
+            time.sleep(delay)
+            continue
+        metrics.incr("successes")
+        breaker.record_success()
+        return result
+
+    raise DeadlineExceeded(f"No attempts left for '{backend}'")
+
+
+async def _aattempt(fn: Callable[[], Awaitable[T]], deadline: Deadline, hedge_after: Optional[float], metrics) -> T:
+    tasks = [asyncio.ensure_future(fn())]
+    try:
+        async with asyncio.timeout(deadline.remaining()):
+            if hedge_after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    metrics.incr("hedges_launched")
+                    tasks.append(asyncio.ensure_future(fn()))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            metrics.incr("hedges_won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+    except TimeoutError as e:
+        raise DeadlineExceeded("Call deadline exceeded") from e
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def acall_with_retries(
+    fn: Callable[[], Awaitable[T]],
+    backend: str,
+    policy: Optional[RetryPolicy] = None,
+    is_retryable: Callable[[Exception], bool] = is_transient_error,
+    hedge_after: Optional[float] = None,
+    admit: Optional[Callable[[], AsyncContextManager]] = None,
+) -> T:
+    """
+    Async counterpart of `call_with_retries`: the attempts, hedges and backoff are awaited
+    instead of blocking the event loop, and an attempt past its deadline is cancelled.
+
+    Args:
+        fn (Callable): Zero-argument coroutine function performing the call.
+        backend (str): Name used for the circuit breaker and metrics, e.g. "vertex_rag".
+        policy (RetryPolicy): Attempts, backoff and per-call timeout. Defaults from config.
+        is_retryable (Callable): Decides whether an exception is worth retrying.
+        hedge_after (float): Only for idempotent calls. If the call hasn't finished after
+                             this many seconds, send a duplicate and keep the first result.
+        admit (Callable): Local admission held for each attempt, e.g. a rate limiter's `alimit`.
+                          Waiting for it is bounded by the deadline but, since the backend was
+                          never asked, a timeout there doesn't count as a backend failure.
+
+    Returns:
+        The value returned by `fn`.
+
+    Raises:
+        CircuitOpenError: The backend is considered down.
+        DeadlineExceeded: The call or session deadline passed.
+    """
+    policy = policy or RetryPolicy()
+    breaker = get_circuit_breaker(backend)
+    metrics = get_metrics(backend)
+    deadline = call_deadline(policy.call_timeout)
+
+    for attempt in range(1, policy.attempts + 1):
+        if not breaker.allow():
+            metrics.incr("circuit_rejections")
+            raise CircuitOpenError(f"Circuit for '{backend}' is open; failing fast")
+        metrics.incr("calls")
+        admitted = False
+        try:
+            async with contextlib.AsyncExitStack() as admission:
+                if admit is not None:
+                    async with asyncio.timeout(deadline.remaining()):
+                        await admission.enter_async_context(admit())
+                admitted = True
+                result = await _aattempt(fn, deadline, hedge_after, metrics)
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except TimeoutError as e:
+            metrics.incr("deadline_exceeded")
+            if not admitted:
+                # Queued behind local calls: the backend was never asked
+                breaker.release()
+                raise DeadlineExceeded(f"Call to '{backend}' exceeded its deadline before admission") from e
+            breaker.record_failure()
+            raise
+        except Exception as e:
+            if not is_retryable(e):
+                breaker.release()
+                raise
+            metrics.incr("failures")
+            breaker.record_failure()
+            delay = policy.backoff(attempt, deadline) if attempt < policy.attempts else None
+            if delay is None:
+                if deadline.expired():
+                    metrics.incr("deadline_exceeded")
+                raise
+            metrics.incr("retries")
+            metrics.add_backoff(delay)
+            logger.warning(f"Retrying '{backend}' in {delay:.2f}s after: {e}")
+            await asyncio.sleep(delay)
+            continue
+        metrics.incr("successes")
+        breaker.record_success()
+        return result
+
+    raise DeadlineExceeded(f"No attempts left for '{backend}'")
@@ -0,0 +1,231 @@
+"""
+Offline evaluation of retrieval settings against a labelled question set.
+
+Each question in `retrieval_eval_set.json` names the documentation sections
+(markdown headings) that answer it. For every chunk size / overlap pair the
+document is chunked and indexed in a throwaway local corpus. Every question is
+then retrieved once, and each top_k / distance threshold pair is scored from
+that ranking:
+
+- recall@k: share of the expected sections covered by the returned chunks
+- MRR: 1 / rank of the first chunk that overlaps an expected section
+- tokens: context returned per question (words, as in `chunk_text`)
+- p50/p95 latency of the search. Question embeddings are computed once, before
+  the sweep, so every configuration is timed on the search alone
+
+Embeddings go through the cached `embed_texts`, so only the first sweep pays
+for them. Run with `python -m main_agents.retrieval_eval`.
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import (
+    DEFAULT_CHUNK_OVERLAP,
+    DEFAULT_CHUNK_SIZE,
+    DEFAULT_DISTANCE_THRESHOLD,
+    DEFAULT_TOP_K,
+)
+from .embeddings import RETRIEVAL_QUERY, embed_texts
+from .local_corpus import LocalCorpus, chunk_text
+
+_EVAL_SET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "retrieval_eval_set.json")
+
+
+@dataclass
+class EvalResult:
+    """Scores of one parameter combination."""
+
+    chunk_size: int
+    chunk_overlap: int
+    top_k: int
+    distance_threshold: float
+    chunks: int
+    recall: float
+    mrr: float
+    mean_tokens: float
+    p50_ms: float
+    p95_ms: float
+
+
+def section_spans(text: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Word range of every markdown section, from its heading to the next heading of
+    the same or a higher level (so a section includes its subsections). A repeated
+    heading, e.g. "Endpoints", keeps its first occurrence.
+
+    Returns:
+        Dict[str, Tuple[int, int]]: e.g. {"Create Customer": (412, 540)}, end exclusive.
+    """
+    headings = []
+    position = 0
+    in_code = False
+    for line in text.splitlines():
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        elif not in_code and line.startswith("#"):
+            level = len(line) - len(line.lstrip("#"))
+            headings.append((line.lstrip("#").strip(), level, position))
+        position += len(line.split())
+
+    spans = {}
+    for i, (title, level, start) in enumerate(headings):
+        end = position
+        for _, next_level, next_start in headings[i + 1:]:
+            if next_level <= level:
+                end = next_start
+                break
+        spans.setdefault(title, (start, end))
+    return spans
+
+
+def chunk_spans(word_count: int, chunk_size: int, overlap: int) -> List[Tuple[int, int]]:
+    """Word range of each chunk produced by `chunk_text` for a text of `word_count` words."""
+    step = max(1, chunk_size - overlap)
+    spans = []
+    for start in range(0, word_count, step):
+        spans.append((start, min(start + chunk_size, word_count)))
+        if start + chunk_size >= word_count:
+            break
+    return spans
+
+
+def load_eval_set(path: str = _EVAL_SET_PATH) -> Tuple[str, List[dict]]:
+    """Document text and labelled questions. The document path is relative to the eval set."""
+    with open(path, encoding="utf-8") as file:
+        eval_set = json.load(file)
+    document = os.path.join(os.path.dirname(os.path.abspath(path)), eval_set["document"])
+    with open(document, encoding="utf-8") as file:
+        return file.read(), eval_set["questions"]
+
+
+def _percentile_ms(latencies: List[float], percentile: float) -> float:
+    return round(float(np.percentile(latencies, percentile)) * 1000, 2) if latencies else 0.0
+
+
+def evaluate(
+    chunk_sizes: Sequence[int] = (128, 256, DEFAULT_CHUNK_SIZE),
+    overlaps: Sequence[int] = (0, DEFAULT_CHUNK_OVERLAP),
+    top_ks: Sequence[int] = (1, DEFAULT_TOP_K, 5),
+    thresholds: Sequence[float] = (0.3, DEFAULT_DISTANCE_THRESHOLD, 0.7),
+    eval_set_path: str = _EVAL_SET_PATH,
+) -> List[EvalResult]:
+    """
+    Sweep retrieval parameters over the labelled question set.
+
+    Args:
+        chunk_sizes (Sequence[int]): Chunk sizes in words.
+        overlaps (Sequence[int]): Chunk overlaps in words; pairs with overlap >= size are skipped.
+        top_ks (Sequence[int]): Result counts.
+        thresholds (Sequence[float]): Maximum cosine distances.
+        eval_set_path (str): Labelled question set.
+
+    Returns:
+        List[EvalResult]: One row per combination.
+    """
+    text, questions = load_eval_set(eval_set_path)
+    sections = section_spans(text)
+    for question in questions:
+        unknown = [section for section in question["sections"] if section not in sections]
+        if unknown:
+            raise ValueError(f"Unknown sections {unknown} in question: {question['question']}")
+
+    # Embedded up front: otherwise the first configuration pays for the embeddings and the rest hit the cache
+    question_vectors = embed_texts([question["question"] for question in questions], RETRIEVAL_QUERY)
+
+    results = []
+    max_k = max(top_ks)
+    for chunk_size in chunk_sizes:
+        for overlap in overlaps:
+            if overlap >= chunk_size:
+                continue
+            chunks = chunk_text(text, chunk_size, overlap)
+            spans = chunk_spans(len(text.split()), chunk_size, overlap)
+            # Sections each chunk overlaps; chunks are matched back by their text
+            chunk_sections = {}
+            for chunk, (start, end) in zip(chunks, spans):
+                chunk_sections.setdefault(chunk, set()).update(
+                    title for title, (section_start, section_end) in sections.items()
+                    if start < section_end and section_start < end
+                )
+
+            with tempfile.TemporaryDirectory() as directory:
+                corpus = LocalCorpus(f"eval-{chunk_size}-{overlap}", directory)
+                try:
+                    corpus.add_texts("eval", chunks)
+                    rankings, latencies = [], []
+                    for question, vector in zip(questions, question_vectors):
+                        start = time.perf_counter()
+                        # 2.0 is the largest cosine distance: keep everything, thresholds are applied below
+                        rankings.append(corpus.search_many(vector[None], [(question["question"], max_k, 2.0, None)])[0])
+                        latencies.append(time.perf_counter() - start)
+                finally:
+                    corpus.close()
+
+            for top_k in top_ks:
+                for threshold in thresholds:
+                    recalls, reciprocal_ranks, tokens = [], [], []
+                    for question, ranking in zip(questions, rankings):
+                        returned = [hit for hit in ranking[:top_k] if hit["score"] <= threshold]
+                        expected = set(question["sections"])
+                        covered = set()
+                        reciprocal_rank = 0.0
+                        for rank, hit in enumerate(returned, start=1):
+                            relevant = chunk_sections.get(hit["text"], set()) & expected
+                            if relevant and not reciprocal_rank:
+                                reciprocal_rank = 1.0 / rank
+                            covered |= relevant
+                        recalls.append(len(covered) / len(expected))
+                        reciprocal_ranks.append(reciprocal_rank)
+                        tokens.append(sum(len(hit["text"].split()) for hit in returned))
+                    results.append(EvalResult(
+                        chunk_size=chunk_size,
+                        chunk_overlap=overlap,
+                        top_k=top_k,
+                        distance_threshold=threshold,
+                        chunks=len(chunks),
+                        recall=round(float(np.mean(recalls)), 4),
+                        mrr=round(float(np.mean(reciprocal_ranks)), 4),
+                        mean_tokens=round(float(np.mean(tokens)), 1),
+                        p50_ms=_percentile_ms(latencies, 50),
+                        p95_ms=_percentile_ms(latencies, 95),
+                    ))
+    return results
+
+
+def format_table(results: List[EvalResult]) -> str:
+    """Results as a fixed-width table, best recall first, then fewest tokens."""
+    columns = list(EvalResult.__dataclass_fields__)
+    rows = [asdict(result) for result in sorted(results, key=lambda r: (-r.recall, -r.mrr, r.mean_tokens))]
+    widths = {column: max(len(column), *(len(str(row[column])) for row in rows)) for column in columns}
+    lines = ["  ".join(column.rjust(widths[column]) for column in columns)]
+    lines += ["  ".join(str(row[column]).rjust(widths[column]) for column in columns) for row in rows]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Sweep chunking and retrieval settings over a labelled question set")
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[64, 128, 256, DEFAULT_CHUNK_SIZE])
+    parser.add_argument("--overlaps", type=int, nargs="+", default=[0, 32, DEFAULT_CHUNK_OVERLAP])
+    parser.add_argument("--top-k", type=int, nargs="+", default=[1, DEFAULT_TOP_K, 5])
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.3, DEFAULT_DISTANCE_THRESHOLD, 0.7])
+    parser.add_argument("--eval-set", default=_EVAL_SET_PATH, help="labelled question set (JSON)")
+    parser.add_argument("--output", help="also write the results as JSON to this path")
+    args = parser.parse_args(argv)
+
+    results = evaluate(args.chunk_sizes, args.overlaps, args.top_k, args.thresholds, args.eval_set)
+    print(format_table(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump([asdict(result) for result in results], file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,7 @@ from .add_data import add_data
 from .create_corpus import create_corpus
 from .get_corpus_info import get_corpus_info
 from .rag_query import rag_query
-from .utils import check_corpus_exists, get_corpus_resource_name, set_current_corpus
+from .utils import check_corpus_exists, get_corpus_resource_name, resolve_corpora_by_tag, set_current_corpus
 
 __all__ = [
     "add_data",
@@ -11,5 +11,6 @@ __all__ = [
     "rag_query",
     "check_corpus_exists",
     "get_corpus_resource_name",
+    "resolve_corpora_by_tag",
     "set_current_corpus",
 ]
@@ -1,9 +1,11 @@
 """
-Tool for adding new data sources to a Vertex AI RAG corpus.
+Tool for adding new data sources to a Vertex AI RAG corpus (or the local corpus).
 """
 
+import asyncio
+import os
 import re
-from typing import List
+from typing import List, Optional
 
 from google.adk.tools.tool_context import ToolContext
 from vertexai import rag
@@ -11,13 +13,31 @@ from vertexai import rag
 from main_agents.config import (
     DEFAULT_CHUNK_OVERLAP,
     DEFAULT_CHUNK_SIZE,
+    DEFAULT_CORPUS_NAME,
     DEFAULT_EMBEDDING_REQUESTS_PER_MIN,
+    LOCAL_DOCS_DIR,
+    LOCAL_DOCS_EXTENSIONS,
 )
+from main_agents.local_corpus import get_local_corpus
 
 from .utils import check_corpus_exists, get_corpus_resource_name
 
 
-def add_data(
+def _local_path_rejection(path: str) -> Optional[str]:
+    """
+    Why a local path cannot be ingested, or None if it can: it must be a file under
+    LOCAL_DOCS_DIR (after resolving symlinks and "..") with one of LOCAL_DOCS_EXTENSIONS.
+    """
+    resolved = os.path.realpath(path)
+    docs_dir = os.path.realpath(LOCAL_DOCS_DIR)
+    if os.path.commonpath([resolved, docs_dir]) != docs_dir:
+        return f"Outside the docs directory {LOCAL_DOCS_DIR}"
+    if not resolved.lower().endswith(LOCAL_DOCS_EXTENSIONS):
+        return f"Unsupported extension, expected one of {', '.join(LOCAL_DOCS_EXTENSIONS)}"
+    return None
+
+
+async def add_data(
     corpus_name: str,
     paths: List[str],
     tool_context: ToolContext,
@@ -32,21 +52,14 @@ def add_data(
                           - Google Drive: "https://drive.google.com/file/d/{FILE_ID}/view"
                           - Google Docs/Sheets/Slides: "https://docs.google.com/{type}/d/{FILE_ID}/..."
                           - Google Cloud Storage: "gs://{BUCKET}/{PATH}"
+                          - Local files: "main_agents/api_docs.md" (added to the local corpus; only
+                            documentation files under LOCAL_DOCS_DIR are accepted)
                           Example: ["https://drive.google.com/file/d/123", "gs://my_bucket/my_files_dir"]
         tool_context (ToolContext): The tool context
 
     Returns:
         dict: Information about the added data and status
     """
-    # Check if the corpus exists
-    if not check_corpus_exists(corpus_name, tool_context):
-        return {
-            "status": "error",
-            "message": f"Corpus '{corpus_name}' does not exist. Please create it first using the create_corpus tool.",
-            "corpus_name": corpus_name,
-            "paths": paths,
-        }
-
     # Validate inputs
     if not paths or not all(isinstance(path, str) for path in paths):
         return {
@@ -58,6 +71,7 @@ def add_data(
 
     # Pre-process paths to validate and convert Google Docs URLs to Drive format if needed
     validated_paths = []
+    local_paths = []
     invalid_paths = []
     conversions = []
 
@@ -97,18 +111,59 @@ def add_data(
             validated_paths.append(path)
             continue
 
+        # Local files are indexed in the local corpus
+        if os.path.isfile(path):
+            rejection = _local_path_rejection(path)
+            if rejection:
+                invalid_paths.append(f"{path} ({rejection})")
+            else:
+                local_paths.append(path)
+            continue
+
         # If we're here, the path wasn't in a recognized format
         invalid_paths.append(f"{path} (Invalid format)")
 
     # Check if we have any valid paths after validation
-    if not validated_paths:
+    if not validated_paths and not local_paths:
         return {
             "status": "error",
-            "message": "No valid paths provided. Please provide Google Drive URLs or GCS paths.",
+            "message": "No valid paths provided. Please provide Google Drive URLs, GCS paths or local files.",
             "corpus_name": corpus_name,
             "invalid_paths": invalid_paths,
         }
 
+    local_result = {}
+    if local_paths:
+        try:
+            # Only new or changed files are embedded; the ANN index grows incrementally, and a
+            # (re)build is awaited in the process pool instead of blocking the event loop
+            local_result = await get_local_corpus(corpus_name or DEFAULT_CORPUS_NAME).aadd_files(local_paths)
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Error adding data to local corpus: {str(e)}",
+                "corpus_name": corpus_name,
+                "paths": local_paths,
+            }
+        if not validated_paths:
+            return {
+                "status": "success",
+                "message": f"Successfully added {local_result['files_added']} local file(s) to corpus '{corpus_name}'",
+                "corpus_name": corpus_name,
+                "paths": local_paths,
+                "invalid_paths": invalid_paths,
+                "local_corpus": local_result,
+            }
+
+    # Check if the corpus exists
+    if not check_corpus_exists(corpus_name, tool_context):
+        return {
+            "status": "error",
+            "message": f"Corpus '{corpus_name}' does not exist. Please create it first using the create_corpus tool.",
+            "corpus_name": corpus_name,
+            "paths": paths,
+        }
+
     try:
         # Get the corpus resource name
         corpus_resource_name = get_corpus_resource_name(corpus_name)
@@ -122,7 +177,8 @@ def add_data(
         )
 
         # Import files to the corpus
-        import_result = rag.import_files(
+        import_result = await asyncio.to_thread(
+            rag.import_files,
             corpus_resource_name,
             validated_paths,
             transformation_config=transformation_config,
@@ -146,6 +202,7 @@ def add_data(
             "paths": validated_paths,
             "invalid_paths": invalid_paths,
             "conversions": conversions,
+            "local_corpus": local_result,
         }
 
     except Exception as e:
@@ -4,6 +4,7 @@ import re
 from ..config import (
     DEFAULT_EMBEDDING_MODEL,
 )
+from .utils import invalidate_corpora_cache
 
 def create_corpus(corpus_name: str, tool_context:ToolContext) -> dict:
     """
@@ -33,6 +34,9 @@ def create_corpus(corpus_name: str, tool_context:ToolContext) -> dict:
                 rag_embedding_model_config=embedding_model_config
             ),
         )
+        # The new corpus must be found by display name right away
+        invalidate_corpora_cache()
+
         # Update state to track corpus existence
         tool_context.state[f"corpus_exists_{corpus_name}"] = True
 
@@ -1,96 +1,210 @@
 """
-Tool for querying Vertex AI RAG corpora and retrieving relevant information.
+Tool for querying Vertex AI RAG corpora (or the local corpus) and retrieving relevant information.
 """
 
+import asyncio
 import logging
+from typing import List, Optional
 
 from google.adk.tools.tool_context import ToolContext
 from vertexai import rag
 
 from ..config import (
     DEFAULT_DISTANCE_THRESHOLD,
+    DEFAULT_EMBEDDING_MODEL,
+    DEFAULT_FANOUT_TIMEOUT,
+    DEFAULT_RAG_HEDGE_AFTER,
     DEFAULT_TOP_K,
-    DEFAULT_CORPUS_NAME
+    DEFAULT_CORPUS_NAME,
+    RETRIEVAL_BACKEND,
 )
-from .utils import check_corpus_exists, get_corpus_resource_name
+from ..context_merge import count_tokens, merge_contexts
+from ..local_corpus import get_local_corpus, list_local_corpora
+from ..rate_limiter import get_rate_limiter, is_rate_limit_error
+from ..resilience import acall_with_retries, call_deadline
+from .utils import aget_corpus_resource_name, resolve_corpora_by_tag
 
 
-def rag_query(
+async def _vertex_results(corpus_resource_name: str, query: str) -> list:
+    """Retrieve contexts from the Vertex AI RAG corpus."""
+    # Configure retrieval parameters
+    rag_retrieval_config = rag.RagRetrievalConfig(
+        top_k=DEFAULT_TOP_K,
+        filter=rag.Filter(vector_distance_threshold=DEFAULT_DISTANCE_THRESHOLD),
+    )
+
+    # Perform the query (the query text is embedded, so it shares the embedding budget)
+    print("Performing retrieval query...")
+    limiter = get_rate_limiter(DEFAULT_EMBEDDING_MODEL)
+
+    async def retrieve():
+        try:
+            response = await rag.async_retrieve_contexts(
+                rag_resources=[
+                    rag.RagResource(
+                        rag_corpus=corpus_resource_name,
+                    )
+                ],
+                text=query,
+                rag_retrieval_config=rag_retrieval_config,
+            )
+        except Exception as e:
+            if is_rate_limit_error(e):
+                limiter.record_throttle()
+            raise
+        limiter.record_success()
+        return response
+
+    # Retrieval is idempotent, so slow calls may be hedged (a hedge shares its attempt's limiter slot).
+    # The slot is taken outside the attempt, so queueing for it isn't a failure of vertex_rag
+    response = await acall_with_retries(
+        retrieve, backend="vertex_rag", hedge_after=DEFAULT_RAG_HEDGE_AFTER, admit=limiter.alimit
+    )
+
+    # Process the response into a more usable format
+    results = []
+    if hasattr(response, "contexts") and response.contexts:
+        for ctx_group in response.contexts.contexts:
+            result = {
+                "source_uri": (
+                    ctx_group.source_uri if hasattr(ctx_group, "source_uri") else ""
+                ),
+                "source_name": (
+                    ctx_group.source_display_name
+                    if hasattr(ctx_group, "source_display_name")
+                    else ""
+                ),
+                "text": ctx_group.text if hasattr(ctx_group, "text") else "",
+                "score": ctx_group.score if hasattr(ctx_group, "score") else 0.0,
+            }
+            results.append(result)
+    return results
+
+
+async def _query_corpus(corpus_name: str, query: str) -> list:
+    """Retrieve contexts from one corpus with the configured backend."""
+    if RETRIEVAL_BACKEND == "local":
+        # Only corpora already on disk: an unknown name must not create an empty corpus directory
+        if corpus_name not in list_local_corpora():
+            raise ValueError(f"Local corpus '{corpus_name}' does not exist")
+        # Chunks added with add_data from local files, searched with the on-disk ANN index;
+        # awaiting the micro-batch lets concurrent sessions join it
+        return await get_local_corpus(corpus_name).aquery(query)
+    return await _vertex_results(await aget_corpus_resource_name(corpus_name), query)
+
+
+def _tag_corpus(corpus_name: str, results: list) -> list:
+    """
+    Tag each result with its corpus. Scores are left as raw cosine distances: every corpus is
+    embedded with DEFAULT_EMBEDDING_MODEL, so a distance means the same relevance in any corpus
+    and results from several corpora are ranked on it directly. (Rescaling per corpus would give
+    each corpus' best hit the same score, however weak it is.)
+    """
+    return [{**result, "corpus_name": corpus_name} for result in results]
+
+
+async def _fan_out(corpus_names: List[str], query: str) -> tuple:
+    """
+    Query several corpora concurrently, waiting at most DEFAULT_FANOUT_TIMEOUT
+    (capped by the session deadline).
+
+    Returns:
+        tuple: (results tagged with their corpus, {corpus: error} of failed corpora,
+                corpora dropped at the deadline)
+    """
+    tasks = {asyncio.ensure_future(_query_corpus(corpus_name, query)): corpus_name for corpus_name in corpus_names}
+    done, not_done = await asyncio.wait(tasks, timeout=call_deadline(DEFAULT_FANOUT_TIMEOUT).remaining())
+    for task in not_done:
+        task.cancel()
+
+    results, failed = [], {}
+    for task in done:
+        corpus_name = tasks[task]
+        if task.exception() is not None:
+            logging.warning(f"Error querying corpus '{corpus_name}': {task.exception()}")
+            failed[corpus_name] = str(task.exception())
+        else:
+            results.extend(_tag_corpus(corpus_name, task.result()))
+    timed_out = sorted(tasks[task] for task in not_done)
+    if timed_out:
+        logging.warning(f"Corpora dropped after {DEFAULT_FANOUT_TIMEOUT}s: {timed_out}")
+    return results, failed, timed_out
+
+
+async def rag_query(
     query: str,
     tool_context: ToolContext,
+    corpus_names: Optional[List[str]] = None,
+    tag: str = "",
 ) -> dict:
     """
-    Query a Vertex AI RAG corpus with a user question and return relevant information.
+    Query one or more RAG corpora with a user question and return relevant information.
 
     Args:
-        corpus_name (str): The name of the corpus to query. If empty, the current corpus will be used.
-                          Preferably use the resource_name from list_corpora results.
         query (str): The text query to search for in the corpus
         tool_context (ToolContext): The tool context
+        corpus_names (List[str]): Corpora to search, e.g. one per service and version. If empty,
+                                  the default corpus is used.
+        tag (str): Search every corpus whose name or description has this tag, e.g. "billing".
 
     Returns:
         dict: The query results and status
     """
+    corpora = list(dict.fromkeys(corpus_names or []))
     try:
-
-        # Get the corpus resource name
-        corpus_resource_name = get_corpus_resource_name(DEFAULT_CORPUS_NAME)
-
-        # Configure retrieval parameters
-        rag_retrieval_config = rag.RagRetrievalConfig(
-            top_k=DEFAULT_TOP_K,
-            filter=rag.Filter(vector_distance_threshold=DEFAULT_DISTANCE_THRESHOLD),
-        )
-
-        # Perform the query
-        print("Performing retrieval query...")
-        response = rag.retrieval_query(
-            rag_resources=[
-                rag.RagResource(
-                    rag_corpus=corpus_resource_name,
-                )
-            ],
-            text=query,
-            rag_retrieval_config=rag_retrieval_config,
-        )
-
-        # Process the response into a more usable format
-        results = []
-        if hasattr(response, "contexts") and response.contexts:
-            for ctx_group in response.contexts.contexts:
-                result = {
-                    "source_uri": (
-                        ctx_group.source_uri if hasattr(ctx_group, "source_uri") else ""
-                    ),
-                    "source_name": (
-                        ctx_group.source_display_name
-                        if hasattr(ctx_group, "source_display_name")
-                        else ""
-                    ),
-                    "text": ctx_group.text if hasattr(ctx_group, "text") else "",
-                    "score": ctx_group.score if hasattr(ctx_group, "score") else 0.0,
+        if tag:
+            corpora += [name for name in await resolve_corpora_by_tag(tag) if name not in corpora]
+            if not corpora:
+                return {
+                    "status": "warning",
+                    "message": f"No corpus found with tag '{tag}'",
+                    "query": query,
+                    "corpus_name": "",
+                    "results": [],
+                    "results_count": 0,
                 }
-                results.append(result)
+        corpora = corpora or [DEFAULT_CORPUS_NAME]
+        corpus_label = ", ".join(corpora)
+
+        failed, timed_out = {}, []
+        if len(corpora) == 1:
+            results = await _query_corpus(corpora[0], query)
+        else:
+            results, failed, timed_out = await _fan_out(corpora, query)
+            if not results and len(failed) == len(corpora):
+                raise RuntimeError("; ".join(f"{name}: {error}" for name, error in failed.items()))
 
         # If we didn't find any results
         if not results:
-            return {
+            response = {
                 "status": "warning",
-                "message": f"No results found in corpus '{DEFAULT_CORPUS_NAME}' for query: '{query}'",
+                "message": f"No results found in corpus '{corpus_label}' for query: '{query}'",
                 "query": query,
-                "corpus_name": DEFAULT_CORPUS_NAME,
+                "corpus_name": corpus_label,
                 "results": [],
                 "results_count": 0,
             }
+        else:
+            # Overlapping chunks of a source become one passage; near-duplicates are dropped
+            results, merge_stats = merge_contexts(results)
+            # Each corpus returned up to DEFAULT_TOP_K results; keep the global top-k
+            results = results[:DEFAULT_TOP_K]
 
-        return {
-            "status": "success",
-            "message": f"Successfully queried corpus '{DEFAULT_CORPUS_NAME}'",
-            "query": query,
-            "corpus_name": DEFAULT_CORPUS_NAME,
-            "results": results,
-            "results_count": len(results),
-        }
+            response = {
+                "status": "success",
+                "message": f"Successfully queried corpus '{corpus_label}'",
+                "query": query,
+                "corpus_name": corpus_label,
+                "results": results,
+                "results_count": len(results),
+                "tokens_retrieved": merge_stats["tokens_retrieved"],
+                "tokens_returned": sum(count_tokens(result["text"]) for result in results),
+            }
+        if failed:
+            response["failed_corpora"] = failed
+        if timed_out:
+            response["timed_out_corpora"] = timed_out
+        return response
 
     except Exception as e:
         error_msg = f"Error querying corpus: {str(e)}"
@@ -99,5 +213,5 @@ def rag_query(
             "status": "error",
             "message": error_msg,
             "query": query,
-            "corpus_name": DEFAULT_CORPUS_NAME,
+            "corpus_name": ", ".join(corpora) or DEFAULT_CORPUS_NAME,
         }
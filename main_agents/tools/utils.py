@@ -2,12 +2,20 @@
 Utility functions for the RAG tools.
 """
 
+import asyncio
 import logging
 import re
+import threading
+import time
+from typing import List
+
 from main_agents.config import (
+    DEFAULT_CORPUS_LIST_TTL,
     LOCATION,
     PROJECT_ID,
+    RETRIEVAL_BACKEND,
 )
+from main_agents.local_corpus import list_local_corpora
 from google.adk.tools.tool_context import ToolContext
 from vertexai import rag
 
@@ -15,6 +23,71 @@ from vertexai import rag
 logger = logging.getLogger(__name__)
 
 
+_corpora_cache = {"corpora": None, "expires": 0.0}
+_corpora_lock = threading.Lock()
+
+
+def _fresh_corpora():
+    """The cached corpus listing, or None if it has expired."""
+    with _corpora_lock:
+        if time.monotonic() < _corpora_cache["expires"]:
+            return _corpora_cache["corpora"]
+    return None
+
+
+def list_rag_corpora() -> list:
+    """
+    List the Vertex AI RAG corpora, reusing the listing for DEFAULT_CORPUS_LIST_TTL seconds.
+
+    Returns:
+        list: The corpora returned by `rag.list_corpora()`
+    """
+    corpora = _fresh_corpora()
+    if corpora is None:
+        corpora = list(rag.list_corpora())
+        with _corpora_lock:
+            _corpora_cache.update(corpora=corpora, expires=time.monotonic() + DEFAULT_CORPUS_LIST_TTL)
+    return corpora
+
+
+async def alist_rag_corpora() -> list:
+    """Async counterpart of `list_rag_corpora`: a listing request runs in a thread, off the event loop."""
+    corpora = _fresh_corpora()
+    if corpora is None:
+        corpora = await asyncio.to_thread(list_rag_corpora)
+    return corpora
+
+
+def invalidate_corpora_cache() -> None:
+    """Forget the cached listing, e.g. after a corpus was created."""
+    with _corpora_lock:
+        _corpora_cache.update(corpora=None, expires=0.0)
+
+
+def _resource_name(corpus_name: str, corpora: list) -> str:
+    # Check if this is a display name of an existing corpus
+    for corpus in corpora:
+        if hasattr(corpus, "display_name") and corpus.display_name == corpus_name:
+            return corpus.name
+
+    # If it contains partial path elements, extract just the corpus ID
+    if "/" in corpus_name:
+        # Extract the last part of the path as the corpus ID
+        corpus_id = corpus_name.split("/")[-1]
+    else:
+        corpus_id = corpus_name
+
+    # Remove any special characters that might cause issues
+    corpus_id = re.sub(r"[^a-zA-Z0-9_-]", "_", corpus_id)
+
+    # Construct the standardized resource name
+    return f"projects/{PROJECT_ID}/locations/{LOCATION}/ragCorpora/{corpus_id}"
+
+
+def _is_resource_name(corpus_name: str) -> bool:
+    return bool(re.match(r"^projects/[^/]+/locations/[^/]+/ragCorpora/[^/]+$", corpus_name))
+
+
 def get_corpus_resource_name(corpus_name: str) -> str:
     """
     Convert a corpus name to its full resource name if needed.
@@ -29,33 +102,71 @@ def get_corpus_resource_name(corpus_name: str) -> str:
     logger.info(f"Getting resource name for corpus: {corpus_name}")
 
     # If it's already a full resource name with the projects/locations/ragCorpora format
-    if re.match(r"^projects/[^/]+/locations/[^/]+/ragCorpora/[^/]+$", corpus_name):
+    if _is_resource_name(corpus_name):
         return corpus_name
 
-    # Check if this is a display name of an existing corpus
     try:
-        # List all corpora and check if there's a match with the display name
-        corpora = rag.list_corpora()
-        for corpus in corpora:
-            if hasattr(corpus, "display_name") and corpus.display_name == corpus_name:
-                return corpus.name
+        corpora = list_rag_corpora()
     except Exception as e:
         logger.warning(f"Error when checking for corpus display name: {str(e)}")
         # If we can't check, continue with the default behavior
-        pass
+        corpora = []
+    return _resource_name(corpus_name, corpora)
 
-    # If it contains partial path elements, extract just the corpus ID
-    if "/" in corpus_name:
-        # Extract the last part of the path as the corpus ID
-        corpus_id = corpus_name.split("/")[-1]
-    else:
-        corpus_id = corpus_name
 
-    # Remove any special characters that might cause issues
-    corpus_id = re.sub(r"[^a-zA-Z0-9_-]", "_", corpus_id)
+async def aget_corpus_resource_name(corpus_name: str) -> str:
+    """
+    Async counterpart of `get_corpus_resource_name` that doesn't block the event loop.
 
-    # Construct the standardized resource name
-    return f"projects/{PROJECT_ID}/locations/{LOCATION}/ragCorpora/{corpus_id}"
+    Args:
+        corpus_name (str): The corpus name or display name
+
+    Returns:
+        str: The full resource name of the corpus
+    """
+    if _is_resource_name(corpus_name):
+        return corpus_name
+
+    try:
+        corpora = await alist_rag_corpora()
+    except Exception as e:
+        logger.warning(f"Error when checking for corpus display name: {str(e)}")
+        corpora = []
+    return _resource_name(corpus_name, corpora)
+
+
+def _tag_tokens(text: str) -> set:
+    return {token for token in re.split(r"[^a-zA-Z0-9]+", text.lower()) if token}
+
+
+async def resolve_corpora_by_tag(tag: str) -> List[str]:
+    """
+    Find the corpora labelled with a tag.
+
+    Corpora are split per service and version (e.g. "billing-v2"), so a tag matches a
+    corpus when every word of the tag is a word of its display name or description:
+    "billing" matches "billing-v1" and "billing-v2", "billing v2" only the latter.
+
+    Args:
+        tag (str): Tag to look for, e.g. "billing" or "v2"
+
+    Returns:
+        List[str]: Display names of the matching corpora
+    """
+    wanted = _tag_tokens(tag)
+    if not wanted:
+        return []
+
+    if RETRIEVAL_BACKEND == "local":
+        return [name for name in list_local_corpora() if wanted <= _tag_tokens(name)]
+
+    matches = []
+    for corpus in await alist_rag_corpora():
+        display_name = getattr(corpus, "display_name", "") or ""
+        description = getattr(corpus, "description", "") or ""
+        if wanted <= _tag_tokens(display_name) | _tag_tokens(description):
+            matches.append(display_name or corpus.name)
+    return matches
 
 
 def check_corpus_exists(corpus_name: str, tool_context: ToolContext) -> bool:
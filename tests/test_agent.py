@@ -0,0 +1,50 @@
+import asyncio
+import sqlite3
+import unittest
+from unittest import mock
+
+from google.adk.agents import LlmAgent
+from google.adk.runners import Runner
+
+from main_agents import agent
+from main_agents.events import ERROR, FINAL_ANSWER, QUERY_END, QUERY_START
+from main_agents.load_test import LatencyModel, SimulatedGemini, SimulationProfile
+from main_agents.rate_limiter import set_rate_limiter
+from utils.results_store import get_results_store
+
+MODEL = "test-stream-llm"
+
+
+def _runner() -> Runner:
+    set_rate_limiter(MODEL, 1_000_000, max_concurrency=4)
+    profile = SimulationProfile(script={"solo": [{"text": "Done."}]}, latency=LatencyModel(median=0.0, p99=0.0))
+    solo = LlmAgent(name="solo", model=SimulatedGemini(model=MODEL, agent_name="solo", profile=profile))
+    return Runner(agent=solo, app_name=agent.APP_NAME, session_service=agent.session_service)
+
+
+class StreamSessionTest(unittest.IsolatedAsyncioTestCase):
+    async def collect(self, session_name: str) -> list:
+        stream = agent.stream_session(_runner(), "Hello?", session_name=session_name)
+        return [event async for event in stream]
+
+    async def test_events_arrive_in_order(self):
+        events = await asyncio.wait_for(self.collect("test-stream-order"), timeout=30)
+
+        types = [event.type for event in events]
+        self.assertEqual(types[0], QUERY_START)
+        self.assertIn(FINAL_ANSWER, types)
+        self.assertEqual(types[-1], QUERY_END)
+        self.assertIsNotNone(events[-1].data["time_to_final_answer"])
+
+    async def test_stream_ends_when_saving_the_results_fails(self):
+        error = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(get_results_store(), "flush", side_effect=error):
+            events = await asyncio.wait_for(self.collect("test-stream-flush"), timeout=30)
+
+        self.assertEqual(events[-1].type, ERROR)
+        self.assertIs(events[-1].exception, error)
+        self.assertIn(QUERY_END, [event.type for event in events])
+
+
+if __name__ == "__main__":
+    unittest.main()
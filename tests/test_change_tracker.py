@@ -0,0 +1,107 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from utils.change_tracker import ChangeTracker, table_watermark
+from utils.database_registry import Connection, get_registry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIBRARY = os.path.join(ROOT, "utils", "library_database.db")
+
+
+class TableWatermarkTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "watermark.db")
+        self.connection = sqlite3.connect(self.path, factory=Connection, isolation_level=None)
+        self.addCleanup(self.connection.close)
+        self.connection.execute("CREATE TABLE sales (id INTEGER PRIMARY KEY, amount REAL)")
+        self.connection.executemany("INSERT INTO sales (amount) VALUES (?)", [(i,) for i in range(40)])
+        self.statements = []
+        self.connection.set_trace_callback(self.statements.append)
+
+    def counts(self) -> int:
+        return sum("COUNT(*)" in statement for statement in self.statements)
+
+    def test_table_is_read_again_only_after_a_write(self):
+        self.assertEqual(table_watermark(self.connection, "sales"), (40, 40))
+        self.assertEqual(table_watermark(self.connection, "sales"), (40, 40))
+        self.assertEqual(self.counts(), 1)
+
+        # Writes from this connection don't change data_version
+        self.connection.execute("INSERT INTO sales (amount) VALUES (1)")
+        self.assertEqual(table_watermark(self.connection, "sales"), (41, 41))
+
+        other = sqlite3.connect(self.path, isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute("DELETE FROM sales WHERE id = 1")
+        self.assertEqual(table_watermark(self.connection, "sales"), (40, 41))
+        self.assertEqual(self.counts(), 3)
+
+    def test_attached_tables_are_cached_per_schema(self):
+        self.connection.execute("ATTACH DATABASE ':memory:' AS scratch")
+        self.connection.execute("CREATE TABLE scratch.notes (body TEXT)")
+
+        self.assertEqual(table_watermark(self.connection, "scratch.notes"), (0, None))
+        self.assertEqual(table_watermark(self.connection, "scratch.notes"), (0, None))
+        self.assertEqual(self.counts(), 1)
+
+
+class ChangeTrackerTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(directory.name, "library.db")
+        shutil.copy(LIBRARY, self.path)
+        self.name = f"test_tracker_{id(self)}"
+        get_registry().register(self.name, self.path)
+        self.tracker = self.open_tracker()
+
+    def open_tracker(self) -> ChangeTracker:
+        tracker = ChangeTracker(self.name, state_path=os.path.join(self.directory, "state.db"))
+        self.addCleanup(tracker.close)
+        return tracker
+
+    def write(self, *statements):
+        connection = sqlite3.connect(self.path)
+        for statement in statements:
+            connection.execute(statement)
+        connection.commit()
+        connection.close()
+
+    def test_diff_reports_tables_columns_and_rows(self):
+        first = self.tracker.check()
+        self.assertEqual(sorted(first["tables_added"]), ["books", "sales", "sales_details", "users"])
+        self.assertFalse(self.tracker.check()["changed"])
+
+        self.write(
+            "INSERT INTO users (name, email) VALUES ('Ana', 'ana@example.com')",
+            "DELETE FROM sales_details WHERE rowid IN (SELECT rowid FROM sales_details LIMIT 2)",
+            "ALTER TABLE books ADD COLUMN isbn TEXT",
+            "CREATE TABLE reviews (id INTEGER PRIMARY KEY, body TEXT)",
+        )
+        diff = self.tracker.check()
+
+        self.assertTrue(diff["changed"])
+        self.assertEqual(diff["tables_added"], ["reviews"])
+        self.assertEqual(diff["schema_changed"]["books"]["added_columns"], ["isbn"])
+        self.assertEqual(diff["rows_changed"]["users"]["inserted"], 1)
+        self.assertEqual(diff["rows_changed"]["sales_details"]["deleted"], 2)
+        self.assertNotIn("sales", diff["rows_changed"])
+
+    def test_changes_between_runs_are_detected(self):
+        self.tracker.check()
+        self.tracker.close()
+        self.write("DROP TABLE sales_details")
+
+        diff = self.open_tracker().check()
+        self.assertEqual(diff["tables_added"], [])
+        self.assertEqual(diff["tables_removed"], ["sales_details"])
+
+
+if __name__ == "__main__":
+    unittest.main()
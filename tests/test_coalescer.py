@@ -0,0 +1,47 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from main_agents.coalescer import MicroBatcher
+from main_agents.resilience import DeadlineExceeded, session_deadline
+
+
+class MicroBatcherTest(unittest.TestCase):
+    def test_coroutines_on_one_loop_share_a_batch(self):
+        sizes = []
+
+        def double(items):
+            sizes.append(len(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(double, max_wait=0.05, name="test-share")
+
+        async def main():
+            return await asyncio.gather(*(batcher.acall(item) for item in range(20)))
+
+        self.assertEqual(asyncio.run(main()), [item * 2 for item in range(20)])
+        self.assertEqual(sizes, [20])
+
+    def test_acall_stops_waiting_at_the_session_deadline(self):
+        release = threading.Event()
+
+        def slow(items):
+            release.wait(5)
+            return items
+
+        batcher = MicroBatcher(slow, max_wait=0.0, name="test-deadline")
+        self.addCleanup(release.set)
+
+        async def main():
+            with session_deadline(0.1):
+                await batcher.acall(1)
+
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(main())
+        self.assertLess(time.monotonic() - started, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from utils.connection_db import DatabaseConnection
+from utils.database_registry import get_registry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIBRARY = os.path.join(ROOT, "utils", "library_database.db")
+
+
+class ColumnStatsCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "library.db")
+        shutil.copy(LIBRARY, self.path)
+        self.name = f"test_stats_{id(self)}"
+        get_registry().register(self.name, self.path)
+        self.db = DatabaseConnection(self.name)
+        self.assertTrue(self.db.connect())
+        self.addCleanup(self.db.disconnect)
+
+    def write(self, *statements):
+        connection = sqlite3.connect(self.path)
+        for statement in statements:
+            connection.execute(statement)
+        connection.commit()
+        connection.close()
+
+    def test_cached_profile_is_dropped_after_inserts_once_analyzed(self):
+        # After ANALYZE the estimated row count stays at the sqlite_stat1 figure whatever is inserted
+        self.write("ANALYZE")
+        profile = self.db.get_column_stats("books")
+        self.assertIs(self.db.cached_column_stats("books"), profile)
+
+        self.write("INSERT INTO books (title, author, published_year, genre) VALUES ('New', 'Someone', 2024, 'Essay')")
+
+        self.assertIsNone(self.db.cached_column_stats("books"))
+        self.assertEqual(self.db.get_column_stats("books")["row_count"], profile["row_count"] + 1)
+
+    def test_distinct_estimate_is_the_same_in_every_process(self):
+        script = (
+            "import sys; sys.path.insert(0, sys.argv[1]);"
+            "import sqlite3; from utils.column_profiler import ColumnSketch;"
+            "sketch = ColumnSketch();"
+            "[sketch.step(f'value-{i % 3000}') for i in range(20000)];"
+            "print(sketch._hashes[:5])"
+        )
+        outputs = {
+            subprocess.run(
+                [sys.executable, "-c", script, ROOT], capture_output=True, text=True, check=True,
+                env={**os.environ, "PYTHONHASHSEED": seed},
+            ).stdout
+            for seed in ("1", "2")
+        }
+        self.assertEqual(len(outputs), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
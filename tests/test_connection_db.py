@@ -0,0 +1,76 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils.connection_db import DatabaseConnection
+from utils.database_registry import get_registry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIBRARY = os.path.join(ROOT, "utils", "library_database.db")
+
+
+class WritesTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "library.db")
+        shutil.copy(LIBRARY, path)
+        name = f"test_writes_{id(self)}"
+        get_registry().register(name, path)
+        self.db = DatabaseConnection(name)
+        self.addCleanup(self.db.disconnect)
+
+    def count(self, table: str) -> int:
+        return self.db.execute_query(f"SELECT COUNT(*) FROM {table}", guard=False)[0][0]
+
+    def test_execute_many_reads_rows_in_chunks(self):
+        before = self.count("users")
+        rows = ((f"User {index}", f"user{index}@example.com") for index in range(25))
+
+        report = self.db.execute_many("INSERT INTO users (name, email) VALUES (?, ?)", rows, chunk_size=10)
+
+        self.assertEqual(report["status"], "success")
+        self.assertEqual(report["rows"], 25)
+        self.assertEqual(report["chunks"], 3)
+        self.assertEqual(self.count("users"), before + 25)
+
+    def test_failed_batch_only_undoes_its_savepoint(self):
+        users, books = self.count("users"), self.count("books")
+        book_id = self.db.execute_query("SELECT MAX(book_id) FROM books", guard=False)[0][0]
+        # The last row reuses an existing primary key, so the whole batch fails
+        rows = [(book_id + 1, "New Book", "Someone"), (book_id, "Duplicate", "Someone")]
+
+        with self.db.transaction():
+            self.assertTrue(self.db.execute_command("INSERT INTO users (name, email) VALUES (?, ?)", ("Ana", "ana@example.com")))
+            with contextlib.redirect_stdout(io.StringIO()):
+                report = self.db.execute_many("INSERT INTO books (book_id, title, author) VALUES (?, ?, ?)", rows)
+            self.assertEqual(report["status"], "error")
+
+        self.assertEqual(self.count("users"), users + 1)
+        self.assertEqual(self.count("books"), books)
+
+    def test_rollback_after_restores_the_data(self):
+        sales = self.count("sales_details")
+
+        with self.db.rollback_after():
+            self.db.execute_command("DELETE FROM sales_details")
+            self.assertEqual(self.count("sales_details"), 0)
+
+        self.assertEqual(self.count("sales_details"), sales)
+
+    def test_error_inside_a_transaction_undoes_every_write(self):
+        users = self.count("users")
+
+        with self.assertRaises(RuntimeError):
+            with self.db.transaction():
+                self.db.execute_command("INSERT INTO users (name, email) VALUES (?, ?)", ("Ana", "ana@example.com"))
+                raise RuntimeError("boom")
+
+        self.assertEqual(self.count("users"), users)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from main_agents.context_merge import merge_contexts
+
+WORDS = [f"w{i}" for i in range(60)]
+
+
+def chunk(start, end, score, corpus="docs", source="api.md"):
+    return {"corpus_name": corpus, "source_uri": source, "text": " ".join(WORDS[start:end]), "score": score}
+
+
+class MergeContextsTest(unittest.TestCase):
+    def test_overlapping_chunks_become_one_passage_with_the_best_score(self):
+        other = {"corpus_name": "docs", "source_uri": "other.md", "text": "an unrelated passage", "score": 0.2}
+        merged, stats = merge_contexts([chunk(0, 30, 0.3), chunk(20, 50, 0.1), other])
+
+        self.assertEqual([passage["score"] for passage in merged], [0.1, 0.2])
+        self.assertEqual(merged[0]["text"], " ".join(WORDS[:50]))
+        self.assertEqual(merged[0]["merged_chunks"], 2)
+        self.assertEqual(stats["tokens_retrieved"], 63)
+        self.assertEqual(stats["tokens_returned"], 53)
+
+    def test_chunks_of_one_source_in_two_corpora_are_not_stitched(self):
+        merged, _ = merge_contexts([
+            chunk(0, 30, 0.3, corpus="billing-v1"),
+            chunk(20, 50, 0.1, corpus="billing-v2"),
+        ])
+
+        self.assertEqual([passage["corpus_name"] for passage in merged], ["billing-v2", "billing-v1"])
+        self.assertEqual([passage["merged_chunks"] for passage in merged], [1, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from utils.connection_db import DatabaseConnection
+from utils.database_registry import DatabaseRegistry, get_registry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIBRARY = os.path.join(ROOT, "utils", "library_database.db")
+
+
+class DatabaseRegistryTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.registry = DatabaseRegistry()
+        self.addCleanup(self.registry.close)
+
+    def copy(self, name: str) -> str:
+        path = os.path.join(self.directory, f"{name}.db")
+        shutil.copy(LIBRARY, path)
+        return path
+
+    def test_connections_are_reused_from_the_pool(self):
+        source = self.registry.register("orders", self.copy("orders"), pool_size=1)
+        first = source.acquire()
+        source.release(first)
+        self.assertIs(source.acquire(), first)
+
+        # A full pool closes what it can't keep
+        second = source.acquire()
+        source.release(first)
+        source.release(second)
+        self.assertIs(source.acquire(), first)
+
+    def test_sources_are_registered_by_name(self):
+        with self.assertRaises(ValueError):
+            self.registry.register("not-an-identifier", self.copy("bad"))
+
+        env = {"AGENT_DATABASES": f"orders={self.copy('orders')}; users = {self.copy('users')}"}
+        with mock.patch.dict(os.environ, env):
+            self.registry.load_from_env()
+        self.assertEqual(self.registry.names(), ["orders", "users"])
+        self.assertEqual(self.registry.get("users").path, os.path.join(self.directory, "users.db"))
+        with self.assertRaises(ValueError):
+            self.registry.get("missing")
+
+
+class CrossDatabaseQueryTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.name = f"test_registry_{id(self)}"
+        path = os.path.join(directory.name, "archive.db")
+        shutil.copy(LIBRARY, path)
+        get_registry().register(self.name, path)
+
+    def test_attached_databases_are_joined_in_one_query(self):
+        archive = DatabaseConnection(self.name)
+        self.addCleanup(archive.disconnect)
+        archive.execute_command("DELETE FROM books WHERE book_id > 2")
+
+        db = DatabaseConnection()
+        self.addCleanup(db.disconnect)
+        with db.attached([self.name]):
+            rows = db.execute_query(
+                f"SELECT b.title FROM books b JOIN {self.name}.books a ON a.book_id = b.book_id ORDER BY b.book_id"
+            )
+        self.assertEqual(len(rows), 2)
+        self.assertEqual([name for _, name, _ in db.connection.execute("PRAGMA database_list")], ["main"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from main_agents import embeddings
+from main_agents.config import DEFAULT_CHUNK_SIZE, DEFAULT_EMBEDDING_BATCH_SIZE, DEFAULT_EMBEDDING_BATCH_WORDS
+from main_agents.embedding_cache import EmbeddingCache
+
+DIMENSION = 8
+
+
+class EmbedTextsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = EmbeddingCache(directory.name, dimension=DIMENSION)
+        self.addCleanup(self.cache.close)
+        self.requests = []
+
+        def embed_batch(texts, model, task_type):
+            self.requests.append(texts)
+            return [np.full(DIMENSION, len(text.split()), dtype=np.float32) for text in texts]
+
+        patcher = mock.patch.object(embeddings, "_embed_batch", embed_batch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_default_size_chunks_are_batched_within_the_word_budget(self):
+        chunks = [" ".join([f"w{i}"] * DEFAULT_CHUNK_SIZE) for i in range(DEFAULT_EMBEDDING_BATCH_SIZE)]
+
+        matrix = embeddings.embed_texts(chunks, cache=self.cache)
+
+        self.assertGreater(len(self.requests), 1)
+        for texts in self.requests:
+            self.assertLessEqual(sum(len(text.split()) for text in texts), DEFAULT_EMBEDDING_BATCH_WORDS)
+        self.assertEqual(sum(len(texts) for texts in self.requests), len(chunks))
+        self.assertTrue((matrix == DEFAULT_CHUNK_SIZE).all())
+
+    def test_short_texts_are_capped_by_count(self):
+        texts = [f"query {i}" for i in range(DEFAULT_EMBEDDING_BATCH_SIZE + 1)]
+
+        embeddings.embed_texts(texts, cache=self.cache)
+
+        self.assertEqual([len(batch) for batch in self.requests], [DEFAULT_EMBEDDING_BATCH_SIZE, 1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from utils.connection_db import DatabaseConnection
+from utils.database_registry import get_registry
+from utils.endpoint_mapping import EndpointMappingIndex, singular
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIBRARY = os.path.join(ROOT, "utils", "library_database.db")
+
+
+class SingularTest(unittest.TestCase):
+    def test_words_ending_in_s_keep_their_singular(self):
+        cases = {
+            "status": "status", "statuses": "status", "address": "address", "addresses": "address",
+            "analysis": "analysis", "series": "series", "categories": "category", "sales": "sale",
+        }
+        self.assertEqual({word: singular(word) for word in cases}, cases)
+
+
+class EndpointMappingTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "library.db")
+        shutil.copy(LIBRARY, self.path)
+        self.name = f"test_mapping_{id(self)}"
+        get_registry().register(self.name, self.path)
+        self.db = DatabaseConnection(self.name)
+        self.assertTrue(self.db.connect())
+        self.addCleanup(self.db.disconnect)
+        self.index = EndpointMappingIndex(os.path.join(directory.name, "mappings.db"))
+        self.addCleanup(self.index.close)
+
+    def test_saved_mapping_skips_the_catalog(self):
+        calls = []
+
+        def catalog():
+            calls.append(1)
+            return self.db.get_catalog()
+
+        schema_hash = self.db.get_schema_snapshot()["hash"]
+        first = self.index.map("/api/customer/{id}", self.name, catalog, schema_hash=schema_hash)
+        second = self.index.map("/api/customer/42", self.name, catalog, schema_hash=schema_hash)
+
+        self.assertEqual(first["tables"][0]["table"], "users")
+        self.assertEqual(second, first)
+        self.assertEqual(len(calls), 1)
+
+    def test_schema_snapshot_is_reused_until_the_schema_changes(self):
+        snapshot = self.db.get_schema_snapshot()
+        self.assertIs(self.db.get_schema_snapshot(), snapshot)
+
+        connection = sqlite3.connect(self.path)
+        connection.execute("CREATE TABLE reviews (body TEXT)")
+        connection.commit()
+        connection.close()
+
+        changed = self.db.get_schema_snapshot()
+        self.assertNotEqual(changed["hash"], snapshot["hash"])
+        self.assertIn("reviews", changed["objects"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import unittest
+
+import httpx
+
+from main_agents.executor import ApiTestCase, ApiTestExecutor
+
+
+def _stub_server(request: httpx.Request) -> httpx.Response:
+    """Echoes the request headers and params for /echo, 404 for anything else."""
+    if request.url.path != "/echo":
+        return httpx.Response(404, json={"error": "not found"})
+    return httpx.Response(200, json={"headers": dict(request.headers), "params": dict(request.url.params)})
+
+
+class ApiTestExecutorTest(unittest.IsolatedAsyncioTestCase):
+    async def run_cases(self, cases):
+        async with ApiTestExecutor(transport=httpx.MockTransport(_stub_server)) as executor:
+            return await executor.run(cases)
+
+    async def test_non_string_headers_and_params_are_sent_as_text(self):
+        case = ApiTestCase.from_dict({
+            "method": "get",
+            "url": "https://api.example.com/echo",
+            "headers": {"X-Retries": 3, "X-Debug": True, "X-Skip": None},
+            "params": {"page": 2, "filter": {"status": "active"}},
+            "expected_status": 200,
+        })
+
+        [result] = await self.run_cases([case])
+
+        self.assertTrue(result.passed, result.errors)
+        echoed = json.loads(result.response_excerpt)
+        self.assertEqual(echoed["headers"]["x-retries"], "3")
+        self.assertEqual(echoed["headers"]["x-debug"], "true")
+        self.assertNotIn("x-skip", echoed["headers"])
+        self.assertEqual(echoed["params"], {"page": "2", "filter": '{"status": "active"}'})
+
+    async def test_a_bad_case_fails_alone(self):
+        cases = [
+            ApiTestCase(method="GET", url="https://api.example.com/echo", headers={"X-Bad": object()}),
+            ApiTestCase(method="GET", url="not a url"),
+            ApiTestCase(method="GET", url="https://api.example.com/missing", expected_status=404),
+        ]
+
+        results = await self.run_cases(cases)
+
+        self.assertEqual([result.passed for result in results], [False, False, True])
+        self.assertIsNone(results[0].status_code)
+        self.assertTrue(results[0].errors)
+        self.assertEqual(results[2].status_code, 404)
+
+    def test_from_dict_rejects_headers_that_are_not_an_object(self):
+        with self.assertRaises(ValueError):
+            ApiTestCase.from_dict({"method": "GET", "url": "https://api.example.com/echo", "headers": ["X-A: 1"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
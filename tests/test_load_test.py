@@ -0,0 +1,34 @@
+import unittest
+
+from main_agents.load_test import DEFAULT_SCRIPT, LatencyModel, SimulationProfile, run_load
+
+
+class RunLoadTest(unittest.IsolatedAsyncioTestCase):
+    async def test_sessions_run_the_whole_script(self):
+        profile = SimulationProfile(latency=LatencyModel(median=0.005, p99=0.01))
+
+        report = await run_load(sessions=3, concurrency=2, profile=profile, isolated=True, session_timeout=30)
+
+        self.assertEqual((report["completed"], report["failed"], report["errors"]), (3, 0, {}))
+        self.assertEqual(report["memory"]["peak_sessions"], 2)
+        # Every agent plays its whole script once per session
+        steps = sum(len(steps) for steps in DEFAULT_SCRIPT.values())
+        self.assertEqual(report["model_calls"], 3 * steps)
+        self.assertEqual(report["tool_calls"], {"map_endpoint": 3, "query_database": 3})
+        self.assertEqual(report["rate_limiter"]["in_flight"], 0)
+        self.assertGreater(report["time_seconds"]["model"], 0)
+        self.assertEqual(set(report["time_share"]), {"model", "model_wait", "tools", "other"})
+
+    async def test_unknown_tools_fall_back_to_an_answer(self):
+        script = {"root_agent": [{"tool": "missing_tool", "args": {}, "text": "Answered directly."}]}
+        profile = SimulationProfile(script=script, latency=LatencyModel(median=0.0))
+
+        report = await run_load(sessions=2, concurrency=2, profile=profile, isolated=True, session_timeout=30)
+
+        self.assertEqual(report["completed"], 2)
+        self.assertEqual(report["model_calls"], 2)
+        self.assertEqual(report["tool_calls"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from main_agents import local_corpus
+from main_agents.local_corpus import LocalCorpus
+
+DIMENSION = 96
+
+
+def fake_embeddings(texts, task_type):
+    return np.stack([
+        np.random.default_rng(int(hashlib.md5(text.encode()).hexdigest()[:8], 16)).standard_normal(DIMENSION)
+        for text in texts
+    ]).astype(np.float32)
+
+
+class PendingBuild:
+    """Process-pool job whose result the test sets by hand."""
+
+    def __init__(self):
+        self.future = concurrent.futures.Future()
+
+    def result(self):
+        return self.future.result()
+
+    async def wait(self):
+        return await asyncio.wrap_future(self.future)
+
+
+class IndexBuildTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(local_corpus, "embed_texts", fake_embeddings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.corpus = LocalCorpus("test-build", directory.name, dimension=DIMENSION, train_size=300)
+        self.addCleanup(self.corpus.close)
+
+    def test_queries_and_appends_run_while_the_index_builds(self):
+        build = PendingBuild()
+        self.corpus._submit_build = lambda rows: build
+
+        async def main():
+            adding = asyncio.create_task(self.corpus.aadd_texts("a.md", [f"chunk {i}" for i in range(300)]))
+            while not self.corpus._building:
+                await asyncio.sleep(0.01)
+
+            # The corpus lock is free: a query (exact search) and another source go through meanwhile
+            hits = await asyncio.wait_for(asyncio.to_thread(self.corpus.query_many, [("chunk 7", 1, 2.0, None)]), 5)
+            self.assertEqual(hits[0][0]["text"], "chunk 7")
+            self.assertEqual(await self.corpus.aadd_texts("b.md", ["late 1", "late 2"]), 2)
+            self.assertIsNone(self.corpus.index)
+
+            build.future.set_result(local_corpus._build_index(self.corpus.vector_path, 300, DIMENSION))
+            await adding
+
+        asyncio.run(main())
+        self.assertFalse(self.corpus._building)
+        self.assertEqual(len(self.corpus.index), 302)
+
+
+class FailingCommit:
+    """Corpus database whose next COMMIT fails, e.g. because the disk is full."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT":
+            raise sqlite3.OperationalError("database or disk is full")
+        return self.db.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+
+class AppendAndQueryTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch.object(local_corpus, "embed_texts", fake_embeddings)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.corpus = LocalCorpus("test-append", directory.name, dimension=DIMENSION)
+        self.addCleanup(self.corpus.close)
+
+    def test_rolled_back_chunks_leave_no_vectors(self):
+        self.corpus.add_texts("a.md", ["first chunk", "second chunk"])
+        size = os.path.getsize(self.corpus.vector_path)
+
+        db = self.corpus.db
+        self.corpus.db = FailingCommit(db)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.corpus.add_texts("b.md", ["lost chunk"])
+        self.corpus.db = db
+
+        self.assertEqual(os.path.getsize(self.corpus.vector_path), size)
+        self.corpus.add_texts("c.md", ["third chunk"])
+        self.assertEqual(self.corpus.query("third chunk", top_k=1, distance_threshold=2.0)[0]["text"], "third chunk")
+
+    def test_replaced_chunks_dont_crowd_out_active_hits(self):
+        chunks = [f"alpha {i}" for i in range(10)]
+        # 19 replaced copies of every chunk sit next to the active one in the vector file
+        for _ in range(20):
+            self.corpus.add_texts("a.md", chunks)
+
+        hits = self.corpus.query("alpha 1", top_k=3, distance_threshold=2.0)
+
+        self.assertEqual(len(hits), 3)
+        self.assertEqual(hits[0]["text"], "alpha 1")
+        self.assertEqual(len({hit["text"] for hit in hits}), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import asyncio
+import os
+import unittest
+
+from main_agents.local_corpus import LocalCorpus, get_local_corpus
+from main_agents.tools.add_data import add_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class LocalDocsTest(unittest.TestCase):
+    def test_files_outside_the_docs_directory_are_rejected(self):
+        result = asyncio.run(add_data("endpoint-documentation", [os.path.join(ROOT, "utils", "library_database.db")], None))
+
+        self.assertEqual(result["status"], "error")
+        self.assertIn("Outside the docs directory", result["invalid_paths"][0])
+
+    def test_files_with_other_extensions_are_rejected(self):
+        result = asyncio.run(add_data("endpoint-documentation", [os.path.join(ROOT, "main_agents", "config.py")], None))
+
+        self.assertEqual(result["status"], "error")
+        self.assertIn("Unsupported extension", result["invalid_paths"][0])
+
+    def test_corpus_names_cannot_leave_the_corpora_directory(self):
+        for name in ("../escape", "a/b", ".hidden", "x/../../y"):
+            with self.assertRaises(ValueError):
+                get_local_corpus(name)
+        with self.assertRaises(ValueError):
+            LocalCorpus("..")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+
+from google.adk.agents import LlmAgent
+from google.adk.models.llm_request import LlmRequest
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools.agent_tool import AgentTool
+from google.genai import types
+
+from main_agents.load_test import LatencyModel, SimulatedGemini, SimulationProfile
+from main_agents.rate_limiter import get_rate_limiter, set_rate_limiter
+from main_agents.resilience import get_metrics, session_deadline
+
+MODEL = "test-nested-llm"
+SCRIPT = {
+    "parent": [
+        {"tool": "child", "args": {"request": "{query}"}},
+        {"text": "Parent done."},
+    ],
+    "child": [{"text": "Child done."}],
+}
+
+
+def _nested_agents(profile: SimulationProfile) -> LlmAgent:
+    child = LlmAgent(
+        name="child", description="Answers the parent.",
+        model=SimulatedGemini(model=MODEL, agent_name="child", profile=profile),
+    )
+    return LlmAgent(
+        name="parent", tools=[AgentTool(agent=child)],
+        model=SimulatedGemini(model=MODEL, agent_name="parent", profile=profile),
+    )
+
+
+class ThrottledGeminiTest(unittest.IsolatedAsyncioTestCase):
+    async def test_nested_agents_do_not_deadlock_on_the_limiter(self):
+        # Parents wait for their agent tool while the generator of their own model call is suspended;
+        # with more sessions than slots, a slot held across that wait leaves no slot for the children
+        set_rate_limiter(MODEL, 1_000_000, max_concurrency=2)
+        profile = SimulationProfile(script=SCRIPT, latency=LatencyModel(median=0.01, p99=0.02))
+        session_service = InMemorySessionService()
+        runner = Runner(agent=_nested_agents(profile), app_name="test", session_service=session_service)
+
+        async def one_session(index: int) -> str:
+            session = await session_service.create_session(app_name="test", user_id="test")
+            message = types.Content(role="user", parts=[types.Part(text=f"Question {index}")])
+            answer = ""
+            async for event in runner.run_async(user_id="test", session_id=session.id, new_message=message):
+                if event.is_final_response() and event.author == "parent":
+                    answer = event.content.parts[0].text
+            return answer
+
+        answers = await asyncio.wait_for(asyncio.gather(*(one_session(index) for index in range(4))), timeout=30)
+
+        self.assertEqual(answers, ["Parent done."] * 4)
+        self.assertEqual(profile.stats.model_calls, 12)
+        self.assertEqual(get_rate_limiter(MODEL).stats()["in_flight"], 0)
+
+    async def test_deadline_does_not_cover_the_caller(self):
+        # The caller runs tools between responses; that time isn't the model's to answer for
+        model_name = "test-deadline-llm"
+        set_rate_limiter(model_name, 1_000_000, max_concurrency=1)
+        profile = SimulationProfile(script=SCRIPT, latency=LatencyModel(median=0.01, p99=0.02))
+        model = SimulatedGemini(model=model_name, agent_name="child", profile=profile)
+        request = LlmRequest(contents=[types.Content(role="user", parts=[types.Part(text="Question")])])
+
+        responses = []
+        with session_deadline(0.2):
+            async for llm_response in model.generate_content_async(request):
+                await asyncio.sleep(0.3)
+                responses.append(llm_response)
+
+        self.assertEqual(responses[0].content.parts[0].text, "Child done.")
+        self.assertEqual(get_metrics(model_name).snapshot()["deadline_exceeded"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
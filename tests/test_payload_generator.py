@@ -0,0 +1,56 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from utils.connection_db import DatabaseConnection
+from utils.database_registry import get_registry
+from utils.payload_generator import PayloadGenerator
+
+
+class PayloadGeneratorTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "shop.db")
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, email TEXT NOT NULL, age INTEGER)")
+        connection.executemany(
+            "INSERT INTO users (email, age) VALUES (?, ?)",
+            [(f"user{i}@example.com", 18 + i % 60) for i in range(500)],
+        )
+        # SQLite keeps the text as declared: an INTEGER column can hold it
+        connection.execute("INSERT INTO users (email, age) VALUES ('legacy@example.com', 'unknown')")
+        connection.commit()
+        connection.close()
+        name = f"test_payloads_{id(self)}"
+        get_registry().register(name, path)
+        self.db = DatabaseConnection(name)
+        self.assertTrue(self.db.connect())
+        self.addCleanup(self.db.disconnect)
+
+    def emails(self, seed: int) -> list:
+        generator = PayloadGenerator(self.db, values_per_field=10, seed=seed)
+        cases = generator.generate([{"name": "email", "source": "users.email"}], include_boundaries=False)
+        return [case["payload"]["email"] for case in cases]
+
+    def test_values_are_sampled_from_the_whole_table(self):
+        emails = self.emails(seed=0)
+
+        self.assertEqual(len(emails), 10)
+        self.assertNotEqual(emails, [f"user{i}@example.com" for i in range(10)])
+        self.assertEqual(emails, self.emails(seed=0))
+        self.assertNotEqual(sorted(emails), sorted(self.emails(seed=1)))
+
+    def test_text_in_an_integer_column_gets_no_shifted_bounds(self):
+        generator = PayloadGenerator(self.db, values_per_field=3)
+        cases = list(generator.generate([{"name": "age", "source": "users.age"}]))
+
+        boundaries = {case["description"]: case["payload"]["age"] for case in cases if case["kind"] == "boundary"}
+        self.assertEqual(boundaries["below minimum"], 17)
+        self.assertEqual(boundaries["maximum"], "unknown")
+        self.assertNotIn("above maximum", boundaries)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import sqlite3
+import unittest
+
+from utils import query_guard
+from utils.query_guard import QueryGuard
+
+ROWS = 10_000_000
+
+
+class QueryGuardTest(unittest.TestCase):
+    def setUp(self):
+        self.connection = sqlite3.connect(":memory:")
+        self.addCleanup(self.connection.close)
+        self.connection.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, kind TEXT, payload TEXT)")
+        self.db_path = f"test_query_guard_{id(self)}.db"
+
+    def guard(self) -> QueryGuard:
+        return QueryGuard(self.connection, row_estimator=lambda table: ROWS, db_path=self.db_path)
+
+    def test_trailing_limit_is_checked_against_the_cap(self):
+        guard = self.guard()
+
+        small = guard.check("SELECT * FROM events LIMIT 10")
+        self.assertFalse(small.rewritten)
+
+        for query in ("SELECT * FROM events LIMIT ?", "SELECT * FROM events LIMIT 5000000",
+                      "SELECT * FROM events LIMIT 10 OFFSET ?"):
+            with self.subTest(query=query):
+                decision = guard.check(query, (10,) * query.count("?"))
+                self.assertTrue(decision.allowed)
+                self.assertTrue(decision.rewritten)
+                self.assertTrue(decision.query.endswith(f"LIMIT {guard.row_limit}"))
+
+    def test_recommendations_are_logged_once_per_database_and_pattern(self):
+        query = "SELECT kind, COUNT(*) FROM events WHERE kind = 'click' GROUP BY kind"
+
+        with self.assertLogs(query_guard.logger, "WARNING") as logs:
+            first = self.guard().check(query)
+        self.assertFalse(first.allowed)
+        self.assertIn('CREATE INDEX IF NOT EXISTS "idx_events_kind" ON "events" ("kind")', first.recommendations)
+        self.assertEqual(len(logs.records), 1)
+
+        # A new connection to the same database, and the same query with another literal
+        with self.assertNoLogs(query_guard.logger, "WARNING"):
+            second = self.guard().check(query.replace("click", "view"))
+        self.assertEqual(second.recommendations, first.recommendations)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import sqlite3
+import unittest
+from array import array
+
+from utils.query_result import QueryResult
+
+
+class QueryResultTest(unittest.TestCase):
+    def setUp(self):
+        connection = sqlite3.connect(":memory:")
+        self.addCleanup(connection.close)
+        connection.execute("CREATE TABLE books (title TEXT, year INTEGER, price REAL, cover BLOB)")
+        connection.executemany(
+            "INSERT INTO books VALUES (?, ?, ?, ?)",
+            [(f"Book {index}", 1900 + index, index + 0.5, bytes([index])) for index in range(10)],
+        )
+        self.result = QueryResult.from_cursor(connection.execute("SELECT * FROM books ORDER BY year"))
+
+    def test_rows_are_tuples_with_columns_stored_once(self):
+        self.assertEqual(self.result.columns, ("title", "year", "price", "cover"))
+        self.assertEqual(len(self.result), 10)
+        self.assertEqual(self.result[0], ("Book 0", 1900, 0.5, b"\x00"))
+        self.assertEqual(next(self.result.dicts())["title"], "Book 0")
+        with self.assertRaises(KeyError):
+            self.result.column("missing")
+
+    def test_numeric_columns_are_typed(self):
+        self.assertEqual(self.result.column("year"), array("q", range(1900, 1910)))
+        self.assertEqual(self.result.column("price").typecode, "d")
+        self.assertIsInstance(self.result.column("title"), list)
+
+    def test_slice_is_a_view_over_the_same_rows(self):
+        view = self.result[2:5]
+        self.assertEqual(len(view), 3)
+        self.assertIs(view[0], self.result[2])
+        self.assertEqual(view.rows(), self.result.rows()[2:5])
+        self.assertEqual(view.column("year").tolist(), [1902, 1903, 1904])
+        self.assertEqual(view[::2].rows(), [self.result[2], self.result[4]])
+
+    def test_to_json_orientations(self):
+        view = self.result[:2]
+        by_rows = json.loads(view.to_json())
+        self.assertEqual(by_rows["columns"], ["title", "year", "price", "cover"])
+        self.assertEqual(by_rows["rows"][1], ["Book 1", 1901, 1.5, "AQ=="])
+
+        by_columns = json.loads(view.to_json("columns"))
+        self.assertEqual(by_columns["data"]["year"], [1900, 1901])
+        self.assertEqual(by_columns["data"]["title"], ["Book 0", "Book 1"])
+        with self.assertRaises(ValueError):
+            view.to_json("records")
+
+    def test_empty_result(self):
+        empty = QueryResult.empty()
+        self.assertFalse(empty)
+        self.assertEqual(json.loads(empty.to_json()), {"columns": [], "rows": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
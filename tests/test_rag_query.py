@@ -0,0 +1,72 @@
+import asyncio
+import sys
+import threading
+import types
+import unittest
+from unittest import mock
+
+import main_agents.tools.rag_query  # noqa: F401 (the package re-exports the function under the same name)
+from main_agents.tools import utils as tool_utils
+
+rag_query_module = sys.modules["main_agents.tools.rag_query"]
+
+
+def hit(source, text, score):
+    return {"source_uri": source, "source_name": source, "text": text, "score": score}
+
+
+class FanOutRankingTest(unittest.TestCase):
+    def test_corpora_are_ranked_on_raw_distance(self):
+        answers = {
+            # One weak hit: min-max scaling used to turn it into a perfect 0
+            "billing-v1": [hit("v1.md", "refunds are not supported in v1 of the billing API", 0.62)],
+            "billing-v2": [
+                hit("v2.md", "POST /refunds creates a refund for a settled charge", 0.12),
+                hit("v2-errors.md", "a refund on an unsettled charge returns 409 conflict", 0.25),
+            ],
+        }
+
+        async def query_corpus(corpus_name, query):
+            return answers[corpus_name]
+
+        with mock.patch.object(rag_query_module, "_query_corpus", query_corpus):
+            response = asyncio.run(rag_query_module.rag_query("refunds", None, ["billing-v1", "billing-v2"]))
+
+        self.assertEqual([result["score"] for result in response["results"]], [0.12, 0.25, 0.62])
+        self.assertEqual(response["results"][2]["corpus_name"], "billing-v1")
+
+
+class CorpusListingTest(unittest.TestCase):
+    def setUp(self):
+        tool_utils.invalidate_corpora_cache()
+        self.addCleanup(tool_utils.invalidate_corpora_cache)
+
+    def test_listing_runs_off_the_event_loop_and_is_reused(self):
+        corpora = [
+            types.SimpleNamespace(name="projects/p/locations/l/ragCorpora/1", display_name="billing-v1", description=""),
+            types.SimpleNamespace(name="projects/p/locations/l/ragCorpora/2", display_name="billing-v2", description=""),
+        ]
+        threads = []
+
+        def list_corpora():
+            threads.append(threading.current_thread())
+            return iter(corpora)
+
+        async def resolve():
+            return (
+                await tool_utils.resolve_corpora_by_tag("billing v2"),
+                await tool_utils.aget_corpus_resource_name("billing-v1"),
+            )
+
+        with mock.patch.object(tool_utils, "RETRIEVAL_BACKEND", "vertex"), \
+                mock.patch.object(tool_utils.rag, "list_corpora", list_corpora):
+            names, resource_name = asyncio.run(resolve())
+
+        self.assertEqual(names, ["billing-v2"])
+        self.assertEqual(resource_name, "projects/p/locations/l/ragCorpora/1")
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+
+if __name__ == "__main__":
+    unittest.main()
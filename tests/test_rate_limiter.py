@@ -0,0 +1,69 @@
+import asyncio
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from main_agents import config
+from main_agents.rate_limiter import RateLimiter
+
+
+class RateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_async_waiters_are_woken_on_release(self):
+        limiter = RateLimiter("test", 1_000_000, max_concurrency=2)
+        running, peak = 0, 0
+
+        async def call():
+            nonlocal running, peak
+            async with limiter.alimit():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.wait_for(asyncio.gather(*(call() for _ in range(20))), timeout=5)
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter.stats()["in_flight"], 0)
+
+    async def test_release_from_a_thread_wakes_a_coroutine(self):
+        limiter = RateLimiter("test", 1_000_000, max_concurrency=1)
+        limiter.concurrency.acquire()
+        threading.Timer(0.05, limiter.concurrency.release).start()
+        start = time.monotonic()
+        async with limiter.alimit():
+            waited = time.monotonic() - start
+        self.assertGreaterEqual(waited, 0.04)
+        self.assertEqual(limiter.stats()["in_flight"], 0)
+
+    async def test_cancelled_waiter_passes_the_slot_on(self):
+        limiter = RateLimiter("test", 1_000_000, max_concurrency=1)
+        await limiter.concurrency.acquire_async()
+        first = asyncio.ensure_future(limiter.concurrency.acquire_async())
+        second = asyncio.ensure_future(limiter.concurrency.acquire_async())
+        await asyncio.sleep(0)
+        limiter.concurrency.release()
+        first.cancel()
+        await asyncio.wait_for(second, timeout=1)
+        self.assertTrue(first.cancelled())
+        self.assertEqual(limiter.stats()["in_flight"], 1)
+
+    async def test_default_burst_lets_an_agent_turn_through(self):
+        limiter = RateLimiter("test", config.DEFAULT_MODEL_REQUESTS_PER_MIN)
+        start = time.monotonic()
+        for _ in range(6):
+            async with limiter.alimit():
+                pass
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(limiter.stats()["burst"], config.DEFAULT_MODEL_BURST)
+
+
+class PerModelConfigTest(unittest.TestCase):
+    def test_env_overrides_one_model_and_keeps_the_others(self):
+        with mock.patch.dict(os.environ, {"MODEL_BURST": "gemini-2.5-flash=20, publishers/google/models/x=5"}):
+            burst = config._per_model("MODEL_BURST", {"gemini-2.5-flash": 10.0, "other": 3.0})
+        self.assertEqual(burst, {"gemini-2.5-flash": 20.0, "publishers/google/models/x": 5.0, "other": 3.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import asyncio
+import threading
+import unittest
+
+from main_agents.rate_limiter import RateLimiter
+from main_agents.resilience import (
+    CircuitBreaker,
+    DeadlineExceeded,
+    RetryPolicy,
+    acall_with_retries,
+    call_with_retries,
+    get_circuit_breaker,
+    get_metrics,
+)
+
+
+class CallWithRetriesTest(unittest.TestCase):
+    def test_non_retryable_error_is_not_a_success(self):
+        breaker = get_circuit_breaker("test-non-retryable")
+        breaker.record_failure()
+
+        def bad_request():
+            raise ValueError("bad request")
+
+        with self.assertRaises(ValueError):
+            call_with_retries(bad_request, backend="test-non-retryable", policy=RetryPolicy(attempts=1))
+        self.assertEqual(breaker._failures, 1)
+
+    def test_half_open_probe_is_freed_by_a_non_retryable_error(self):
+        breaker = get_circuit_breaker("test-half-open")
+        breaker.reset_timeout = 0.0
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        def bad_request():
+            raise ValueError("bad request")
+
+        with self.assertRaises(ValueError):
+            call_with_retries(bad_request, backend="test-half-open", policy=RetryPolicy(attempts=1))
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+
+    def test_timed_out_attempt_is_abandoned(self):
+        release = threading.Event()
+
+        def hang():
+            release.wait(5)
+
+        try:
+            with self.assertRaises(DeadlineExceeded):
+                call_with_retries(hang, backend="test-abandoned", policy=RetryPolicy(attempts=1, call_timeout=0.05))
+        finally:
+            release.set()
+        self.assertEqual(get_metrics("test-abandoned").snapshot()["abandoned"], 1)
+
+
+class AcallWithRetriesTest(unittest.IsolatedAsyncioTestCase):
+    async def test_waiting_for_admission_is_not_a_backend_failure(self):
+        limiter = RateLimiter("test-admission", 1_000_000, max_concurrency=1)
+        breaker = get_circuit_breaker("test-admission")
+        called = False
+
+        async def retrieve():
+            nonlocal called
+            called = True
+
+        async with limiter.alimit():
+            with self.assertRaises(DeadlineExceeded):
+                await acall_with_retries(
+                    retrieve, backend="test-admission",
+                    policy=RetryPolicy(attempts=1, call_timeout=0.05), admit=limiter.alimit,
+                )
+        self.assertFalse(called)
+        self.assertEqual(breaker._failures, 0)
+        self.assertEqual(get_metrics("test-admission").snapshot()["deadline_exceeded"], 1)
+
+    async def test_timed_out_admitted_call_is_a_backend_failure(self):
+        limiter = RateLimiter("test-admitted", 1_000_000, max_concurrency=1)
+        breaker = get_circuit_breaker("test-admitted")
+
+        async def hang():
+            await asyncio.sleep(5)
+
+        with self.assertRaises(DeadlineExceeded):
+            await acall_with_retries(
+                hang, backend="test-admitted",
+                policy=RetryPolicy(attempts=1, call_timeout=0.05), admit=limiter.alimit,
+            )
+        self.assertEqual(breaker._failures, 1)
+        self.assertEqual(limiter.concurrency.in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
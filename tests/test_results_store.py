@@ -0,0 +1,35 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from utils.results_store import ResultsStore
+
+
+class ResultsStoreTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "results.db")
+
+    def test_failed_flush_keeps_the_rows(self):
+        with ResultsStore(self.path, batch_size=100) as store:
+            run_id = store.start_run(label="test")
+            store.record_agent_output("session", "query", "agent", "answer", run_id=run_id)
+            store.connection.execute("PRAGMA busy_timeout = 0")
+
+            # Another writer holds the lock, so the flush fails with "database is locked"
+            blocker = sqlite3.connect(self.path, isolation_level=None)
+            blocker.execute("BEGIN IMMEDIATE")
+            with self.assertRaises(sqlite3.OperationalError):
+                store.flush()
+            blocker.execute("ROLLBACK")
+            blocker.close()
+
+            store.flush()
+            rows = store.connection.execute("SELECT text FROM agent_outputs").fetchall()
+            self.assertEqual([row["text"] for row in rows], ["answer"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from main_agents import local_corpus, retrieval_eval
+from main_agents.config import DEFAULT_EMBEDDING_DIMENSION
+from main_agents.local_corpus import chunk_text
+
+# Three sections of exactly 8 words each (heading included), so 8-word chunks line up with them
+DOCUMENT = """# Shipping
+parcels leave the warehouse every monday
+# Returns
+refunds arrive within fourteen business days
+# Payments
+cards wallets and invoices are accepted
+"""
+
+
+def bag_of_words(texts, task_type):
+    """Deterministic embedding: texts sharing words are close."""
+    vectors = np.full((len(texts), DEFAULT_EMBEDDING_DIMENSION), 1e-3, dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().replace("?", "").split():
+            vectors[row, int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % DEFAULT_EMBEDDING_DIMENSION] += 1
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class SpansTest(unittest.TestCase):
+    def test_section_spans_include_subsections(self):
+        text = "# A\none two\n## B\nthree\n```\n# not a heading\n```\n# C\nfour"
+        spans = retrieval_eval.section_spans(text)
+        self.assertEqual(spans["A"], (0, 13))
+        self.assertEqual(spans["B"], (4, 13))
+        self.assertEqual(spans["C"], (13, 16))
+        self.assertNotIn("not a heading", spans)
+
+    def test_chunk_spans_match_chunk_text(self):
+        words = [f"w{index}" for index in range(23)]
+        for chunk_size, overlap in ((8, 0), (8, 3), (5, 4), (30, 10)):
+            with self.subTest(chunk_size=chunk_size, overlap=overlap):
+                chunks = chunk_text(" ".join(words), chunk_size, overlap)
+                spans = retrieval_eval.chunk_spans(len(words), chunk_size, overlap)
+                self.assertEqual(chunks, [" ".join(words[start:end]) for start, end in spans])
+
+
+class EvaluateTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with open(os.path.join(directory.name, "docs.md"), "w", encoding="utf-8") as file:
+            file.write(DOCUMENT)
+        self.eval_set = os.path.join(directory.name, "eval.json")
+        self.write_questions([
+            {"question": "When do parcels leave the warehouse?", "sections": ["Shipping"]},
+            {"question": "How many days until refunds arrive?", "sections": ["Returns"]},
+            {"question": "Are wallets and invoices accepted?", "sections": ["Payments"]},
+        ])
+        for module in (retrieval_eval, local_corpus):
+            patcher = mock.patch.object(module, "embed_texts", bag_of_words)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def write_questions(self, questions):
+        with open(self.eval_set, "w", encoding="utf-8") as file:
+            json.dump({"document": "docs.md", "questions": questions}, file)
+
+    def test_scores_every_combination(self):
+        results = retrieval_eval.evaluate(
+            chunk_sizes=(8, 16), overlaps=(0, 8), top_ks=(1, 3), thresholds=(0.0, 2.0), eval_set_path=self.eval_set,
+        )
+        # (8, 8) is skipped: 3 chunk settings x 2 top_k x 2 thresholds
+        self.assertEqual(len(results), 12)
+        by_key = {(r.chunk_size, r.chunk_overlap, r.top_k, r.distance_threshold): r for r in results}
+
+        exact = by_key[(8, 0, 1, 2.0)]
+        self.assertEqual(exact.chunks, 3)
+        self.assertEqual(exact.recall, 1.0)
+        self.assertEqual(exact.mrr, 1.0)
+        self.assertEqual(exact.mean_tokens, 8.0)
+        self.assertEqual(by_key[(8, 0, 3, 2.0)].mean_tokens, 24.0)
+
+        # A zero distance threshold keeps nothing
+        strict = by_key[(8, 0, 1, 0.0)]
+        self.assertEqual((strict.recall, strict.mrr, strict.mean_tokens), (0.0, 0.0, 0.0))
+
+        table = retrieval_eval.format_table(results)
+        self.assertEqual(table.splitlines()[0].split()[0], "chunk_size")
+        self.assertEqual(len(table.splitlines()), 13)
+
+    def test_unknown_sections_are_rejected(self):
+        self.write_questions([{"question": "Where is the office?", "sections": ["Offices"]}])
+        with self.assertRaises(ValueError):
+            retrieval_eval.evaluate(chunk_sizes=(8,), overlaps=(0,), top_ks=(1,), thresholds=(2.0,), eval_set_path=self.eval_set)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import sqlite3
+import unittest
+from collections import Counter
+
+from utils.sampling import sample_stratified
+
+
+class SampleStratifiedTest(unittest.TestCase):
+    def table(self, indexed: bool) -> sqlite3.Connection:
+        connection = sqlite3.connect(":memory:")
+        self.addCleanup(connection.close)
+        connection.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, kind TEXT)")
+        # "rare" has 2 rows, all at the end of the table; an unindexed probe from a random rowid rarely reaches them
+        kinds = ["common"] * 5000 + ["other"] * 3000 + ["rare"] * 2
+        connection.executemany("INSERT INTO items (kind) VALUES (?)", [(kind,) for kind in kinds])
+        if indexed:
+            connection.execute("CREATE INDEX idx_items_kind ON items (kind)")
+        return connection
+
+    def test_shortfall_is_redistributed(self):
+        for indexed in (True, False):
+            with self.subTest(indexed=indexed):
+                connection = self.table(indexed)
+                rows, report = sample_stratified(connection, "items", 12, "kind", {"common": 1, "other": 1, "rare": 1})
+
+                counts = Counter(row[1] for row in rows)
+                self.assertEqual(len(rows), 12)
+                self.assertEqual(len({row[0] for row in rows}), 12)
+                self.assertEqual(counts["rare"], 2)
+                self.assertEqual(counts["common"] + counts["other"], 10)
+                self.assertFalse(report["short"])
+                self.assertTrue(report["strata"]["rare"]["exhausted"])
+
+    def test_short_sample_is_reported(self):
+        connection = self.table(indexed=False)
+        rows, report = sample_stratified(connection, "items", 10, "kind", {"rare": 1, "missing": 1})
+
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(report["short"])
+        self.assertEqual(report["returned"], 2)
+        self.assertEqual(report["strata"]["missing"], {"quota": 5, "returned": 0, "exhausted": True})
+
+    def test_temporary_index_leaves_the_database_untouched(self):
+        connection = self.table(indexed=False)
+        schema = connection.execute("SELECT name FROM sqlite_master").fetchall()
+        sample_stratified(connection, "items", 6, "kind", {"common": 1, "other": 1})
+
+        self.assertEqual(connection.execute("SELECT name FROM sqlite_master").fetchall(), schema)
+        self.assertEqual(connection.execute("PRAGMA index_list(items)").fetchall(), [])
+
+    def test_temporary_index_is_rebuilt_after_a_write(self):
+        connection = self.table(indexed=False)
+        rows, _ = sample_stratified(connection, "items", 10, "kind", {"rare": 1})
+        self.assertEqual(len(rows), 2)
+
+        connection.execute("INSERT INTO items (kind) VALUES ('rare')")
+        rows, _ = sample_stratified(connection, "items", 10, "kind", {"rare": 1})
+        self.assertEqual(len(rows), 3)
+
+    def test_same_seed_gives_the_same_sample(self):
+        connection = self.table(indexed=True)
+        first, _ = sample_stratified(connection, "items", 8, "kind", {"common": 1, "other": 1}, seed=3)
+        second, _ = sample_stratified(connection, "items", 8, "kind", {"common": 1, "other": 1}, seed=3)
+        self.assertEqual([tuple(row) for row in first], [tuple(row) for row in second])
+
+
+if __name__ == "__main__":
+    unittest.main()
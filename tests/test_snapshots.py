@@ -0,0 +1,73 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from utils import text_search
+from utils.connection_db import DatabaseConnection
+from utils.database_registry import get_registry
+from utils.snapshots import isolated_database
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIBRARY = os.path.join(ROOT, "utils", "library_database.db")
+
+
+def file_hash(path):
+    with open(path, "rb") as file:
+        return hashlib.md5(file.read()).hexdigest()
+
+
+class IsolatedDatabaseTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "orders.db")
+        shutil.copy(LIBRARY, self.path)
+        self.name = f"test_snapshots_{id(self)}"
+        get_registry().register(self.name, self.path)
+        self.original = file_hash(self.path)
+
+    def count_books(self, db: DatabaseConnection) -> int:
+        return db.execute_query("SELECT COUNT(*) FROM books")[0][0]
+
+    def test_registered_sources_are_copied_for_the_session(self):
+        with isolated_database():
+            db = DatabaseConnection(self.name)
+            self.assertTrue(db.connect())
+            books = self.count_books(db)
+            self.assertTrue(db.isolated)
+            self.assertTrue(db.execute_command("DELETE FROM books"))
+            self.assertEqual(self.count_books(db), 0)
+            self.assertTrue(db.build_text_index(["books"]))
+            db.disconnect()
+
+            # Another connection of the same session sees the session's writes
+            again = DatabaseConnection(self.name)
+            self.assertEqual(self.count_books(again), 0)
+            again.disconnect()
+
+        self.assertEqual(file_hash(self.path), self.original)
+        self.assertFalse(os.path.exists(text_search.index_path(self.path)))
+        outside = DatabaseConnection(self.name)
+        self.addCleanup(outside.disconnect)
+        self.assertEqual(self.count_books(outside), books)
+
+    def test_attached_sources_are_the_session_copies(self):
+        with isolated_database():
+            other = DatabaseConnection(self.name)
+            other.execute_command("DELETE FROM books WHERE book_id > 1")
+            other.disconnect()
+
+            db = DatabaseConnection()
+            with db.attached([self.name]):
+                rows = db.execute_query(f"SELECT COUNT(*) FROM {self.name}.books")
+                db.execute_command(f"DELETE FROM {self.name}.books")
+            db.disconnect()
+
+        self.assertEqual(rows[0][0], 1)
+        self.assertEqual(file_hash(self.path), self.original)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from utils import text_search
+from utils.connection_db import DatabaseConnection
+from utils.database_registry import get_registry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIBRARY = os.path.join(ROOT, "utils", "library_database.db")
+
+
+def file_hash(path):
+    with open(path, "rb") as file:
+        return hashlib.md5(file.read()).hexdigest()
+
+
+class TextIndexTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "library.db")
+        shutil.copy(LIBRARY, self.path)
+        self.name = f"test_text_{id(self)}"
+        get_registry().register(self.name, self.path)
+        self.db = DatabaseConnection(self.name)
+        self.assertTrue(self.db.connect())
+        self.addCleanup(self.db.disconnect)
+
+    def write(self, *statements):
+        connection = sqlite3.connect(self.path)
+        for statement in statements:
+            connection.execute(statement)
+        connection.commit()
+        connection.close()
+
+    def test_indexing_leaves_the_database_untouched(self):
+        before = file_hash(self.path)
+        schema_hash = self.db.get_schema_snapshot()["hash"]
+
+        self.assertIn("books", self.db.build_text_index())
+
+        self.assertEqual(file_hash(self.path), before)
+        self.assertEqual(self.db.get_schema_snapshot()["hash"], schema_hash)
+        self.assertTrue(os.path.exists(text_search.index_path(self.path)))
+        self.assertNotIn("fts_books", self.db.get_tables())
+        title = self.db.connection.execute("SELECT title FROM books LIMIT 1").fetchone()[0]
+        self.assertEqual(self.db.search_text(title.split()[0], tables=["books"])[0]["table"], "books")
+
+    def test_refresh_picks_up_new_tables_and_rows(self):
+        self.db.build_text_index()
+        self.assertEqual(self.db.stale_text_indexes(), {})
+
+        self.write(
+            "CREATE TABLE reviews (body TEXT)",
+            "INSERT INTO reviews (body) VALUES ('a quixotic masterpiece')",
+            "INSERT INTO books (title, author, published_year, genre) VALUES ('Zyzzyva', 'Someone', 2024, 'Essay')",
+        )
+
+        self.assertEqual(self.db.stale_text_indexes(), {"reviews": "build", "books": "append"})
+        self.assertEqual(self.db.refresh_text_index(), {"reviews": "build", "books": "append"})
+        self.assertEqual(self.db.search_text("quixotic")[0]["table"], "reviews")
+        self.assertEqual(self.db.search_text("zyzzyva")[0]["row"]["title"], "Zyzzyva")
+
+        self.write("DELETE FROM books WHERE title = 'Zyzzyva'", "DROP TABLE reviews")
+
+        self.assertEqual(self.db.refresh_text_index(), {"books": "build", "reviews": "drop"})
+        self.assertEqual(self.db.search_text("zyzzyva"), [])
+        self.assertEqual(self.db.stale_text_indexes(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+from utils.connection_db import invalidate_column_stats
+from utils.database_registry import DEFAULT_DATABASE, Connection, get_registry
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS table_watermarks (
+    database TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    schema_hash TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    row_count INTEGER,
+    max_rowid INTEGER,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (database, table_name)
+);
+"""
+
+
+def _default_state_path() -> str:
+    """Ruta del estado del detector de cambios en la carpeta utils"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "change_tracker.db")
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+# Marcas de agua leídas por conexión: conexión -> {tabla: (versiones en las que se leyó, marca de agua)}
+_connection_watermarks = weakref.WeakKeyDictionary()
+_connection_watermarks_lock = threading.Lock()
+
+
+def _versions(connection: sqlite3.Connection, schema: str) -> tuple:
+    """Versiones que cambian con cualquier escritura en un esquema: `data_version` con las de otras
+    conexiones, `total_changes` con las de esta y `schema_version` con los cambios de esquema"""
+    return (
+        connection.execute(f"PRAGMA {_quote(schema)}.data_version").fetchone()[0],
+        connection.execute(f"PRAGMA {_quote(schema)}.schema_version").fetchone()[0],
+        connection.total_changes,
+    )
+
+
+def table_watermark(connection: sqlite3.Connection, table: str) -> Tuple[int, Optional[int]]:
+    """Número de filas y rowid máximo de una tabla (None en tablas WITHOUT ROWID).
+    En conexiones `utils.database_registry.Connection` se reutiliza la última lectura de la tabla
+    mientras no cambien las versiones de su esquema, sin volver a contar las filas.
+
+    Args:
+        connection (sqlite3.Connection): Conexión a la base de datos de la tabla
+        table (str): Nombre de la tabla, "esquema.tabla" en bases de datos adjuntas
+    Returns:
+        Tuple[int, Optional[int]]: e.g. (40, 40)
+    """
+    if not isinstance(connection, Connection):
+        return _read_watermark(connection, table)
+    versions = _versions(connection, table.split(".", 1)[0] if "." in table else "main")
+    with _connection_watermarks_lock:
+        cached = _connection_watermarks.get(connection, {}).get(table)
+    if cached and cached[0] == versions:
+        return cached[1]
+    watermark = _read_watermark(connection, table)
+    with _connection_watermarks_lock:
+        _connection_watermarks.setdefault(connection, {})[table] = (versions, watermark)
+    return watermark
+
+
+def _read_watermark(connection: sqlite3.Connection, table: str) -> Tuple[int, Optional[int]]:
+    name = ".".join(_quote(part) for part in table.split(".", 1)) if "." in table else _quote(table)
+    row_count = connection.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+    try:
+        max_rowid = connection.execute(f"SELECT MAX(rowid) FROM {name}").fetchone()[0]
+    except sqlite3.OperationalError:
+        max_rowid = None  # WITHOUT ROWID
+    return row_count, max_rowid
+
+
+def affected_tables(diff: dict) -> List[str]:
+    """Tablas a las que afecta un diff: nuevas, con cambios de esquema o con filas nuevas o borradas"""
+    tables = list(diff.get("tables_added", [])) + list(diff.get("schema_changed", {}))
+    tables += [table for table, rows in diff.get("rows_changed", {}).items() if table not in tables]
+    return tables
+
+
+class ChangeTracker:
+    """Detecta qué tablas de una base de datos cambiaron desde la última comprobación.
+
+    Usa una conexión propia para leer `PRAGMA data_version`, que solo cambia cuando otra conexión
+    confirma escrituras: si no cambió (ni `schema_version`), la comprobación no lee ninguna tabla.
+    Si cambió, compara con las marcas de agua guardadas por tabla (hash del esquema, columnas,
+    número de filas y rowid máximo) y retorna un diff compacto. Las marcas se guardan en SQLite,
+    así que los cambios entre runs también se detectan.
+
+    Las actualizaciones de filas existentes que no cambian el número de filas no se detectan.
+    """
+
+    def __init__(self, database: str = DEFAULT_DATABASE, state_path: Optional[str] = None):
+        """
+        Args:
+            database (str): Nombre de la base de datos en el registro e.g. "library"
+            state_path (Optional[str]): Archivo SQLite donde se guardan las marcas de agua
+        """
+        self.database = database
+        self.source = get_registry().get(database)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.source.path, check_same_thread=False, factory=Connection)
+        self.state = sqlite3.connect(state_path or _default_state_path(), check_same_thread=False, isolation_level=None)
+        self.state.execute("PRAGMA journal_mode=WAL")
+        self.state.executescript(_SCHEMA)
+        self._versions = None
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+            self.state.close()
+
+    def _watermarks(self) -> Dict[str, dict]:
+        rows = self.state.execute(
+            "SELECT table_name, schema_hash, columns, row_count, max_rowid FROM table_watermarks WHERE database = ?",
+            (self.database,),
+        ).fetchall()
+        return {
+            row[0]: {"schema_hash": row[1], "columns": json.loads(row[2]), "row_count": row[3], "max_rowid": row[4]}
+            for row in rows
+        }
+
+    def _table_state(self, table: str, sql: str, previous: Optional[dict]) -> dict:
+        """Marca de agua actual de una tabla; las filas nuevas se cuentan solo por encima del rowid anterior"""
+        columns = {row[1]: row[2] for row in self.connection.execute(f"PRAGMA table_info({_quote(table)})")}
+        state = {
+            "schema_hash": hashlib.sha256((sql or "").encode()).hexdigest(),
+            "columns": columns,
+            "row_count": self.connection.execute(f"SELECT COUNT(*) FROM {_quote(table)}").fetchone()[0],
+            "max_rowid": None,
+            "inserted": None,
+        }
+        try:
+            state["max_rowid"] = self.connection.execute(f"SELECT MAX(rowid) FROM {_quote(table)}").fetchone()[0]
+        except sqlite3.OperationalError:
+            return state  # WITHOUT ROWID
+        if previous and previous["max_rowid"] is not None:
+            state["inserted"] = self.connection.execute(
+                f"SELECT COUNT(*) FROM {_quote(table)} WHERE rowid > ?", (previous["max_rowid"],)
+            ).fetchone()[0]
+        return state
+
+    def _read_versions(self) -> tuple:
+        return (
+            self.connection.execute("PRAGMA data_version").fetchone()[0],
+            self.connection.execute("PRAGMA schema_version").fetchone()[0],
+        )
+
+    def table_watermark(self, table: str) -> Tuple[int, Optional[int]]:
+        """Número de filas y rowid máximo actuales de una tabla (ver `table_watermark`).
+        Mientras `PRAGMA data_version` no cambie se reutiliza la última lectura sin leer la tabla."""
+        with self._lock:
+            return table_watermark(self.connection, table)
+
+    def check(self) -> dict:
+        """Compara la base de datos con la última comprobación y guarda las nuevas marcas de agua
+
+        Returns:
+            dict: e.g. {"database": "library", "changed": True, "tables_added": [], "tables_removed": [],
+                        "schema_changed": {"books": {"added_columns": ["isbn"], "removed_columns": [],
+                                                     "changed_columns": []}},
+                        "rows_changed": {"sales": {"inserted": 12, "deleted": 0, "row_count": 40}}}
+        """
+        with self._lock:
+            versions = self._read_versions()
+            diff = {
+                "database": self.database,
+                "changed": False,
+                "tables_added": [],
+                "tables_removed": [],
+                "schema_changed": {},
+                "rows_changed": {},
+            }
+            if versions == self._versions:
+                return diff
+
+            previous = self._watermarks()
+            tables = self.connection.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()
+            current = {}
+            for table, sql in tables:
+                old = previous.get(table)
+                state = self._table_state(table, sql, old)
+                current[table] = state
+                if old is None:
+                    diff["tables_added"].append(table)
+                    continue
+                if state["schema_hash"] != old["schema_hash"]:
+                    diff["schema_changed"][table] = {
+                        "added_columns": [c for c in state["columns"] if c not in old["columns"]],
+                        "removed_columns": [c for c in old["columns"] if c not in state["columns"]],
+                        "changed_columns": [
+                            c for c in state["columns"]
+                            if c in old["columns"] and old["columns"][c] != state["columns"][c]
+                        ],
+                    }
+                inserted = state["inserted"] or 0
+                deleted = max(0, old["row_count"] + inserted - state["row_count"])
+                if inserted or deleted or state["row_count"] != old["row_count"]:
+                    diff["rows_changed"][table] = {
+                        "inserted": inserted,
+                        "deleted": deleted,
+                        "row_count": state["row_count"],
+                    }
+            diff["tables_removed"] = [table for table in previous if table not in current]
+
+            now = time.time()
+            self.state.execute("BEGIN")
+            self.state.executemany(
+                "DELETE FROM table_watermarks WHERE database = ? AND table_name = ?",
+                [(self.database, table) for table in diff["tables_removed"]],
+            )
+            self.state.executemany(
+                """INSERT OR REPLACE INTO table_watermarks
+                   (database, table_name, schema_hash, columns, row_count, max_rowid, checked_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [
+                    (self.database, table, state["schema_hash"], json.dumps(state["columns"]),
+                     state["row_count"], state["max_rowid"], now)
+                    for table, state in current.items()
+                ],
+            )
+            self.state.execute("COMMIT")
+            self._versions = versions
+
+        diff["changed"] = bool(affected_tables(diff) or diff["tables_removed"])
+        if diff["changed"]:
+            invalidate_column_stats(self.source.path, affected_tables(diff) + diff["tables_removed"])
+        return diff
+
+
+_trackers: Dict[str, ChangeTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_change_tracker(database: str = DEFAULT_DATABASE) -> ChangeTracker:
+    """Retorna el detector de cambios de una base de datos, compartido por el proceso"""
+    with _trackers_lock:
+        if database not in _trackers:
+            _trackers[database] = ChangeTracker(database)
+        return _trackers[database]
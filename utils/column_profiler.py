@@ -0,0 +1,220 @@
+import hashlib
+import heapq
+import json
+import math
+import random
+import sqlite3
+from typing import List, Optional
+
+# Tablas con más filas que este umbral se perfilan con un escaneo muestreado
+DEFAULT_SAMPLE_THRESHOLD = 200_000
+# Filas aproximadas que lee el escaneo muestreado
+DEFAULT_SAMPLE_ROWS = 50_000
+# Bloques contiguos de rowid que componen la muestra
+DEFAULT_SAMPLE_BLOCKS = 50
+DEFAULT_TOP_K = 5
+DEFAULT_HISTOGRAM_BINS = 10
+
+# Tamaño de los sketches de cada columna
+_KMV_SIZE = 1024
+_TOP_K_CAPACITY = 64
+_RESERVOIR_SIZE = 2048
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _stable_hash(key) -> int:
+    """Hash de 64 bits igual en todos los procesos: hash() de un str cambia con PYTHONHASHSEED,
+    así que los perfiles calculados en `main_agents.process_pool` no coincidirían entre procesos"""
+    if isinstance(key, float) and key.is_integer():
+        key = int(key)  # 3.0 y 3 son el mismo valor en SQLite
+    return int.from_bytes(hashlib.blake2b(repr(key).encode("utf-8", "surrogatepass"), digest_size=8).digest(), "little")
+
+
+class ColumnSketch:
+    """Agregado de SQLite que resume una columna en una sola pasada.
+
+    - distinct: estimación KMV (k minimum values) sobre un hash de 64 bits
+    - top_k: algoritmo Misra-Gries con capacidad fija (los conteos son cotas inferiores)
+    - histograma: reservorio (algoritmo L) de valores numéricos del que se calculan los bins al final
+    """
+
+    top_k = DEFAULT_TOP_K
+    bins = DEFAULT_HISTOGRAM_BINS
+
+    def __init__(self):
+        self._hashes = []  # max-heap (negado) con los k hashes más pequeños
+        self._hash_set = set()
+        self._counters = {}
+        self._reservoir = []
+        self._numeric_seen = 0
+        self._rng = random.Random(0)
+        self._weight = 1.0
+        self._next_replacement = _RESERVOIR_SIZE
+
+    def _schedule_replacement(self) -> None:
+        """Algoritmo L: calcula cuántos valores saltar antes del próximo reemplazo"""
+        # 1 - random() está en (0, 1], así log() nunca recibe 0
+        self._weight *= math.exp(math.log(1 - self._rng.random()) / _RESERVOIR_SIZE)
+        skip = math.floor(math.log(1 - self._rng.random()) / math.log(1 - self._weight))
+        self._next_replacement += skip + 1
+
+    def step(self, value):
+        if value is None:
+            return
+        key = value if isinstance(value, (int, float, str)) else repr(value)
+
+        hashed = _stable_hash(key)
+        if hashed not in self._hash_set:
+            if len(self._hashes) < _KMV_SIZE:
+                heapq.heappush(self._hashes, -hashed)
+                self._hash_set.add(hashed)
+            elif hashed < -self._hashes[0]:
+                removed = -heapq.heapreplace(self._hashes, -hashed)
+                self._hash_set.discard(removed)
+                self._hash_set.add(hashed)
+
+        counters = self._counters
+        if key in counters:
+            counters[key] += 1
+        elif len(counters) < _TOP_K_CAPACITY:
+            counters[key] = 1
+        else:
+            for other in list(counters):
+                counters[other] -= 1
+                if not counters[other]:
+                    del counters[other]
+
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self._numeric_seen += 1
+            if len(self._reservoir) < _RESERVOIR_SIZE:
+                self._reservoir.append(value)
+                if len(self._reservoir) == _RESERVOIR_SIZE:
+                    self._schedule_replacement()
+            elif self._numeric_seen == self._next_replacement:
+                self._reservoir[self._rng.randrange(_RESERVOIR_SIZE)] = value
+                self._schedule_replacement()
+
+    def _distinct_estimate(self) -> int:
+        if len(self._hashes) < _KMV_SIZE:
+            return len(self._hashes)
+        kth = -self._hashes[0] / 2**64
+        return int((_KMV_SIZE - 1) / kth)
+
+    def _histogram(self) -> Optional[List[dict]]:
+        if not self._reservoir:
+            return None
+        low, high = min(self._reservoir), max(self._reservoir)
+        if low == high:
+            return [{"low": low, "high": high, "count": self._numeric_seen}]
+        width = (high - low) / self.bins
+        counts = [0] * self.bins
+        for value in self._reservoir:
+            counts[min(int((value - low) / width), self.bins - 1)] += 1
+        scale = self._numeric_seen / len(self._reservoir)
+        return [
+            {"low": low + i * width, "high": low + (i + 1) * width, "count": round(count * scale)}
+            for i, count in enumerate(counts)
+        ]
+
+    def finalize(self):
+        top = sorted(self._counters.items(), key=lambda item: item[1], reverse=True)[: self.top_k]
+        return json.dumps({
+            "distinct_estimate": self._distinct_estimate(),
+            "top_values": [{"value": value, "min_count": count} for value, count in top],
+            "histogram": self._histogram(),
+        })
+
+
+def _register(connection: sqlite3.Connection, top_k: int, bins: int) -> str:
+    """Registra el agregado en la conexión con la configuración pedida y retorna su nombre"""
+    name = f"column_sketch_{top_k}_{bins}"
+    sketch = type(name, (ColumnSketch,), {"top_k": top_k, "bins": bins})
+    connection.create_aggregate(name, 1, sketch)
+    return name
+
+
+def _sampled_source(connection: sqlite3.Connection, table: str, sample_rows: int, blocks: int, seed: int) -> Optional[tuple]:
+    """Subconsulta que lee bloques contiguos de rowid al azar (búsquedas por rango, sin escaneo completo)
+
+    Returns:
+        Optional[tuple]: (sql, params) o None si la tabla no tiene rowid
+    """
+    try:
+        low, high = connection.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {_quote(table)}").fetchone()
+    except sqlite3.OperationalError:
+        return None  # WITHOUT ROWID
+    if low is None:
+        return None
+    block = max(1, sample_rows // blocks)
+    rng = random.Random(seed)
+    starts = sorted({rng.randint(low, max(low, high - block)) for _ in range(blocks)})
+    ranges = " OR ".join("rowid BETWEEN ? AND ?" for _ in starts)
+    params = [bound for start in starts for bound in (start, start + block - 1)]
+    return f"(SELECT * FROM {_quote(table)} WHERE {ranges})", params
+
+
+def profile_table(
+    connection: sqlite3.Connection,
+    table: str,
+    row_count: int,
+    sample_threshold: int = DEFAULT_SAMPLE_THRESHOLD,
+    sample_rows: int = DEFAULT_SAMPLE_ROWS,
+    top_k: int = DEFAULT_TOP_K,
+    bins: int = DEFAULT_HISTOGRAM_BINS,
+    seed: int = 0,
+) -> dict:
+    """Calcula estadísticas de todas las columnas de una tabla en un único escaneo agregado
+
+    Args:
+        connection (sqlite3.Connection): Conexión abierta
+        table (str): Nombre de la tabla e.g. "books"
+        row_count (int): Filas (o estimación) de la tabla, decide si se muestrea
+        sample_threshold (int): A partir de cuántas filas se usa un escaneo muestreado
+        sample_rows (int): Filas aproximadas del escaneo muestreado
+        top_k (int): Valores más frecuentes por columna
+        bins (int): Bins del histograma de columnas numéricas
+        seed (int): Semilla de la muestra
+    Returns:
+        dict: e.g. {"table": "books", "sampled": False, "rows_scanned": 6,
+                    "columns": {"published_year": {"null_fraction": 0.0, "distinct_estimate": 6,
+                                "min": 1813, "max": 1960, "top_values": [...], "histogram": [...]}}}
+    """
+    columns = [row[1] for row in connection.execute(f"PRAGMA table_info({_quote(table)})")]
+    sketch = _register(connection, top_k, bins)
+
+    source, params = _quote(table), []
+    sampled = False
+    if row_count > sample_threshold:
+        sampled_source = _sampled_source(connection, table, sample_rows, DEFAULT_SAMPLE_BLOCKS, seed)
+        if sampled_source:
+            (source, params), sampled = sampled_source, True
+
+    aggregates = ["COUNT(*)"]
+    for column in columns:
+        quoted = _quote(column)
+        aggregates += [f"COUNT({quoted})", f"MIN({quoted})", f"MAX({quoted})", f"{sketch}({quoted})"]
+    row = connection.execute(f"SELECT {', '.join(aggregates)} FROM {source}", params).fetchone()
+
+    scanned = row[0]
+    stats = {}
+    for index, column in enumerate(columns):
+        non_null, minimum, maximum, summary = row[1 + index * 4: 5 + index * 4]
+        summary = json.loads(summary)
+        stats[column] = {
+            "null_fraction": round(1 - non_null / scanned, 4) if scanned else None,
+            "distinct_estimate": summary["distinct_estimate"],
+            "min": minimum,
+            "max": maximum,
+            "top_values": summary["top_values"],
+            "histogram": summary["histogram"],
+        }
+    return {
+        "table": table,
+        "row_count": row_count,
+        "sampled": sampled,
+        "rows_scanned": scanned,
+        "columns": stats,
+    }
@@ -1,36 +1,82 @@
 import sqlite3
 import os
-from typing import List, Tuple, Optional, Any
+import contextlib
+import itertools
+import time
+from typing import List, Tuple, Optional, Any, Iterable
+
+from utils.column_profiler import profile_table
+from utils.database_registry import get_registry
+from utils.query_guard import QueryGuard, read_only_authorizer
+from utils.query_result import QueryResult
+from utils.sampling import sample_stratified, sample_uniform
+from utils.snapshots import session_connection
+from utils import text_search
+
+# Perfiles de columnas por (ruta, hash del esquema) -> {tabla: ((filas, rowid máximo), perfil)}
+_profile_cache = {}
+# Filas por llamada a executemany en las escrituras por lotes
+DEFAULT_WRITE_CHUNK_SIZE = 10_000
+
+
+def invalidate_column_stats(db_path: str, tables: List[str]) -> None:
+    """Descarta los perfiles de columnas cacheados de unas tablas (e.g. tras detectar cambios en ellas)"""
+    for (path, _), cache in list(_profile_cache.items()):
+        if path == db_path:
+            for table in tables:
+                cache.pop(table, None)
 
 class DatabaseConnection:
     """Usa esta Tool para conectarte a la base de datos SQLite y ejecutar consultas SQL.
-    Clase para manejar la conexión y consultas a la base de datos library_database.db"""
+    Clase para manejar la conexión y consultas a una de las bases de datos del registro
+    (por defecto library_database.db)"""
     
-    def __init__(self):
-        """Inicializa la conexión a la base de datos"""
+    def __init__(self, database: Optional[str] = None):
+        """Inicializa la conexión a la base de datos
+        Args:
+            database (Optional[str]): Nombre de la base de datos en `utils.database_registry` e.g. "orders".
+                                      Por defecto "library"
+        """
+        self.source = get_registry().get(database)
         self.db_path = self._get_database_path()
         self.connection = None
+        self.query_guard = None
+        self._shared = False
+        self._transaction_depth = 0
     
     def _get_database_path(self) -> str:
-        """Obtiene la ruta de la base de datos en la carpeta utils"""
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        return os.path.join(current_dir, "library_database.db")
+        """Obtiene la ruta de la base de datos registrada"""
+        return self.source.path
     
     def connect(self) -> bool:
-        """Establece conexión con la base de datos"""
+        """Establece conexión con la base de datos, reutilizando las conexiones del pool de la base de datos.
+        Dentro de `utils.snapshots.isolated_database()` se usa la copia en memoria de la sesión."""
         try:
-            self.connection = sqlite3.connect(self.db_path)
+            shared = session_connection(self.db_path)
+            self._shared = shared is not None
+            if self._shared:
+                self.connection = shared
+            else:
+                self.connection = self.source.acquire()
             self.connection.row_factory = sqlite3.Row  # Para acceder a columnas por nombre
+            self.query_guard = QueryGuard(self.connection, row_estimator=self._estimate_row_count, db_path=self.db_path)
             return True
         except sqlite3.Error as e:
             print(f"Error al conectar con la base de datos: {e}")
             return False
     
+    @property
+    def isolated(self) -> bool:
+        """True si la conexión es la copia en memoria de la sesión, que otros procesos no pueden ver"""
+        return self._shared
+
     def disconnect(self) -> None:
         """Cierra la conexión con la base de datos"""
         if self.connection:
-            self.connection.close()
+            if not self._shared:  # la copia de la sesión se cierra al salir de isolated_database()
+                self.source.release(self.connection)
             self.connection = None
+            self.query_guard = None
     
     def get_tables(self) -> List[str]:
         """
@@ -42,7 +88,7 @@ class DatabaseConnection:
         
         try:
             cursor = self.connection.cursor()
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT name 
                 FROM sqlite_master 
                 WHERE type='table' AND name NOT LIKE 'sqlite_%'
@@ -72,29 +118,46 @@ class DatabaseConnection:
             print(f"Error al obtener el esquema de la tabla {table_name}: {e}")
             return []
     
-    def execute_query(self, query: str, params: Optional[Tuple] = None) -> List[sqlite3.Row]:
-        """Ejecuta una consulta SELECT y retorna los resultados
+    def execute_query(self, query: str, params: Optional[Tuple] = None, guard: bool = True) -> QueryResult:
+        """Ejecuta una consulta SELECT y retorna los resultados.
+        Solo se permiten lecturas. Antes de ejecutarla se revisa su plan (EXPLAIN QUERY PLAN): las consultas
+        que recorrerían demasiadas filas se limitan con un LIMIT o se rechazan.
         
         Args:
             query (str): Consulta SQL a ejecutar. e.g "SELECT * FROM books WHERE author = ?"
             params (Optional[Tuple]): Parámetros para la consulta SQL. e.g. ('J.K. Rowling',)
+            guard (bool): Revisar el coste de la consulta antes de ejecutarla (desactívalo solo para consultas internas)
         Returns:
-            List[sqlite3.Row]: Resultados de la consulta
+            QueryResult: Nombres de columna y filas como tuplas, e.g. result.columns, result[0],
+                         result.column("title"), result.to_json(). Vacío si hay un error
         """
         if not self.connection:
             if not self.connect():
-                return []
+                return QueryResult.empty()
         
+        if guard:
+            decision = self.query_guard.check(query, params)
+            if not decision.allowed:
+                print(f"Error al ejecutar la consulta: {decision.reason}")
+                return QueryResult.empty()
+            if decision.rewritten:
+                print(decision.reason)
+            query = decision.query
+
         try:
+            self.connection.set_authorizer(read_only_authorizer)
             cursor = self.connection.cursor()
+            cursor.row_factory = None  # tuplas: los nombres de columna se guardan una sola vez en el resultado
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
-            return cursor.fetchall()
+            return QueryResult.from_cursor(cursor)
         except sqlite3.Error as e:
             print(f"Error al ejecutar la consulta: {e}")
-            return []
+            return QueryResult.empty()
+        finally:
+            self.connection.set_authorizer(None)
     
     def execute_command(self, command: str, params: Optional[Tuple] = None) -> bool:
         """Ejecuta un comando INSERT, UPDATE o DELETE
@@ -114,12 +177,116 @@ class DatabaseConnection:
                 cursor.execute(command, params)
             else:
                 cursor.execute(command)
-            self.connection.commit()
+            if not self._transaction_depth:  # dentro de transaction() se confirma al final del bloque
+                self.connection.commit()
             return True
         except sqlite3.Error as e:
             print(f"Error al ejecutar el comando: {e}")
-            self.connection.rollback()
+            if not self._transaction_depth:
+                self.connection.rollback()
             return False
+
+    @contextlib.contextmanager
+    def transaction(self, rollback: bool = False):
+        """Agrupa varias escrituras en una transacción explícita. Anidado dentro de otra transacción
+        se convierte en un SAVEPOINT, así un error solo deshace las escrituras del bloque interno.
+
+        e.g.
+            with db.transaction():
+                db.execute_command("INSERT INTO users (name) VALUES (?)", ("Ana",))
+                with db.transaction():  # SAVEPOINT
+                    db.execute_many("INSERT INTO sales (user_id) VALUES (?)", rows)
+
+        Args:
+            rollback (bool): Deshacer siempre las escrituras al salir, e.g. tras una prueba que modificó datos
+        """
+        if not self.connection:
+            if not self.connect():
+                raise sqlite3.OperationalError("No se pudo conectar a la base de datos")
+
+        savepoint = f"sp_{self._transaction_depth}"
+        if self._transaction_depth:
+            self.connection.execute(f"SAVEPOINT {savepoint}")
+        else:
+            if self.connection.in_transaction:
+                self.connection.commit()
+            self.connection.execute("BEGIN IMMEDIATE")
+        self._transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._end_transaction(savepoint, commit=False)
+            raise
+        self._end_transaction(savepoint, commit=not rollback)
+
+    def _end_transaction(self, savepoint: str, commit: bool) -> None:
+        self._transaction_depth -= 1
+        if self._transaction_depth:
+            if not commit:
+                self.connection.execute(f"ROLLBACK TO {savepoint}")
+            self.connection.execute(f"RELEASE {savepoint}")
+        elif commit:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+
+    def rollback_after(self):
+        """Transacción que siempre se deshace al salir: los datos quedan como antes de la prueba
+
+        e.g.
+            with db.rollback_after():
+                db.execute_command("DELETE FROM books")
+                ...  # pruebas contra los datos modificados
+        """
+        return self.transaction(rollback=True)
+
+    def execute_many(
+        self,
+        command: str,
+        rows: Iterable[Tuple],
+        chunk_size: int = DEFAULT_WRITE_CHUNK_SIZE,
+    ) -> dict:
+        """Ejecuta un INSERT, UPDATE o DELETE por lotes con executemany, dentro de una transacción
+        (o de un SAVEPOINT si ya hay una abierta). Las filas se leen por bloques, así que `rows`
+        puede ser un generador de millones de filas sin cargarlas en memoria. Si algo falla se
+        deshacen todas las filas de la llamada.
+
+        Args:
+            command (str): Comando SQL con parámetros. e.g "INSERT INTO books (title, author) VALUES (?, ?)"
+            rows (Iterable[Tuple]): Parámetros de cada fila. e.g. [("Book 1", "Author 1"), ...] o un generador
+            chunk_size (int): Filas por llamada a executemany
+        Returns:
+            dict: e.g. {"status": "success", "rows": 100000, "chunks": 10, "seconds": 0.21, "rows_per_sec": 476190}
+        """
+        if not self.connection:
+            if not self.connect():
+                return {"status": "error", "message": "No se pudo conectar a la base de datos", "rows": 0}
+
+        written = 0
+        chunks = 0
+        start = time.perf_counter()
+        try:
+            with self.transaction():
+                iterator = iter(rows)
+                while True:
+                    chunk = list(itertools.islice(iterator, chunk_size))
+                    if not chunk:
+                        break
+                    cursor = self.connection.executemany(command, chunk)
+                    written += len(chunk) if cursor.rowcount < 0 else cursor.rowcount
+                    chunks += 1
+        except sqlite3.Error as e:
+            print(f"Error al ejecutar el comando por lotes: {e}")
+            return {"status": "error", "message": str(e), "rows": 0}
+
+        seconds = time.perf_counter() - start
+        return {
+            "status": "success",
+            "rows": written,
+            "chunks": chunks,
+            "seconds": round(seconds, 4),
+            "rows_per_sec": round(written / seconds) if seconds > 0 else None,
+        }
     
     def get_foreign_keys(self) -> List[dict]:
         """
@@ -189,6 +356,318 @@ class DatabaseConnection:
         
         return info
 
+    def get_schema_snapshot(self) -> dict:
+        """Obtiene una instantánea del esquema: el SQL de cada objeto y un hash que cambia con cualquier DDL
+
+        Returns:
+            dict: e.g. {"hash": "9f2c...", "objects": {"books": "CREATE TABLE books (...)"}}
+        """
+        if not self.connection:
+            if not self.connect():
+                return {}
+
+        try:
+            # Se recalcula solo cuando cambia schema_version; la copia de la sesión no comparte la caché
+            return self.source.schema_snapshot(self.connection, cache=not self._shared)
+        except sqlite3.Error as e:
+            print(f"Error al obtener el esquema de la base de datos: {e}")
+            return {}
+
+    def _estimate_row_count(self, table_name: str) -> int:
+        """Estima el número de filas sin escanear la tabla (sqlite_stat1 o rango de rowid).
+        Acepta tablas de bases de datos adjuntas como "esquema.tabla"."""
+        cursor = self.connection.cursor()
+        schema, table = "main", table_name
+        if "." in table_name:
+            prefix, name = table_name.split(".", 1)
+            if prefix in {row[1] for row in cursor.execute("PRAGMA database_list")}:
+                schema, table = prefix, name
+        try:
+            cursor.execute(f'SELECT stat FROM "{schema}".sqlite_stat1 WHERE tbl = ? AND idx IS NULL', (table,))
+            row = cursor.fetchone()
+            if row and row[0]:
+                return int(str(row[0]).split()[0])
+        except sqlite3.Error:
+            pass  # sin ANALYZE no existe sqlite_stat1
+        try:
+            cursor.execute(f'SELECT MIN(rowid), MAX(rowid) FROM "{schema}"."{table}"')
+            low, high = cursor.fetchone()
+            return 0 if low is None else high - low + 1
+        except sqlite3.Error:
+            cursor.execute(f'SELECT COUNT(*) FROM "{schema}"."{table}"')  # tablas WITHOUT ROWID
+            return cursor.fetchone()[0]
+
+    def get_catalog(self) -> dict:
+        """Obtiene tablas, esquemas y foreign keys de la base de datos de una vez.
+        El catálogo se guarda en caché por base de datos hasta que cambie su esquema.
+
+        Returns:
+            dict: e.g. {"tables": ["books", ...], "schemas": {"books": [(0, "book_id", "INTEGER", 0, None, 1), ...]},
+                        "foreign_keys": [{"table_name": "sales", "column_name": "book_id", ...}]}
+        """
+        if not self.connection:
+            if not self.connect():
+                return {}
+
+        try:
+            # Una copia en memoria de la sesión puede tener su propio esquema: no comparte la caché
+            return self.source.catalog(self.connection, cache=not self._shared)
+        except sqlite3.Error as e:
+            print(f"Error al obtener el catálogo de la base de datos: {e}")
+            return {}
+
+    def _text_index_path(self) -> str:
+        """Archivo de índices de texto: junto a la base de datos, o en memoria para la copia de la sesión"""
+        return text_search.MEMORY_INDEX if self._shared else text_search.index_path(self.db_path)
+
+    def build_text_index(self, tables: Optional[List[str]] = None) -> dict:
+        """Crea (o recrea) índices de texto completo (FTS5) sobre las columnas TEXT de las tablas, para buscar
+        filas por un concepto (un email, un título) sin escaneos LIKE '%...%'. Los índices viven en un archivo
+        aparte (ver `utils.text_search.index_path`): la base de datos, su esquema y su hash no cambian.
+        Reconstruye aunque el índice parezca al día, e.g. tras actualizar filas existentes.
+
+        Args:
+            tables (Optional[List[str]]): Tablas a indexar. Por defecto todas las que tienen columnas TEXT
+        Returns:
+            dict: Columnas indexadas por tabla e.g. {"books": ["title", "author", "genre"]}
+        """
+        if not self.connection:
+            if not self.connect():
+                return {}
+
+        indexed = {}
+        with text_search.attach_index(self.connection, self._text_index_path()):
+            for table in self.get_database_info()["tables"]:
+                if tables is not None and table["name"] not in tables:
+                    continue
+                columns = [column["name"] for column in table["columns"] if text_search.is_text_column(column["type"])]
+                if not columns:
+                    continue
+                try:
+                    text_search.build_index(self.connection, table["name"], columns)
+                    indexed[table["name"]] = columns
+                except sqlite3.Error as e:
+                    # e.g. tablas WITHOUT ROWID, que no tienen rowid con el que enlazar el índice
+                    print(f"Error al crear el índice de texto de la tabla {table['name']}: {e}")
+        return indexed
+
+    def stale_text_indexes(self, tables: Optional[List[str]] = None) -> dict:
+        """Índices de texto que no están al día (ver `utils.text_search.stale_tables`). Solo lee el número
+        de filas y el rowid máximo de cada tabla.
+
+        Args:
+            tables (Optional[List[str]]): Tablas a comprobar. Por defecto todas
+        Returns:
+            dict: Acción pendiente por tabla e.g. {"reviews": "build", "sales": "append"}
+        """
+        if not self.connection:
+            if not self.connect():
+                return {}
+
+        try:
+            with text_search.attach_index(self.connection, self._text_index_path()):
+                return text_search.stale_tables(self.connection, tables)
+        except sqlite3.Error as e:
+            print(f"Error al comprobar los índices de texto: {e}")
+            return {}
+
+    def refresh_text_index(self, tables: Optional[List[str]] = None) -> dict:
+        """Pone al día los índices de texto: indexa las tablas nuevas, añade las filas insertadas
+        y reconstruye las tablas con cambios de esquema o filas borradas
+
+        Args:
+            tables (Optional[List[str]]): Tablas a poner al día. Por defecto todas
+        Returns:
+            dict: Acción aplicada por tabla e.g. {"reviews": "build"}
+        """
+        if not self.connection:
+            if not self.connect():
+                return {}
+
+        try:
+            with text_search.attach_index(self.connection, self._text_index_path()):
+                return text_search.refresh_index(self.connection, tables)
+        except sqlite3.Error as e:
+            print(f"Error al actualizar los índices de texto: {e}")
+            return {}
+
+    def search_text(self, text: str, tables: Optional[List[str]] = None, limit: int = text_search.DEFAULT_SEARCH_LIMIT) -> List[dict]:
+        """Busca texto en los índices FTS5 y retorna las filas ordenadas por relevancia
+        Args:
+            text (str): Texto a buscar e.g. "orwell" o "john@example.com"; "tit*" busca por prefijo
+            tables (Optional[List[str]]): Tablas en las que buscar. Por defecto todas las indexadas
+            limit (int): Número máximo de filas
+        Returns:
+            List[dict]: e.g. [{"table": "books", "rowid": 3, "score": 1.7, "snippet": "...", "row": {...}}]
+        """
+        if not self.connection:
+            if not self.connect():
+                return []
+
+        try:
+            with text_search.attach_index(self.connection, self._text_index_path()):
+                return text_search.search(self.connection, text, tables=tables, limit=limit)
+        except sqlite3.Error as e:
+            print(f"Error al buscar texto: {e}")
+            return []
+
+    @contextlib.contextmanager
+    def attached(self, databases: List[str]):
+        """Adjunta otras bases de datos del registro a esta conexión con ATTACH, para cruzarlas
+        en una sola consulta. Cada una se usa con su nombre como esquema, e.g. "orders.customers".
+        Al salir del bloque se separan con DETACH. En una sesión aislada se adjunta una instantánea de la
+        copia de la sesión: lo escrito a través del esquema adjunto se descarta al separarla.
+
+        e.g.
+            with db.attached(["orders"]):
+                db.execute_query("SELECT b.title FROM books b JOIN orders.order_items i ON i.book_id = b.book_id")
+
+        Args:
+            databases (List[str]): Nombres de las bases de datos a adjuntar
+        """
+        if not self.connection:
+            if not self.connect():
+                raise sqlite3.OperationalError("No se pudo conectar a la base de datos")
+
+        others = [name for name in dict.fromkeys(databases) if name != self.source.name]
+        limit = self.connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        if len(others) > limit:
+            raise ValueError(f"SQLite solo permite adjuntar {limit} bases de datos por conexión, se pidieron {len(others)}")
+
+        registry = get_registry()
+        done = []
+        try:
+            for name in others:
+                path = registry.get(name).path
+                if self._shared:
+                    # En una sesión aislada se adjunta una instantánea de la copia de la sesión, no el archivo
+                    self.connection.execute(f'ATTACH DATABASE ? AS "{name}"', (":memory:",))
+                    self.connection.deserialize(session_connection(path).serialize(), name=name)
+                else:
+                    self.connection.execute(f'ATTACH DATABASE ? AS "{name}"', (path,))
+                done.append(name)
+            yield self
+        finally:
+            for name in done:
+                self.connection.execute(f'DETACH DATABASE "{name}"')
+
+    def get_column_stats(self, table_name: str, refresh: bool = False) -> dict:
+        """Obtiene estadísticas por columna de una tabla en un único escaneo agregado:
+        fracción de nulos, estimación de distintos, min/max, valores más frecuentes e histograma numérico.
+        En tablas muy grandes se usa un escaneo muestreado. El resultado se guarda en caché junto
+        con la instantánea del esquema y se invalida si cambia el esquema, el número de filas o el rowid máximo.
+
+        Args:
+            table_name (str): Nombre de la tabla e.g. "books"
+            refresh (bool): Ignorar la caché y recalcular
+        Returns:
+            dict: Perfil de la tabla (ver `utils.column_profiler.profile_table`)
+        """
+        if not self.connection:
+            if not self.connect():
+                return {}
+
+        try:
+            cached = None if refresh else self.cached_column_stats(table_name)
+            if cached is not None:
+                return cached
+
+            # Antes de perfilar: una escritura durante el perfilado deja el perfil obsoleto
+            watermark = self.table_watermark(table_name)
+            profile = profile_table(self.connection, table_name, watermark[0])
+            self.store_column_stats(table_name, profile, watermark)
+            return profile
+        except sqlite3.Error as e:
+            print(f"Error al obtener las estadísticas de la tabla {table_name}: {e}")
+            return {}
+
+    def _profile_cache(self) -> dict:
+        return _profile_cache.setdefault((self.db_path, self.get_schema_snapshot().get("hash")), {})
+
+    def table_watermark(self, table_name: str) -> tuple:
+        """Número de filas y rowid máximo con los que se valida un perfil cacheado.
+        Las tablas de la base de datos principal se leen con su detector de cambios; la copia de una
+        sesión aislada y las tablas adjuntas, con esta conexión. En ambos casos la tabla no se vuelve
+        a leer mientras no cambien las versiones de su esquema (ver `utils.change_tracker.table_watermark`)."""
+        from utils.change_tracker import get_change_tracker, table_watermark  # change_tracker importa este módulo
+
+        if self.isolated or "." in table_name:
+            return table_watermark(self.connection, table_name)
+        return get_change_tracker(self.source.name).table_watermark(table_name)
+
+    def cached_column_stats(self, table_name: str) -> Optional[dict]:
+        """Perfil de una tabla guardado en caché, o None si no existe o si la tabla tiene otro número
+        de filas u otro rowid máximo que cuando se perfiló"""
+        cached = self._profile_cache().get(table_name)
+        if cached and cached[0] == self.table_watermark(table_name):
+            return cached[1]
+        return None
+
+    def store_column_stats(self, table_name: str, profile: dict, watermark: Optional[tuple] = None) -> None:
+        """Guarda en caché un perfil calculado fuera de esta conexión (e.g. en `main_agents.process_pool`)
+
+        Args:
+            table_name (str): Nombre de la tabla e.g. "books"
+            profile (dict): Perfil de la tabla (ver `utils.column_profiler.profile_table`)
+            watermark (Optional[tuple]): Número de filas y rowid máximo cuando se perfiló. Por defecto los actuales
+        """
+        self._profile_cache()[table_name] = (watermark or self.table_watermark(table_name), profile)
+
+    def sample_rows(
+        self,
+        table_name: str,
+        n: int = 5,
+        seed: int = 0,
+        stratify_by: Optional[str] = None,
+        strata: Optional[List[Any]] = None,
+        allocation: str = "equal",
+    ) -> QueryResult:
+        """Obtiene una muestra representativa de filas sondeando rangos de rowid.
+        Cuesta O(n) incluso en tablas con millones de filas y es reproducible con la misma semilla.
+        Estratificar por una columna sin índice recorre la tabla una vez, y de nuevo solo si cambian los datos.
+
+        Args:
+            table_name (str): Nombre de la tabla e.g. "books"
+            n (int): Tamaño de la muestra
+            seed (int): Semilla de la muestra
+            stratify_by (Optional[str]): Columna categórica para estratificar e.g. "genre"
+            strata (Optional[List[Any]]): Valores de los estratos. Por defecto los más frecuentes según `get_column_stats`
+            allocation (str): "equal" (mismo número por estrato) o "proportional" (según su frecuencia).
+                              Las filas que falten en un estrato pequeño se toman de los demás; si aun así
+                              la muestra queda incompleta se informa de los estratos agotados
+        Returns:
+            QueryResult: Filas de la muestra
+        """
+        if not self.connection:
+            if not self.connect():
+                return QueryResult.empty()
+
+        try:
+            if not stratify_by:
+                return self._as_result(sample_uniform(self.connection, table_name, n, seed=seed))
+
+            weights = {}
+            if strata is None or allocation == "proportional":
+                column_stats = self.get_column_stats(table_name).get("columns", {}).get(stratify_by, {})
+                weights = {item["value"]: item["min_count"] for item in column_stats.get("top_values", [])}
+            if strata is not None:
+                weights = {value: weights.get(value, 1) for value in strata}
+            rows, report = sample_stratified(
+                self.connection, table_name, n, stratify_by, weights, allocation=allocation, seed=seed
+            )
+            if report["short"]:
+                short = {value: stratum for value, stratum in report["strata"].items() if stratum["exhausted"]}
+                print(f"Muestra de {table_name} incompleta: {report['returned']} de {n} filas; estratos agotados: {short}")
+            return self._as_result(rows)
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error al obtener la muestra de la tabla {table_name}: {e}")
+            return QueryResult.empty()
+
+    @staticmethod
+    def _as_result(rows: List[sqlite3.Row]) -> QueryResult:
+        return QueryResult(rows[0].keys() if rows else (), [tuple(row) for row in rows])
+
+
 # Función de conveniencia para usar directamente
 def get_db_connection() -> DatabaseConnection:
     """Retorna una instancia de DatabaseConnection"""
@@ -220,7 +699,7 @@ if __name__ == "__main__":
         ## Ejemplo de consulta
         if tables:
             books = db.execute_query("SELECT * FROM books LIMIT 3")
-            print(f"Primeros 3 libros: {[dict(book) for book in books]}")
+            print(f"Primeros 3 libros: {list(books.dicts())}")
         
         # Cerrar conexión
         db.disconnect()
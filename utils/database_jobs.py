@@ -0,0 +1,116 @@
+import contextlib
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+from utils.connection_db import DatabaseConnection
+from utils.database_registry import get_registry
+
+# Instrucciones de SQLite entre dos comprobaciones de cancelación durante una consulta
+_CANCEL_CHECK_INSTRUCTIONS = 100_000
+
+
+def database_paths(names: Iterable[str]) -> Dict[str, str]:
+    """Rutas de bases de datos del registro, para que el proceso que ejecuta un trabajo las registre igual
+
+    Args:
+        names (Iterable[str]): Nombres en el registro e.g. ["library", "orders"]
+    Returns:
+        Dict[str, str]: Ruta por nombre
+    """
+    registry = get_registry()
+    return {name: registry.get(name).path for name in names}
+
+
+@contextlib.contextmanager
+def _connection(database: str, databases: Dict[str, str], progress=None):
+    """Conexión a `database` en el proceso que ejecuta el trabajo.
+    Registra las bases de datos que el proceso aún no conoce (las que el proceso principal registró en tiempo
+    de ejecución) y, si el trabajo se puede cancelar, interrumpe la consulta en curso cuando se cancela."""
+    registry = get_registry()
+    for name, path in databases.items():
+        if name not in registry.names() or registry.get(name).path != os.path.abspath(path):
+            registry.register(name, path)
+    db = DatabaseConnection(database)
+    if not db.connect():
+        raise sqlite3.OperationalError(f"No se pudo conectar a la base de datos {database}")
+    if progress is not None:
+        # Un valor verdadero aborta la consulta con "interrupted"; el siguiente progress() lanza JobCancelled
+        db.connection.set_progress_handler(progress.cancelled, _CANCEL_CHECK_INSTRUCTIONS)
+    try:
+        yield db
+    finally:
+        if progress is not None:
+            db.connection.set_progress_handler(None, 0)
+        db.disconnect()
+
+
+# Trabajos para `main_agents.process_pool`: reciben las rutas de las bases de datos y un callable `progress`
+# (None si se ejecutan en el propio proceso)
+
+def profile_tables(database: str, databases: Dict[str, str], tables: List[str], progress=None) -> Dict[str, dict]:
+    """Perfila las columnas de varias tablas (ver `DatabaseConnection.get_column_stats`)
+
+    Args:
+        database (str): Nombre de la base de datos e.g. "library"
+        databases (Dict[str, str]): Rutas de las bases de datos que usa el trabajo (ver `database_paths`)
+        tables (List[str]): Tablas a perfilar e.g. ["books", "sales"]
+    Returns:
+        Dict[str, dict]: Perfil por tabla. Las tablas que fallan no aparecen
+    """
+    profiles = {}
+    with _connection(database, databases, progress) as db:
+        for position, table in enumerate(tables):
+            if progress:
+                progress(position, len(tables), table)
+            profile = db.get_column_stats(table)
+            if profile:
+                profiles[table] = profile
+    return profiles
+
+
+def refresh_text_index(
+    database: str, databases: Dict[str, str], tables: Optional[List[str]] = None, progress=None
+) -> Dict[str, str]:
+    """Pone al día los índices de texto completo de una base de datos (ver `DatabaseConnection.refresh_text_index`)
+
+    Args:
+        database (str): Nombre de la base de datos e.g. "library"
+        databases (Dict[str, str]): Rutas de las bases de datos que usa el trabajo (ver `database_paths`)
+        tables (Optional[List[str]]): Tablas a poner al día. Por defecto las que no están al día
+    Returns:
+        Dict[str, str]: Acción aplicada por tabla e.g. {"reviews": "build", "sales": "append"}
+    """
+    refreshed = {}
+    with _connection(database, databases, progress) as db:
+        names = list(db.stale_text_indexes(tables))
+        for position, table in enumerate(names):
+            if progress:
+                progress(position, len(names), table)
+            refreshed.update(db.refresh_text_index([table]))
+    return refreshed
+
+
+def run_query(
+    database: str,
+    databases: Dict[str, str],
+    query: str,
+    params: Optional[list] = None,
+    attach: Optional[List[str]] = None,
+    progress=None,
+) -> dict:
+    """Ejecuta una consulta ya revisada por `QueryGuard` y la serializa en forma compacta
+
+    Args:
+        database (str): Nombre de la base de datos principal e.g. "library"
+        databases (Dict[str, str]): Rutas de la base de datos principal y de las adjuntas (ver `database_paths`)
+        query (str): Consulta que devolvió `QueryGuard.check` (con su LIMIT si lo añadió)
+        params (Optional[list]): Parámetros de la consulta
+        attach (Optional[List[str]]): Bases de datos a adjuntar e.g. ["orders"]
+    Returns:
+        dict: {"columns": [...], "rows": [[...], ...]} (ver `QueryResult.to_dict`)
+    """
+    with _connection(database, databases, progress) as db:
+        with db.attached(attach or []):
+            result = db.execute_query(query, tuple(params) if params else None, guard=False)
+    return result.to_dict()
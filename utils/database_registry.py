@@ -0,0 +1,190 @@
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# Nombre de la base de datos que usan las herramientas si no se indica otra
+DEFAULT_DATABASE = "library"
+# Conexiones reutilizables que se conservan por base de datos
+DEFAULT_POOL_SIZE = 4
+# Variable de entorno con bases de datos adicionales, e.g. "orders=/data/orders.db;users=/data/users.db"
+DATABASES_ENV_VAR = "AGENT_DATABASES"
+
+
+class Connection(sqlite3.Connection):
+    """Conexión SQLite que admite referencias débiles, para asociarle cachés (ver `utils.change_tracker`)"""
+
+
+def _default_database_path() -> str:
+    """Ruta de la base de datos de la carpeta utils"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "library_database.db")
+
+
+@dataclass
+class DatabaseSource:
+    """Una base de datos con nombre, su pool de conexiones y su caché de catálogo"""
+
+    name: str
+    path: str
+    description: str = ""
+    pool_size: int = DEFAULT_POOL_SIZE
+    _pool: queue.LifoQueue = field(default=None, init=False, repr=False)
+    _catalog: tuple = field(default=None, init=False, repr=False)
+    _snapshot: tuple = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self.path = os.path.abspath(self.path)
+        self._pool = queue.LifoQueue(maxsize=self.pool_size)
+
+    def acquire(self) -> sqlite3.Connection:
+        """Toma una conexión del pool o abre una nueva"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            connection = sqlite3.connect(self.path, check_same_thread=False, factory=Connection)
+            connection.row_factory = sqlite3.Row
+            return connection
+
+    def release(self, connection: sqlite3.Connection) -> None:
+        """Devuelve una conexión al pool (o la cierra si el pool está lleno)"""
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+            self._pool.put_nowait(connection)
+        except (queue.Full, sqlite3.Error):
+            connection.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def catalog(self, connection: sqlite3.Connection, cache: bool = True) -> dict:
+        """Tablas, columnas y foreign keys de la base de datos, cacheadas hasta que cambie el esquema
+
+        Returns:
+            dict: e.g. {"tables": ["books"], "schemas": {"books": [(0, "book_id", "INTEGER", 0, None, 1), ...]},
+                        "foreign_keys": [{"table_name": "sales", "column_name": "book_id", ...}]}
+        """
+        # schema_version cambia con cada DDL y leerlo no requiere escanear nada
+        version = connection.execute("PRAGMA schema_version").fetchone()[0]
+        if cache and self._catalog and self._catalog[0] == version:
+            return self._catalog[1]
+
+        tables = [
+            row[0]
+            for row in connection.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+            )
+        ]
+        schemas = {}
+        foreign_keys = []
+        for table in tables:
+            schemas[table] = [tuple(row) for row in connection.execute(f'PRAGMA table_info("{table}")')]
+            for fk in connection.execute(f'PRAGMA foreign_key_list("{table}")'):
+                foreign_keys.append({
+                    "constraint_name": f"FK_{table}_{fk[3]}_{fk[2]}",
+                    "table_name": table,
+                    "column_name": fk[3],
+                    "referenced_table_name": fk[2],
+                    "referenced_column_name": fk[4],
+                })
+        catalog = {"tables": tables, "schemas": schemas, "foreign_keys": foreign_keys}
+        if cache:
+            self._catalog = (version, catalog)
+        return catalog
+
+    def schema_snapshot(self, connection: sqlite3.Connection, cache: bool = True) -> dict:
+        """SQL de cada objeto del esquema y su hash, cacheados hasta que cambie el esquema
+
+        Returns:
+            dict: e.g. {"hash": "9f2c...", "objects": {"books": "CREATE TABLE books (...)"}}
+        """
+        version = connection.execute("PRAGMA schema_version").fetchone()[0]
+        if cache and self._snapshot and self._snapshot[0] == version:
+            return self._snapshot[1]
+
+        objects = {
+            row[0]: row[1]
+            for row in connection.execute("SELECT name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' ORDER BY name")
+        }
+        digest = hashlib.sha256(repr(sorted(objects.items())).encode()).hexdigest()
+        snapshot = {"hash": digest, "objects": objects}
+        if cache:
+            self._snapshot = (version, snapshot)
+        return snapshot
+
+
+class DatabaseRegistry:
+    """Registro de bases de datos con nombre. Cada servicio probado puede tener la suya."""
+
+    def __init__(self):
+        self._sources: Dict[str, DatabaseSource] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, path: str, description: str = "", pool_size: int = DEFAULT_POOL_SIZE) -> DatabaseSource:
+        """Registra (o reemplaza) una base de datos
+
+        Args:
+            name (str): Nombre con el que la usan las herramientas e.g. "orders". También es su alias en ATTACH
+            path (str): Ruta del archivo SQLite
+            description (str): Descripción para los agentes e.g. "Base de datos del servicio de pedidos"
+            pool_size (int): Conexiones reutilizables que se conservan
+        """
+        if not name.isidentifier():
+            raise ValueError(f"Nombre de base de datos no válido: {name}")
+        source = DatabaseSource(name=name, path=path, description=description, pool_size=pool_size)
+        with self._lock:
+            previous = self._sources.get(name)
+            self._sources[name] = source
+        if previous:
+            previous.close()
+        return source
+
+    def get(self, name: Optional[str] = None) -> DatabaseSource:
+        name = name or DEFAULT_DATABASE
+        try:
+            return self._sources[name]
+        except KeyError:
+            raise ValueError(f"Base de datos desconocida: {name}. Disponibles: {', '.join(self.names())}") from None
+
+    def names(self) -> List[str]:
+        return list(self._sources)
+
+    def describe(self) -> List[dict]:
+        return [
+            {"name": source.name, "path": source.path, "description": source.description}
+            for source in self._sources.values()
+        ]
+
+    def load_from_env(self, variable: str = DATABASES_ENV_VAR) -> None:
+        """Registra las bases de datos declaradas como "nombre=ruta;nombre=ruta" en una variable de entorno"""
+        for entry in os.environ.get(variable, "").split(";"):
+            if "=" in entry:
+                name, path = entry.split("=", 1)
+                self.register(name.strip(), path.strip())
+
+    def close(self) -> None:
+        for source in self._sources.values():
+            source.close()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> DatabaseRegistry:
+    """Registro compartido por todo el proceso, con la base de datos de ejemplo y las de AGENT_DATABASES"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DatabaseRegistry()
+            _registry.register(DEFAULT_DATABASE, _default_database_path(), "Base de datos de ejemplo de la biblioteca")
+            _registry.load_from_env()
+        return _registry
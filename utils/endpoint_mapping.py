@@ -0,0 +1,349 @@
+import difflib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Tablas sugeridas por endpoint
+DEFAULT_MAX_TABLES = 3
+# Similitud mínima entre dos tokens para considerarlos equivalentes
+DEFAULT_MIN_SIMILARITY = 0.8
+# Fracción de la puntuación que recibe una tabla relacionada por foreign key
+FK_PROPAGATION = 0.5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS endpoint_mappings (
+    database TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    tables TEXT NOT NULL,
+    columns TEXT NOT NULL,
+    score REAL,
+    confirmed INTEGER NOT NULL DEFAULT 0,
+    schema_hash TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (database, endpoint)
+);
+"""
+
+# Segmentos de ruta que no aportan nada sobre la tabla
+_STOP_SEGMENTS = {"api", "rest", "v1", "v2", "v3", "v4", "public", "internal", "admin", "by", "id"}
+_PARAMETER = re.compile(r"^(\{[^}]*\}|:\w+|<[^>]*>|\d+|[0-9a-f]{8}-[0-9a-f-]{27,}|[0-9a-f]{24,})$", re.IGNORECASE)
+# Nombres habituales en APIs para entidades que suelen guardarse con otro nombre
+_SYNONYMS = {
+    "customer": "user", "client": "user", "member": "user", "account": "user",
+    "order": "sale", "purchase": "sale",
+}
+# Sustantivos en singular que terminan en "s" (status, address, analysis) y los que no cambian en plural
+_SINGULAR_ENDINGS = ("ss", "us", "is")
+_INVARIANT = {"news", "series", "species"}
+_WORD = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def _default_mappings_path() -> str:
+    """Ruta del índice de mapeos en la carpeta utils"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "endpoint_mappings.db")
+
+
+def singular(word: str) -> str:
+    """Singular aproximado de un sustantivo en inglés, e.g. "categories" -> "category", "sales" -> "sale",
+    "statuses" -> "status" y "status" -> "status" """
+    if word in _INVARIANT:
+        return word
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("ses", "xes", "ches", "shes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(_SINGULAR_ENDINGS):
+        return word[:-1]
+    return word
+
+
+def tokens(name: str) -> List[str]:
+    """Palabras en singular de un identificador, e.g. "salesDetails" o "sales_details" -> ["sale", "detail"]"""
+    return [singular(word.lower()) for word in _WORD.findall(name)]
+
+
+def normalize_endpoint(endpoint: str) -> str:
+    """Patrón del endpoint sin host, query ni valores, e.g.
+    "https://api.example.com/api/customer/42?x=1" -> "/api/customer/{}" """
+    path = re.sub(r"^[a-z]+://[^/]+", "", endpoint.strip(), flags=re.IGNORECASE).split("?")[0].split("#")[0]
+    segments = [
+        "{}" if _PARAMETER.match(segment) else segment.lower()
+        for segment in path.split("/")
+        if segment
+    ]
+    return "/" + "/".join(segments)
+
+
+def endpoint_tokens(endpoint: str) -> List[str]:
+    """Palabras significativas de la ruta, e.g. "/api/v1/sales/{}/details" -> ["sale", "detail"]"""
+    words = []
+    for segment in normalize_endpoint(endpoint).split("/"):
+        if segment and segment != "{}" and segment not in _STOP_SEGMENTS:
+            words += tokens(segment)
+    return words
+
+
+def _path_score(path_words: List[str], table_words: List[str], min_similarity: float) -> float:
+    """Coincidencia entre la ruta y el nombre de una tabla, en ambos sentidos y con sinónimos"""
+    if not path_words:
+        return 0.0
+    score = _name_score(path_words, table_words, min_similarity)
+    # Tablas compuestas, e.g. "/sales/{}/details" -> sales_details
+    score = max(score, _name_score(table_words, path_words, min_similarity) * 0.8)
+    synonyms = [_SYNONYMS.get(word, word) for word in path_words]
+    if synonyms != path_words:
+        score = max(score, _name_score(synonyms, table_words, min_similarity) * 0.8)
+    return score
+
+
+def _similarity(left: str, right: str) -> float:
+    if left == right:
+        return 1.0
+    return difflib.SequenceMatcher(None, left, right).ratio()
+
+
+def _name_score(words: List[str], name_words: List[str], min_similarity: float) -> float:
+    """Fracción de las palabras de un nombre que aparecen (o casi) entre `words`"""
+    if not words or not name_words:
+        return 0.0
+    total = 0.0
+    for name_word in name_words:
+        best = max(_similarity(word, name_word) for word in words)
+        total += best if best >= min_similarity else 0.0
+    return total / len(name_words)
+
+
+def score_tables(
+    catalog: dict,
+    endpoint: str,
+    fields: Optional[List[str]] = None,
+    max_tables: int = DEFAULT_MAX_TABLES,
+    min_similarity: float = DEFAULT_MIN_SIMILARITY,
+) -> dict:
+    """Puntúa las tablas del catálogo contra la ruta del endpoint y los campos de su body
+
+    La ruta aporta la coincidencia de sus segmentos con el nombre de cada tabla; los campos, la
+    fracción que coincide con columnas de la tabla. Después cada tabla cede parte de su puntuación
+    a las tablas con las que se relaciona por foreign key.
+
+    Args:
+        catalog (dict): Catálogo de `DatabaseConnection.get_catalog()`
+        endpoint (str): Ruta o URL del endpoint e.g. "/api/customer/{id}"
+        fields (Optional[List[str]]): Campos del body o de la respuesta e.g. ["email", "bookId"]
+        max_tables (int): Número máximo de tablas sugeridas
+        min_similarity (float): Similitud mínima entre palabras
+    Returns:
+        dict: e.g. {"tables": [{"table": "users", "score": 1.6}], "columns": {"email": "users.email"}, "score": 1.6}
+    """
+    path_words = endpoint_tokens(endpoint)
+    fields = fields or []
+    field_words = {field: tokens(field) for field in fields}
+
+    scores = {}
+    columns = {}
+    for table, schema in catalog.get("schemas", {}).items():
+        table_words = tokens(table)
+        score = _path_score(path_words, table_words, min_similarity)
+        matched = 0
+        for field, words in field_words.items():
+            best_column, best = None, 0.0
+            for column in schema:
+                column_words = tokens(column[1])
+                similarity = min(
+                    _name_score(words, column_words, min_similarity),
+                    _name_score(column_words, words, min_similarity),
+                )
+                if similarity > best:
+                    best_column, best = column[1], similarity
+            if best_column and best >= 0.75:
+                matched += best
+                previous = columns.get(field)
+                if previous is None or best > previous[1]:
+                    columns[field] = (f"{table}.{best_column}", best, table)
+        if fields:
+            score += matched / len(fields)
+        scores[table] = score
+
+    # Propagación por foreign keys: un endpoint de "sales" también usa "users" y "books"
+    propagated = dict(scores)
+    for fk in catalog.get("foreign_keys", []):
+        source, target = fk["table_name"], fk["referenced_table_name"]
+        if source in scores and target in scores:
+            propagated[target] = max(propagated[target], scores[source] * FK_PROPAGATION)
+            propagated[source] = max(propagated[source], scores[target] * FK_PROPAGATION)
+
+    ranked = sorted(
+        ({"table": table, "score": round(score, 4)} for table, score in propagated.items() if score > 0),
+        key=lambda item: item["score"],
+        reverse=True,
+    )[:max_tables]
+    chosen = {item["table"] for item in ranked}
+    return {
+        "tables": ranked,
+        "columns": {field: column for field, (column, _, table) in columns.items() if table in chosen},
+        "score": ranked[0]["score"] if ranked else 0.0,
+    }
+
+
+class EndpointMappingIndex:
+    """Índice persistente de qué tablas (y columnas) respaldan cada endpoint.
+
+    Los mapeos se guardan en SQLite y se mantienen en un diccionario en memoria, así que una
+    búsqueda repetida cuesta microsegundos y no necesita pasar por el LLM. Los mapeos sugeridos
+    se recalculan si cambia el esquema; los confirmados por una sesión se conservan.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or _default_mappings_path()
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(_SCHEMA)
+        self._cache: Dict[tuple, dict] = {}
+        for row in self.connection.execute("SELECT * FROM endpoint_mappings"):
+            self._cache[(row["database"], row["endpoint"])] = self._from_row(row)
+
+    @staticmethod
+    def _from_row(row) -> dict:
+        return {
+            "endpoint": row["endpoint"],
+            "tables": json.loads(row["tables"]),
+            "columns": json.loads(row["columns"]),
+            "score": row["score"],
+            "confirmed": bool(row["confirmed"]),
+            "schema_hash": row["schema_hash"],
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+
+    def lookup(self, endpoint: str, database: str, schema_hash: Optional[str] = None) -> Optional[dict]:
+        """Mapeo guardado de un endpoint, o None si no hay ninguno vigente
+
+        Args:
+            endpoint (str): Ruta o URL del endpoint
+            database (str): Nombre de la base de datos
+            schema_hash (Optional[str]): Hash del esquema actual; descarta sugerencias de un esquema anterior
+        """
+        mapping = self._cache.get((database, normalize_endpoint(endpoint)))
+        if mapping is None:
+            return None
+        if not mapping["confirmed"] and schema_hash and mapping["schema_hash"] != schema_hash:
+            return None
+        return mapping
+
+    def _save(self, database: str, mapping: dict) -> dict:
+        with self._lock:
+            self.connection.execute(
+                """INSERT OR REPLACE INTO endpoint_mappings
+                   (database, endpoint, tables, columns, score, confirmed, schema_hash, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (
+                    database,
+                    mapping["endpoint"],
+                    json.dumps(mapping["tables"]),
+                    json.dumps(mapping["columns"]),
+                    mapping["score"],
+                    int(mapping["confirmed"]),
+                    mapping["schema_hash"],
+                    time.time(),
+                ),
+            )
+            self._cache[(database, mapping["endpoint"])] = mapping
+        return mapping
+
+    def map(
+        self,
+        endpoint: str,
+        database: str,
+        catalog: Callable[[], dict],
+        fields: Optional[List[str]] = None,
+        schema_hash: Optional[str] = None,
+    ) -> dict:
+        """Retorna el mapeo guardado del endpoint o calcula y guarda uno sugerido
+
+        Args:
+            endpoint (str): Ruta o URL del endpoint e.g. "/api/customer/{id}"
+            database (str): Nombre de la base de datos
+            catalog (Callable[[], dict]): Retorna el catálogo, e.g. `DatabaseConnection.get_catalog`.
+                                          Solo se llama si no hay un mapeo guardado que sirva
+            fields (Optional[List[str]]): Campos del body o de la respuesta
+            schema_hash (Optional[str]): Hash del esquema actual
+        Returns:
+            dict: e.g. {"endpoint": "/api/customer/{}", "tables": [...], "columns": {...}, "confirmed": False, ...}
+        """
+        cached = self.lookup(endpoint, database, schema_hash)
+        # Un mapeo sugerido se recalcula si llegan campos que no cubría
+        if cached and (cached["confirmed"] or not set(fields or []) - set(cached["columns"])):
+            return cached
+        suggestion = score_tables(catalog(), endpoint, fields)
+        return self._save(database, {
+            "endpoint": normalize_endpoint(endpoint),
+            "tables": suggestion["tables"],
+            "columns": suggestion["columns"],
+            "score": suggestion["score"],
+            "confirmed": False,
+            "schema_hash": schema_hash,
+        })
+
+    def confirm(
+        self,
+        endpoint: str,
+        database: str,
+        tables: List[str],
+        columns: Optional[Dict[str, str]] = None,
+        schema_hash: Optional[str] = None,
+    ) -> dict:
+        """Guarda un mapeo confirmado por una sesión; tiene prioridad sobre las sugerencias
+
+        Args:
+            endpoint (str): Ruta o URL del endpoint
+            database (str): Nombre de la base de datos
+            tables (List[str]): Tablas que respaldan el endpoint e.g. ["users"]
+            columns (Optional[Dict[str, str]]): Campo -> "tabla.columna" e.g. {"email": "users.email"}
+            schema_hash (Optional[str]): Hash del esquema actual
+        """
+        return self._save(database, {
+            "endpoint": normalize_endpoint(endpoint),
+            "tables": [{"table": table, "score": None} for table in tables],
+            "columns": columns or {},
+            "score": None,
+            "confirmed": True,
+            "schema_hash": schema_hash,
+        })
+
+    def endpoints_for_tables(self, database: str, tables: List[str]) -> List[str]:
+        """Endpoints cuyo mapeo usa alguna de las tablas, e.g. para regenerar solo sus pruebas"""
+        tables = set(tables)
+        return [
+            endpoint
+            for (mapped_database, endpoint), mapping in self._cache.items()
+            if mapped_database == database and tables & {item["table"] for item in mapping["tables"]}
+        ]
+
+    def mappings(self, database: Optional[str] = None) -> List[dict]:
+        return [
+            {"database": key[0], **mapping}
+            for key, mapping in self._cache.items()
+            if database is None or key[0] == database
+        ]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_mapping_index() -> EndpointMappingIndex:
+    """Retorna el índice de mapeos compartido por el proceso"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = EndpointMappingIndex()
+        return _index
@@ -0,0 +1,335 @@
+import itertools
+import random
+from collections import deque
+from typing import Iterator, List, Optional
+
+from utils.connection_db import DatabaseConnection
+from utils.sampling import sample_rowids
+
+# Cobertura soportada por PayloadGenerator.generate
+COVERAGE_MODES = ("pairwise", "full")
+# Filas de la tabla raíz que se muestrean por cada fila de valores pedida (algunas tienen nulos o se repiten)
+_SAMPLE_OVERDRAW = 4
+
+
+def _column_kind(declared_type: str) -> str:
+    """Clasifica el tipo declarado de SQLite en integer, number o string"""
+    declared_type = (declared_type or "").upper()
+    if "INT" in declared_type:
+        return "integer"
+    if any(token in declared_type for token in ("REAL", "FLOA", "DOUB", "DEC", "NUM")):
+        return "number"
+    return "string"
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _set_path(payload: dict, name: str, value) -> None:
+    """Asigna un campo con notación de puntos, e.g. "address.city" crea el objeto anidado"""
+    *parents, leaf = name.split(".")
+    for parent in parents:
+        payload = payload.setdefault(parent, {})
+    payload[leaf] = value
+
+
+def _remove_path(payload: dict, name: str) -> None:
+    *parents, leaf = name.split(".")
+    for parent in parents:
+        payload = payload.get(parent, {})
+    payload.pop(leaf, None)
+
+
+def _pair(i: int, a: int, j: int, b: int) -> tuple:
+    """Clave canónica del par (factor i = a, factor j = b)"""
+    return (i, a, j, b) if i < j else (j, b, i, a)
+
+
+def pairwise(levels: List[int], seed: int = 0) -> Iterator[tuple]:
+    """Genera combinaciones que cubren todos los pares de valores entre factores (greedy tipo AETG)
+
+    Args:
+        levels (List[int]): Número de valores de cada factor. e.g. [3, 2, 4]
+        seed (int): Semilla para el orden de asignación, las filas son reproducibles
+    Returns:
+        Iterator[tuple]: Tuplas de índices, una por combinación
+    """
+    if not levels or any(count == 0 for count in levels):
+        return
+    if len(levels) == 1:
+        for value in range(levels[0]):
+            yield (value,)
+        return
+
+    rng = random.Random(seed)
+    factors = range(len(levels))
+    uncovered = {
+        (i, a, j, b)
+        for i, j in itertools.combinations(factors, 2)
+        for a in range(levels[i])
+        for b in range(levels[j])
+    }
+    while uncovered:
+        i, a, j, b = min(uncovered)
+        row = [None] * len(levels)
+        row[i], row[j] = a, b
+        pending = [k for k in factors if row[k] is None]
+        rng.shuffle(pending)
+        for k in pending:
+            assigned = [other for other in factors if row[other] is not None]
+
+            def gain(value):
+                return sum(1 for other in assigned if _pair(k, value, other, row[other]) in uncovered)
+
+            row[k] = max(range(levels[k]), key=gain)
+        for x, y in itertools.combinations(factors, 2):
+            uncovered.discard((x, row[x], y, row[y]))
+        yield tuple(row)
+
+
+class PayloadGenerator:
+    """Genera payloads de prueba a partir de valores reales de la base de datos.
+
+    El LLM solo aporta el mapeo campo -> columna (e.g. {"name": "email", "source": "users.email"}).
+    Los valores se obtienen con consultas por conjuntos: una consulta DISTINCT por grupo de tablas
+    relacionadas por foreign keys (para que los valores de un mismo payload sean coherentes) y un
+    único escaneo agregado por tabla para los valores límite.
+    """
+
+    def __init__(self, db: DatabaseConnection, values_per_field: int = 10, seed: int = 0):
+        """
+        Args:
+            db (DatabaseConnection): Conexión a la base de datos de origen
+            values_per_field (int): Filas reales distintas que se toman por grupo de campos
+            seed (int): Semilla para que la salida sea reproducible
+        """
+        self.db = db
+        self.values_per_field = values_per_field
+        self.seed = seed
+        self._schemas = {}
+
+    def _columns(self, table: str) -> dict:
+        if table not in self._schemas:
+            self._schemas[table] = {col[1]: col[2] for col in self.db.get_table_schema(table)}
+        return self._schemas[table]
+
+    def _resolve_fields(self, fields: List[dict]) -> List[dict]:
+        """Valida el mapeo contra el esquema real y completa el tipo de cada campo"""
+        resolved = []
+        for field in fields:
+            field = dict(field)
+            source = field.get("source")
+            if source:
+                table, _, column = source.partition(".")
+                columns = self._columns(table)
+                if column not in columns:
+                    raise ValueError(f"La columna '{source}' no existe en la base de datos")
+                field["table"], field["column"] = table, column
+                field.setdefault("type", _column_kind(columns[column]))
+            else:
+                field.setdefault("type", "string")
+            field.setdefault("required", True)
+            resolved.append(field)
+        return resolved
+
+    def _join_groups(self, tables: List[str], related_tables: List[str]) -> List[List[tuple]]:
+        """Agrupa las tablas en componentes unidos por foreign keys
+
+        Returns:
+            List[List[tuple]]: Por componente, lista de (tabla, condición JOIN o None para la raíz)
+        """
+        allowed = set(tables) | set(related_tables or [])
+        edges = {}
+        for fk in self.db.get_foreign_keys():
+            source, target = fk["table_name"], fk["referenced_table_name"]
+            if source in allowed and target in allowed:
+                condition = (
+                    f"{_quote(source)}.{_quote(fk['column_name'])} = "
+                    f"{_quote(target)}.{_quote(fk['referenced_column_name'])}"
+                )
+                edges.setdefault(source, []).append((target, condition))
+                edges.setdefault(target, []).append((source, condition))
+
+        groups = []
+        placed = set()
+        for root in tables:
+            if root in placed:
+                continue
+            parents = {root: None}
+            queue = deque([root])
+            while queue:
+                current = queue.popleft()
+                for neighbour, condition in edges.get(current, []):
+                    if neighbour not in parents:
+                        parents[neighbour] = (current, condition)
+                        queue.append(neighbour)
+
+            # Solo se unen las tablas necesarias para conectar las tablas pedidas
+            needed = {}
+            for table in tables:
+                if table in parents and table not in placed:
+                    node = table
+                    while node is not None and node not in needed:
+                        needed[node] = parents[node]
+                        node = parents[node][0] if parents[node] else None
+            order = [root] + [t for t in parents if t in needed and t != root]
+            groups.append([(table, needed[table][1] if needed[table] else None) for table in order])
+            placed.update(t for t in tables if t in parents)
+        return groups
+
+    def _group_rows(self, group: List[tuple], group_fields: List[dict]) -> List[tuple]:
+        """Filas reales distintas para los campos de un grupo, en una sola consulta. Las filas de la
+        tabla raíz se eligen con el muestreo uniforme de `utils.sampling`, con la semilla del generador,
+        así los valores salen de toda la tabla y no solo de sus primeras filas"""
+        root = group[0][0]
+        joins = [_quote(root)] + [f"JOIN {_quote(table)} ON {condition}" for table, condition in group[1:]]
+        columns = [f"{_quote(f['table'])}.{_quote(f['column'])}" for f in group_fields]
+        conditions = [f"{column} IS NOT NULL" for column in columns]
+        rowids = sample_rowids(self.db.connection, root, _SAMPLE_OVERDRAW * int(self.values_per_field), seed=self.seed)
+        if rowids is not None:
+            conditions.append(f"{_quote(root)}.rowid IN ({', '.join('?' for _ in rowids)})")
+        query = (
+            f"SELECT DISTINCT {', '.join(columns)} FROM {' '.join(joins)} "
+            f"WHERE {' AND '.join(conditions)} LIMIT {int(self.values_per_field)}"
+        )
+        # Acotada por LIMIT y por la muestra: el DISTINCT termina en cuanto reúne suficientes valores
+        return self.db.execute_query(query, tuple(rowids or ()), guard=False).rows()
+
+    def _column_bounds(self, fields: List[dict]) -> dict:
+        """Mínimo, máximo y longitud máxima de cada columna, un escaneo agregado por tabla"""
+        bounds = {}
+        by_table = {}
+        for field in fields:
+            if field.get("table"):
+                by_table.setdefault(field["table"], []).append(field)
+        for table, table_fields in by_table.items():
+            aggregates = []
+            for field in table_fields:
+                column = _quote(field["column"])
+                aggregates += [f"MIN({column})", f"MAX({column})", f"MAX(LENGTH({column}))"]
+            # Un único escaneo agregado intencionado: no pasa por el guardián de consultas
+            rows = self.db.execute_query(f"SELECT {', '.join(aggregates)} FROM {_quote(table)}", guard=False)
+            if not rows:
+                continue
+            row = rows[0]
+            for index, field in enumerate(table_fields):
+                bounds[field["name"]] = row[index * 3:index * 3 + 3]
+        return bounds
+
+    def _boundary_values(self, field: dict, bounds: Optional[tuple]) -> List[tuple]:
+        """Valores límite de un campo como (valor, descripción)"""
+        minimum, maximum, max_length = bounds or (None, None, None)
+        if field["type"] == "integer":
+            values = [(minimum, "minimum"), (maximum, "maximum")]
+            # Una columna INTEGER de SQLite puede guardar texto: solo se desplazan los límites numéricos
+            if isinstance(minimum, (int, float)):
+                values.append((minimum - 1, "below minimum"))
+            if isinstance(maximum, (int, float)):
+                values.append((maximum + 1, "above maximum"))
+            values += [(0, "zero"), (-1, "negative")]
+        elif field["type"] == "number":
+            values = [(minimum, "minimum"), (maximum, "maximum"), (0, "zero"), (-0.01, "negative")]
+        else:
+            length = int(field.get("max_length") or max_length or 0)
+            values = [("", "empty string"), (" ", "whitespace"), ("ñandú ✓", "unicode")]
+            if length:
+                values += [("x" * length, "max length"), ("x" * (length + 1), "over max length")]
+        seen = set()
+        unique = []
+        for value, description in values:
+            if value is not None and (type(value), value) not in seen:
+                seen.add((type(value), value))
+                unique.append((value, description))
+        return unique
+
+    def _invalid_values(self, field: dict) -> List[tuple]:
+        values = [(None, "null")]
+        if field["type"] in ("integer", "number"):
+            values.append(("not-a-number", "wrong type"))
+        else:
+            values.append((12345, "wrong type"))
+        return values
+
+    def generate(
+        self,
+        fields: List[dict],
+        related_tables: Optional[List[str]] = None,
+        coverage: str = "pairwise",
+        include_boundaries: bool = True,
+        limit: Optional[int] = None,
+    ) -> Iterator[dict]:
+        """Genera los payloads de forma incremental
+
+        Args:
+            fields (List[dict]): Campos del endpoint. e.g. [{"name": "email", "source": "users.email"},
+                                 {"name": "book_id", "source": "books.book_id", "required": False},
+                                 {"name": "channel", "values": ["web", "store"]}]
+            related_tables (List[str]): Tablas intermedias que se pueden usar para unir las tablas de los campos
+            coverage (str): "pairwise" cubre todos los pares de valores, "full" el producto cartesiano
+            include_boundaries (bool): Añade casos límite e inválidos tras los casos válidos
+            limit (int): Número máximo de payloads a generar
+        Returns:
+            Iterator[dict]: e.g. {"kind": "valid", "field": None, "description": "...", "payload": {...}}
+        """
+        if coverage not in COVERAGE_MODES:
+            raise ValueError(f"Cobertura no soportada: {coverage}. Usa una de {COVERAGE_MODES}")
+        fields = self._resolve_fields(fields)
+        cases = self._iter_cases(fields, related_tables or [], coverage, include_boundaries)
+        return itertools.islice(cases, limit) if limit is not None else cases
+
+    def _iter_cases(self, fields, related_tables, coverage, include_boundaries) -> Iterator[dict]:
+        mapped = [f for f in fields if f.get("table")]
+        tables = list(dict.fromkeys(f["table"] for f in mapped))
+
+        # Cada factor es una lista de filas: un grupo de tablas unidas o un campo con valores fijos
+        factors = []
+        for group in self._join_groups(tables, related_tables):
+            group_tables = {table for table, _ in group}
+            group_fields = [f for f in mapped if f["table"] in group_tables]
+            factors.append((group_fields, self._group_rows(group, group_fields)))
+        for field in fields:
+            if not field.get("table"):
+                values = field.get("values") or [field.get("example", "")]
+                factors.append(([field], [(value,) for value in values]))
+
+        if any(not rows for _, rows in factors):
+            empty = [f["name"] for group_fields, rows in factors if not rows for f in group_fields]
+            raise ValueError(f"No hay valores reales para los campos: {empty}")
+
+        def build(choice):
+            payload = {}
+            for (group_fields, rows), index in zip(factors, choice):
+                for field, value in zip(group_fields, rows[index]):
+                    _set_path(payload, field["name"], value)
+            return payload
+
+        levels = [len(rows) for _, rows in factors]
+        if coverage == "full":
+            combinations = itertools.product(*(range(count) for count in levels))
+        else:
+            combinations = pairwise(levels, seed=self.seed)
+
+        for choice in combinations:
+            yield {"kind": "valid", "field": None, "description": "real values", "payload": build(choice)}
+
+        if not include_boundaries:
+            return
+
+        bounds = self._column_bounds(fields)
+        for field in fields:
+            for value, description in self._boundary_values(field, bounds.get(field["name"])):
+                payload = build([0] * len(factors))
+                _set_path(payload, field["name"], value)
+                yield {"kind": "boundary", "field": field["name"], "description": description, "payload": payload}
+
+        for field in fields:
+            if field["required"]:
+                payload = build([0] * len(factors))
+                _remove_path(payload, field["name"])
+                yield {"kind": "invalid", "field": field["name"], "description": "missing required field", "payload": payload}
+            for value, description in self._invalid_values(field):
+                payload = build([0] * len(factors))
+                _set_path(payload, field["name"], value)
+                kind = "boundary" if value is None and not field["required"] else "invalid"
+                yield {"kind": kind, "field": field["name"], "description": description, "payload": payload}
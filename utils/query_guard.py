@@ -0,0 +1,255 @@
+import logging
+import math
+import re
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Filas visitadas (estimadas) a partir de las que una consulta se limita o se rechaza
+DEFAULT_MAX_SCAN_ROWS = 1_000_000
+# LIMIT que se añade a las consultas costosas que se pueden acotar
+DEFAULT_ROW_LIMIT = 1000
+
+# Acciones permitidas a las consultas de las herramientas (solo lectura)
+_READ_ONLY_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+
+_SQL_KEYWORDS = {
+    "where", "join", "inner", "left", "right", "full", "cross", "natural", "on", "using",
+    "group", "order", "limit", "having", "union", "except", "intersect", "window", "as",
+}
+_PLAN_LOOP = re.compile(r"^(SCAN|SEARCH) (\S+)")
+_PREDICATE = re.compile(
+    r'(?:"?(\w+)"?\.)?"?(\w+)"?\s*(?:=|==|<>|!=|<=|>=|<|>|\bIN\b|\bBETWEEN\b|\bIS\b)',
+    re.IGNORECASE,
+)
+# Lado derecho de una igualdad entre columnas, e.g. "ON c.customer_id = o.customer_id"
+_JOIN_OPERAND = re.compile(r'(?:=|==)\s*"?(\w+)"?\."?(\w+)"?')
+_AGGREGATE = re.compile(
+    r"\bGROUP\s+BY\b|\bDISTINCT\b|\b(COUNT|SUM|AVG|MIN|MAX|TOTAL|GROUP_CONCAT)\s*\(",
+    re.IGNORECASE,
+)
+_TRAILING_LIMIT = re.compile(r"\bLIMIT\s+(\d+|\?)(?:\s+OFFSET\s+(\d+|\?))?\s*;?\s*$", re.IGNORECASE)
+
+# Índices recomendados por (ruta de la base de datos, patrón de consulta), compartidos por todas
+# las conexiones para que cada patrón se registre una sola vez por base de datos
+_recommendations = {}
+
+
+def read_only_authorizer(action, arg1, arg2, db_name, trigger):
+    """Autorizador de SQLite que solo permite lecturas"""
+    return sqlite3.SQLITE_OK if action in _READ_ONLY_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def query_pattern(query: str) -> str:
+    """Normaliza una consulta quitando literales, para agrupar consultas de la misma forma"""
+    pattern = re.sub(r"'(?:[^']|'')*'", "?", query)
+    pattern = re.sub(r"\b\d+(\.\d+)?\b", "?", pattern)
+    return re.sub(r"\s+", " ", pattern).strip().lower()
+
+
+@dataclass
+class GuardDecision:
+    """Resultado de revisar una consulta antes de ejecutarla"""
+
+    allowed: bool
+    query: str
+    reason: str = ""
+    estimated_rows: float = 0
+    plan: List[str] = field(default_factory=list)
+    rewritten: bool = False
+    recommendations: List[str] = field(default_factory=list)
+
+
+class QueryGuard:
+    """Revisa las consultas con EXPLAIN QUERY PLAN antes de ejecutarlas.
+
+    Estima las filas visitadas a partir del plan y del tamaño de las tablas. Las consultas por
+    encima del umbral se acotan con un LIMIT si pueden leerse en streaming, o se rechazan si
+    necesitan materializar todo el resultado (agregados, GROUP BY, ORDER BY sin índice).
+    Por cada patrón de consulta rechazado se registra una recomendación de CREATE INDEX.
+    """
+
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        row_estimator: Callable[[str], int],
+        max_scan_rows: int = DEFAULT_MAX_SCAN_ROWS,
+        row_limit: int = DEFAULT_ROW_LIMIT,
+        db_path: str = "",
+    ):
+        """
+        Args:
+            connection (sqlite3.Connection): Conexión sobre la que se ejecutarán las consultas
+            row_estimator (Callable[[str], int]): Estima las filas de una tabla sin escanearla
+            max_scan_rows (int): Filas visitadas estimadas a partir de las que se actúa
+            row_limit (int): LIMIT que se añade al reescribir una consulta
+            db_path (str): Ruta de la base de datos, clave de la caché de recomendaciones
+        """
+        self.connection = connection
+        self.row_estimator = row_estimator
+        self.max_scan_rows = max_scan_rows
+        self.row_limit = row_limit
+        self.db_path = db_path
+
+    def _bounded(self, query: str) -> bool:
+        """True si la consulta termina en un LIMIT literal que no supera el de la guarda.
+        Un LIMIT u OFFSET con parámetro (?) puede valer cualquier cosa: se trata como sin límite"""
+        match = _TRAILING_LIMIT.search(query.strip())
+        if not match or match.group(1) == "?" or match.group(2) == "?":
+            return False
+        limit, offset = int(match.group(1)), int(match.group(2) or 0)
+        return limit <= self.row_limit and limit + offset <= self.max_scan_rows
+
+    def _tables(self) -> List[str]:
+        """Tablas de la base de datos principal y, como "esquema.tabla", de las adjuntas con ATTACH"""
+        tables = []
+        for _, schema, _ in self.connection.execute("PRAGMA database_list").fetchall():
+            if schema == "temp":
+                continue
+            prefix = "" if schema == "main" else f"{schema}."
+            tables += [
+                prefix + row[0]
+                for row in self.connection.execute(
+                    f'SELECT name FROM "{schema}".sqlite_master '
+                    "WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'"
+                )
+            ]
+        return tables
+
+    @staticmethod
+    def _split(table: str) -> Tuple[str, str]:
+        """("esquema", "tabla") de un nombre posiblemente cualificado"""
+        schema, _, name = table.rpartition(".")
+        return schema or "main", name
+
+    def _aliases(self, query: str, tables: List[str]) -> dict:
+        """Relaciona alias y nombres usados en FROM/JOIN con su tabla"""
+        known = {table.lower(): table for table in tables}
+        tokens = re.findall(r'(?:"[^"]+"|\w+)(?:\.(?:"[^"]+"|\w+))?|,', query)
+        aliases = {}
+        for index, token in enumerate(tokens):
+            name = token.replace('"', "").lower()
+            previous = tokens[index - 1].lower() if index else ""
+            if name not in known or previous not in ("from", "join", ","):
+                continue
+            table = known[name]
+            aliases[name] = table
+            aliases[name.rpartition(".")[2]] = table  # el plan muestra la tabla sin esquema
+            following = tokens[index + 1:index + 3]
+            if following and following[0].lower() == "as":
+                following = following[1:]
+            if following and following[0] != "," and following[0].lower() not in _SQL_KEYWORDS:
+                aliases[following[0].strip('"').lower()] = table
+        return aliases
+
+    def _estimate(self, plan: List[tuple], aliases: dict) -> Tuple[float, List[str]]:
+        """Filas visitadas estimadas: producto de los bucles anidados de cada nivel del plan
+
+        Returns:
+            Tuple[float, List[str]]: (estimación, tablas recorridas con SCAN)
+        """
+        levels = {}
+        scanned = []
+        for _, parent, _, detail in plan:
+            match = _PLAN_LOOP.match(detail)
+            if not match:
+                continue
+            table = aliases.get(match.group(2).strip('"').lower())
+            rows = max(1, self.row_estimator(table)) if table else 1
+            if match.group(1) == "SCAN":
+                cost = rows
+                if table:
+                    scanned.append(table)
+            elif "AUTOMATIC" in detail:
+                # SQLite construye un índice temporal: una pasada completa más búsquedas
+                cost = math.log2(rows) + 1
+                levels.setdefault(("build", parent), []).append(rows)
+            else:
+                cost = math.log2(rows) + 1
+            levels.setdefault(parent, []).append(cost)
+        total = sum(math.prod(costs) for costs in levels.values())
+        return total, scanned
+
+    def _recommend(self, query: str, tables: List[str], aliases: dict) -> List[str]:
+        """Propone un índice por cada tabla recorrida con las columnas de sus predicados"""
+        recommendations = []
+        for table in dict.fromkeys(tables):
+            schema, name = self._split(table)
+            columns = {
+                row[1].lower(): row[1]
+                for row in self.connection.execute(f'PRAGMA "{schema}".table_info("{name}")')
+            }
+            used = []
+            for qualifier, column in _PREDICATE.findall(query) + _JOIN_OPERAND.findall(query):
+                if column.lower() not in columns:
+                    continue
+                if qualifier and aliases.get(qualifier.lower()) != table:
+                    continue
+                if columns[column.lower()] not in used:
+                    used.append(columns[column.lower()])
+            if used:
+                index_name = f"idx_{name}_{'_'.join(used)}"
+                qualified_index = f'"{index_name}"' if schema == "main" else f'"{schema}"."{index_name}"'
+                column_list = ", ".join(f'"{column}"' for column in used)
+                recommendations.append(f'CREATE INDEX IF NOT EXISTS {qualified_index} ON "{name}" ({column_list})')
+        return recommendations
+
+    def check(self, query: str, params: Optional[Tuple] = None) -> GuardDecision:
+        """Revisa una consulta sin ejecutarla
+
+        Args:
+            query (str): Consulta SQL e.g. "SELECT * FROM books WHERE author = ?"
+            params (Optional[Tuple]): Parámetros de la consulta
+        Returns:
+            GuardDecision: Si se permite, la consulta a ejecutar (quizá reescrita) y el motivo
+        """
+        self.connection.set_authorizer(read_only_authorizer)
+        try:
+            plan = self.connection.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+        except sqlite3.DatabaseError as e:
+            reason = "solo se permiten consultas de lectura" if "not authorized" in str(e) else str(e)
+            return GuardDecision(allowed=False, query=query, reason=reason)
+        finally:
+            self.connection.set_authorizer(None)
+
+        details = [row[3] for row in plan]
+        aliases = self._aliases(query, self._tables())
+        estimated, scanned = self._estimate(plan, aliases)
+        if estimated <= self.max_scan_rows:
+            return GuardDecision(allowed=True, query=query, estimated_rows=estimated, plan=details)
+
+        materializes = any("TEMP B-TREE" in detail for detail in details) or _AGGREGATE.search(query)
+        if not materializes:
+            if self._bounded(query):
+                return GuardDecision(allowed=True, query=query, estimated_rows=estimated, plan=details)
+            rewritten = f"SELECT * FROM ({query.strip().rstrip(';')}) LIMIT {int(self.row_limit)}"
+            return GuardDecision(
+                allowed=True,
+                query=rewritten,
+                reason=f"Consulta costosa (~{estimated:,.0f} filas): se limita a {self.row_limit} filas",
+                estimated_rows=estimated,
+                plan=details,
+                rewritten=True,
+            )
+
+        recommendations = self._recommend(query, scanned, aliases)
+        key = (self.db_path, query_pattern(query))
+        if key not in _recommendations:
+            _recommendations[key] = recommendations
+            for statement in recommendations:
+                logger.warning(f"Consulta rechazada (~{estimated:,.0f} filas). Índice recomendado: {statement}")
+        return GuardDecision(
+            allowed=False,
+            query=query,
+            reason=f"Consulta rechazada: recorre ~{estimated:,.0f} filas (máximo {self.max_scan_rows:,})",
+            estimated_rows=estimated,
+            plan=details,
+            recommendations=recommendations,
+        )
@@ -0,0 +1,157 @@
+import base64
+import json
+from array import array
+from typing import Any, Iterator, List, Optional, Sequence, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él las columnas numéricas usan array
+    np = None
+
+
+def _json_default(value: Any):
+    if isinstance(value, memoryview) and value.format in ("q", "d"):
+        return value.tolist()  # vista de una columna numérica
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode("ascii")
+    if isinstance(value, array):
+        return value.tolist()
+    if np is not None and isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def _typed_column(values: Sequence) -> Union[array, list]:
+    """Columna tipada si todos los valores son enteros (array 'q') o números (array 'd'); si no, lista"""
+    if values and all(type(value) is int for value in values):
+        try:
+            return array("q", values)
+        except OverflowError:
+            return list(values)
+    if values and all(type(value) in (int, float) for value in values):
+        return array("d", values)
+    return list(values)
+
+
+class QueryResult:
+    """Resultado de una consulta con los nombres de columna guardados una sola vez.
+
+    Las filas se guardan como tuplas tal como las devuelve SQLite (sin un diccionario ni un
+    sqlite3.Row por fila). `columns_data()` las transpone a una columna por campo, con `array`
+    tipado para las columnas numéricas (o NumPy con `to_numpy`). Cortar un resultado (`result[10:20]`)
+    devuelve una vista que comparte las filas, sin copiarlas.
+
+    e.g.
+        result = db.execute_query("SELECT title, published_year FROM books")
+        result.columns          # ("title", "published_year")
+        result[0]               # ("The Great Gatsby", 1925)
+        result.column("published_year")  # array('q', [1925, 1960, ...])
+        result.to_json()        # '{"columns":["title","published_year"],"rows":[["The Great Gatsby",1925],...]}'
+    """
+
+    __slots__ = ("columns", "_rows", "_range", "_column_cache")
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        rows: List[tuple],
+        _range: Optional[range] = None,
+        _column_cache: Optional[dict] = None,
+    ):
+        self.columns = tuple(columns)
+        self._rows = rows
+        self._range = _range if _range is not None else range(len(rows))
+        # Las vistas comparten las columnas ya transpuestas con el resultado original
+        self._column_cache = _column_cache if _column_cache is not None else {}
+
+    @classmethod
+    def from_cursor(cls, cursor) -> "QueryResult":
+        """Lee todas las filas de un cursor como tuplas"""
+        columns = [description[0] for description in cursor.description or ()]
+        return cls(columns, cursor.fetchall())
+
+    @classmethod
+    def empty(cls) -> "QueryResult":
+        return cls((), [])
+
+    def _is_full(self) -> bool:
+        return self._range == range(len(self._rows))
+
+    def __len__(self) -> int:
+        return len(self._range)
+
+    def __bool__(self) -> bool:
+        return len(self._range) > 0
+
+    def __iter__(self) -> Iterator[tuple]:
+        if self._is_full():
+            return iter(self._rows)
+        return (self._rows[index] for index in self._range)
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[tuple, "QueryResult"]:
+        if isinstance(item, slice):
+            return QueryResult(self.columns, self._rows, self._range[item], self._column_cache)
+        return self._rows[self._range[item]]
+
+    def __repr__(self) -> str:
+        return f"QueryResult(columns={self.columns!r}, rows={len(self)})"
+
+    def index(self, column: str) -> int:
+        try:
+            return self.columns.index(column)
+        except ValueError:
+            raise KeyError(column) from None
+
+    def column(self, name: str) -> Union[array, list, memoryview]:
+        """Valores de una columna; las numéricas como `array` tipado. En una vista, un memoryview sin copia"""
+        if name not in self._column_cache:
+            position = self.index(name)
+            self._column_cache[name] = _typed_column([row[position] for row in self._rows])
+        values = self._column_cache[name]
+        if self._is_full():
+            return values
+        window = slice(self._range.start, self._range.stop if self._range.stop >= 0 else None, self._range.step)
+        return memoryview(values)[window] if isinstance(values, array) else values[window]
+
+    def columns_data(self) -> dict:
+        """Todas las columnas como {nombre: valores}"""
+        return {name: self.column(name) for name in self.columns}
+
+    def to_numpy(self, name: str):
+        """Columna como ndarray de NumPy; las columnas numéricas comparten memoria con el array tipado"""
+        if np is None:
+            raise ImportError("NumPy no está instalado; usa column() para obtener un array tipado")
+        values = self.column(name)
+        if isinstance(values, array):
+            return np.frombuffer(values, dtype=np.int64 if values.typecode == "q" else np.float64)
+        if isinstance(values, memoryview):
+            return np.asarray(values)
+        return np.array(values, dtype=object)
+
+    def rows(self) -> List[tuple]:
+        """Filas como tuplas (la lista original si no es una vista)"""
+        return self._rows if self._is_full() else [self._rows[index] for index in self._range]
+
+    def dicts(self) -> Iterator[dict]:
+        """Filas como diccionarios, generados bajo demanda (para código que necesita acceso por nombre)"""
+        columns = self.columns
+        return (dict(zip(columns, row)) for row in self)
+
+    def to_json(self, orient: str = "rows") -> str:
+        """JSON compacto con los nombres de columna una sola vez
+
+        Args:
+            orient (str): "rows" -> {"columns": [...], "rows": [[...], ...]}
+                          "columns" -> {"columns": [...], "data": {"col": [...], ...}}
+        """
+        if orient == "rows":
+            payload = {"columns": self.columns, "rows": self.rows()}
+        elif orient == "columns":
+            payload = {"columns": self.columns, "data": self.columns_data()}
+        else:
+            raise ValueError(f"Orientación no soportada: {orient}. Usa 'rows' o 'columns'")
+        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=_json_default)
+
+    def to_dict(self) -> dict:
+        """Forma compacta serializable, e.g. para el resultado de una herramienta"""
+        return {"columns": list(self.columns), "rows": [list(row) for row in self]}
@@ -0,0 +1,331 @@
+import atexit
+import contextlib
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Iterable, List, Optional
+from urllib.parse import urlsplit
+
+# Escrituras acumuladas antes de volcarlas en una sola transacción
+DEFAULT_BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    label TEXT,
+    started_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS test_results (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    method TEXT NOT NULL,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    status_code INTEGER,
+    latency_ms REAL,
+    errors TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_test_results_run_status ON test_results (run_id, status);
+CREATE INDEX IF NOT EXISTS idx_test_results_endpoint_time ON test_results (endpoint, method, created_at);
+CREATE INDEX IF NOT EXISTS idx_test_results_status_time ON test_results (status, created_at);
+CREATE INDEX IF NOT EXISTS idx_test_results_run_case ON test_results (run_id, endpoint, method, name);
+
+CREATE TABLE IF NOT EXISTS agent_outputs (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    session TEXT NOT NULL,
+    query TEXT,
+    author TEXT,
+    text TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_agent_outputs_run ON agent_outputs (run_id, created_at);
+
+-- Los resultados son append-only
+CREATE TRIGGER IF NOT EXISTS test_results_no_update BEFORE UPDATE ON test_results
+BEGIN SELECT RAISE(ABORT, 'test_results es append-only'); END;
+CREATE TRIGGER IF NOT EXISTS test_results_no_delete BEFORE DELETE ON test_results
+BEGIN SELECT RAISE(ABORT, 'test_results es append-only'); END;
+CREATE TRIGGER IF NOT EXISTS agent_outputs_no_update BEFORE UPDATE ON agent_outputs
+BEGIN SELECT RAISE(ABORT, 'agent_outputs es append-only'); END;
+CREATE TRIGGER IF NOT EXISTS agent_outputs_no_delete BEFORE DELETE ON agent_outputs
+BEGIN SELECT RAISE(ABORT, 'agent_outputs es append-only'); END;
+"""
+
+_current_run_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_run_id", default=None)
+
+
+def _default_results_path() -> str:
+    """Ruta del almacén de resultados en la carpeta utils"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, "results.db")
+
+
+def _endpoint(url: str) -> str:
+    """Normaliza una URL a su ruta, e.g. "https://api.example.com/api/customer?id=1" -> "/api/customer" """
+    return urlsplit(url).path or url
+
+
+def new_run_id() -> str:
+    return time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8]
+
+
+def current_run_id() -> Optional[str]:
+    """Run activo en el contexto actual (lo fija `active_run`)"""
+    return _current_run_id.get()
+
+
+@contextlib.contextmanager
+def active_run(run_id: Optional[str] = None):
+    """Fija el run al que se asocian los resultados registrados dentro de este contexto"""
+    token = _current_run_id.set(run_id or new_run_id())
+    try:
+        yield _current_run_id.get()
+    finally:
+        _current_run_id.reset(token)
+
+
+class ResultsStore:
+    """Almacén local (SQLite) de resultados de pruebas y salidas de los agentes.
+
+    Las escrituras se acumulan en memoria y se vuelcan por lotes con `executemany` en una
+    transacción; los datos nunca se modifican ni se borran. Las consultas usan los índices
+    por endpoint, run, estado y tiempo.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db_path = db_path or _default_results_path()
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending_results = []
+        self._pending_outputs = []
+        self._known_runs = set()
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self.connection.close()
+
+    def start_run(self, run_id: Optional[str] = None, label: str = "") -> str:
+        """Registra un run nuevo (o existente) y retorna su id"""
+        run_id = run_id or new_run_id()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO runs (run_id, label, started_at) VALUES (?, ?, ?)",
+                (run_id, label, time.time()),
+            )
+            self._known_runs.add(run_id)
+        return run_id
+
+    def record_test_results(self, results: Iterable, run_id: Optional[str] = None) -> None:
+        """Encola resultados de pruebas (ApiTestResult o dicts con el mismo formato)
+
+        Args:
+            results (Iterable): Resultados de `ApiTestExecutor`
+            run_id (str): Run al que pertenecen. Por defecto el run activo
+        """
+        run_id = run_id or current_run_id()
+        if run_id is None:
+            raise ValueError("No hay un run activo; usa start_run() o active_run()")
+        if run_id not in self._known_runs:
+            self.start_run(run_id)
+        now = time.time()
+        rows = []
+        for result in results:
+            data = result if isinstance(result, dict) else result.to_dict()
+            if data["passed"]:
+                status = "passed"
+            elif data.get("status_code") is None:
+                status = "error"
+            else:
+                status = "failed"
+            rows.append((
+                run_id,
+                _endpoint(data["url"]),
+                data["method"],
+                data["name"],
+                status,
+                data.get("status_code"),
+                data.get("latency_ms"),
+                "\n".join(data.get("errors") or []),
+                now,
+            ))
+        self._enqueue("_pending_results", rows)
+
+    def record_agent_output(self, session: str, query: str, author: str, text: str, run_id: Optional[str] = None) -> None:
+        """Encola una respuesta de agente producida por run_session"""
+        run_id = run_id or current_run_id()
+        if run_id is None:
+            raise ValueError("No hay un run activo; usa start_run() o active_run()")
+        if run_id not in self._known_runs:
+            self.start_run(run_id)
+        self._enqueue("_pending_outputs", [(run_id, session, query, author, text, time.time())])
+
+    def _enqueue(self, buffer_name: str, rows: list) -> None:
+        with self._lock:
+            getattr(self, buffer_name).extend(rows)
+            full = len(self._pending_results) + len(self._pending_outputs) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """Vuelca las escrituras pendientes en una sola transacción"""
+        with self._lock:
+            results, outputs = self._pending_results, self._pending_outputs
+            if not results and not outputs:
+                return
+            try:
+                self.connection.execute("BEGIN")
+                self.connection.executemany(
+                    """INSERT INTO test_results
+                       (run_id, endpoint, method, name, status, status_code, latency_ms, errors, created_at)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    results,
+                )
+                self.connection.executemany(
+                    """INSERT INTO agent_outputs (run_id, session, query, author, text, created_at)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    outputs,
+                )
+                self.connection.execute("COMMIT")
+            except sqlite3.Error:
+                if self.connection.in_transaction:
+                    self.connection.execute("ROLLBACK")
+                raise
+            # Solo tras el COMMIT: si la escritura falla, las filas quedan para el siguiente flush
+            self._pending_results, self._pending_outputs = [], []
+
+    def _query(self, query: str, params: tuple = ()) -> List[dict]:
+        self.flush()
+        with self._lock:
+            return [dict(row) for row in self.connection.execute(query, params).fetchall()]
+
+    def list_runs(self, limit: int = 20) -> List[dict]:
+        """Runs más recientes con su número de casos y fallos"""
+        return self._query(
+            """SELECT r.run_id, r.label, r.started_at,
+                      (SELECT COUNT(*) FROM test_results t WHERE t.run_id = r.run_id) AS total,
+                      (SELECT COUNT(*) FROM test_results t WHERE t.run_id = r.run_id AND t.status != 'passed') AS failing
+               FROM runs r ORDER BY r.started_at DESC LIMIT ?""",
+            (limit,),
+        )
+
+    def latest_run_id(self) -> Optional[str]:
+        rows = self._query("SELECT run_id FROM runs ORDER BY started_at DESC LIMIT 1")
+        return rows[0]["run_id"] if rows else None
+
+    def run_summary(self, run_id: str) -> List[dict]:
+        """Conteo por estado de un run"""
+        return self._query(
+            "SELECT status, COUNT(*) AS count FROM test_results WHERE run_id = ? GROUP BY status",
+            (run_id,),
+        )
+
+    def slowest_endpoints(self, run_id: Optional[str] = None, since: Optional[float] = None, limit: int = 10) -> List[dict]:
+        """Endpoints con mayor latencia media
+
+        Args:
+            run_id (str): Limitar a un run concreto
+            since (float): Limitar a resultados posteriores a este timestamp
+            limit (int): Número de endpoints a devolver
+        """
+        conditions, params = [], []
+        if run_id:
+            conditions.append("run_id = ?")
+            params.append(run_id)
+        if since:
+            conditions.append("created_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query(
+            f"""SELECT endpoint, method, COUNT(*) AS count,
+                       ROUND(AVG(latency_ms), 3) AS avg_latency_ms, MAX(latency_ms) AS max_latency_ms
+                FROM test_results {where}
+                GROUP BY endpoint, method
+                ORDER BY avg_latency_ms DESC LIMIT ?""",
+            (*params, limit),
+        )
+
+    def newly_failing(self, since_run_id: str, run_id: Optional[str] = None) -> List[dict]:
+        """Casos que pasaban en `since_run_id` y fallan en `run_id` (por defecto el último run)"""
+        run_id = run_id or self.latest_run_id()
+        return self._query(
+            """SELECT cur.endpoint, cur.method, cur.name, cur.status, cur.status_code, cur.errors
+               FROM test_results cur
+               WHERE cur.run_id = ? AND cur.status != 'passed'
+                 AND EXISTS (
+                     SELECT 1 FROM test_results prev
+                     WHERE prev.run_id = ? AND prev.endpoint = cur.endpoint AND prev.method = cur.method
+                       AND prev.name = cur.name AND prev.status = 'passed'
+                 )
+               GROUP BY cur.endpoint, cur.method, cur.name""",
+            (run_id, since_run_id),
+        )
+
+    def failure_rate_by_endpoint(self, run_id: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """Endpoints ordenados por proporción de casos fallidos"""
+        where, params = ("WHERE run_id = ?", (run_id,)) if run_id else ("", ())
+        return self._query(
+            f"""SELECT endpoint, method, COUNT(*) AS count,
+                       ROUND(AVG(status != 'passed'), 4) AS failure_rate
+                FROM test_results {where}
+                GROUP BY endpoint, method
+                ORDER BY failure_rate DESC, count DESC LIMIT ?""",
+            (*params, limit),
+        )
+
+    def latency_regressions(self, base_run_id: str, run_id: str, min_ratio: float = 1.5) -> List[dict]:
+        """Endpoints cuya latencia media creció al menos `min_ratio` veces entre dos runs"""
+        return self._query(
+            """WITH base AS (
+                   SELECT endpoint, method, AVG(latency_ms) AS latency FROM test_results
+                   WHERE run_id = ? GROUP BY endpoint, method
+               ), cur AS (
+                   SELECT endpoint, method, AVG(latency_ms) AS latency FROM test_results
+                   WHERE run_id = ? GROUP BY endpoint, method
+               )
+               SELECT cur.endpoint, cur.method,
+                      ROUND(base.latency, 3) AS base_latency_ms, ROUND(cur.latency, 3) AS latency_ms,
+                      ROUND(cur.latency / base.latency, 2) AS ratio
+               FROM cur JOIN base USING (endpoint, method)
+               WHERE base.latency > 0 AND cur.latency >= base.latency * ?
+               ORDER BY ratio DESC""",
+            (base_run_id, run_id, min_ratio),
+        )
+
+    def agent_outputs(self, run_id: str) -> List[dict]:
+        return self._query(
+            "SELECT session, query, author, text, created_at FROM agent_outputs WHERE run_id = ? ORDER BY created_at",
+            (run_id,),
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_results_store() -> ResultsStore:
+    """Retorna el almacén de resultados compartido por el proceso"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultsStore()
+            atexit.register(_store.close)
+        return _store
@@ -0,0 +1,340 @@
+import random
+import sqlite3
+from typing import List, Optional, Tuple
+
+# Ids candidatos por consulta "rowid IN (...)"
+_PROBE_BATCH = 256
+# Rondas de sondeo por fila pedida antes de pasar a sondeos "rowid >= ?"
+_MAX_PROBE_ROUNDS = 8
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _rowid_range(connection: sqlite3.Connection, table: str) -> Optional[tuple]:
+    """Retorna (min, max) de rowid en O(log n), o None si la tabla es WITHOUT ROWID o está vacía"""
+    try:
+        # Un MIN y un MAX en la misma consulta recorren la tabla; por separado cada uno es una búsqueda
+        low, high = connection.execute(
+            f"SELECT (SELECT MIN(rowid) FROM {_quote(table)}), (SELECT MAX(rowid) FROM {_quote(table)})"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return None if low is None else (low, high)
+
+
+def _columns(connection: sqlite3.Connection, table: str) -> str:
+    """Lista de columnas de la tabla, para seleccionar el rowid aparte de las columnas reales"""
+    columns = [row[1] for row in connection.execute(f"PRAGMA table_info({_quote(table)})")]
+    return ", ".join(_quote(column) for column in columns)
+
+
+def _probe_exact(connection, table, columns, low, high, n, rng, seen) -> List[sqlite3.Row]:
+    """Sondeo uniforme: ids al azar consultados por lotes con "rowid IN (...)"; los huecos se descartan"""
+    rows = []
+    rounds = 0
+    while len(rows) < n and rounds < _MAX_PROBE_ROUNDS * max(1, n // _PROBE_BATCH + 1):
+        rounds += 1
+        draws = [rng.randint(low, high) for _ in range(min(_PROBE_BATCH, 2 * (n - len(rows)) + 8))]
+        candidates = [rowid for rowid in dict.fromkeys(draws) if rowid not in seen]
+        if not candidates:
+            continue
+        placeholders = ", ".join("?" for _ in candidates)
+        found = connection.execute(
+            f"SELECT rowid, {columns} FROM {_quote(table)} WHERE rowid IN ({placeholders})",
+            candidates,
+        ).fetchall()
+        # Se recorre en el orden de los sorteos (no el del plan de la consulta): sin sesgo y reproducible
+        by_id = {row[0]: row for row in found}
+        for rowid in candidates:
+            if rowid in by_id and len(rows) < n:
+                seen.add(rowid)
+                rows.append(by_id[rowid])
+    return rows
+
+
+def _probe_next(connection, table, columns, low, high, n, rng, seen, condition: str = "", params: tuple = ()) -> List[sqlite3.Row]:
+    """Sondeo "siguiente fila": para cada id al azar toma la primera fila con rowid >= id que cumpla la condición"""
+    rows = []
+    extra = f" AND {condition}" if condition else ""
+    attempts = 0
+    while len(rows) < n and attempts < 4 * n + 16:
+        attempts += 1
+        start = rng.randint(low, high)
+        row = connection.execute(
+            f"SELECT rowid, {columns} FROM {_quote(table)} WHERE rowid >= ?{extra} ORDER BY rowid LIMIT 1",
+            (start, *params),
+        ).fetchone()
+        if row is None:
+            # Se da la vuelta desde el principio de la tabla
+            row = connection.execute(
+                f"SELECT rowid, {columns} FROM {_quote(table)} WHERE rowid < ?{extra} ORDER BY rowid LIMIT 1",
+                (start, *params),
+            ).fetchone()
+        if row is None:
+            break  # ninguna fila cumple la condición
+        if row[0] not in seen:
+            seen.add(row[0])
+            rows.append(row)
+    return rows
+
+
+def _strip_rowid(connection: sqlite3.Connection, table: str, columns: str, rows: list) -> List[sqlite3.Row]:
+    """Quita el rowid auxiliar y retorna las filas como sqlite3.Row"""
+    cursor = connection.execute(f"SELECT {columns} FROM {_quote(table)} LIMIT 0")
+    return [sqlite3.Row(cursor, tuple(row)[1:]) for row in rows]
+
+
+def sample_uniform(connection: sqlite3.Connection, table: str, n: int, seed: int = 0) -> List[sqlite3.Row]:
+    """Muestra uniforme de `n` filas sondeando rangos de rowid; coste O(n), sin ORDER BY RANDOM()
+
+    Args:
+        connection (sqlite3.Connection): Conexión abierta
+        table (str): Nombre de la tabla e.g. "books"
+        n (int): Tamaño de la muestra
+        seed (int): Semilla; la misma semilla sobre los mismos datos da la misma muestra
+    Returns:
+        List: Filas de la muestra (se pueden convertir con dict(row))
+    """
+    bounds = _rowid_range(connection, table)
+    if bounds is None:
+        # WITHOUT ROWID o tabla vacía: desplazamientos al azar sobre el recuento
+        total = connection.execute(f"SELECT COUNT(*) FROM {_quote(table)}").fetchone()[0]
+        rng = random.Random(seed)
+        offsets = sorted(rng.sample(range(total), min(n, total)))
+        return [
+            connection.execute(f"SELECT * FROM {_quote(table)} LIMIT 1 OFFSET ?", (offset,)).fetchone()
+            for offset in offsets
+        ]
+
+    low, high = bounds
+    columns = _columns(connection, table)
+    rng = random.Random(seed)
+    seen = set()
+    if high - low + 1 <= n:
+        rows = connection.execute(f"SELECT rowid, {columns} FROM {_quote(table)}").fetchall()
+    else:
+        rows = _probe_exact(connection, table, columns, low, high, n, rng, seen)
+        if len(rows) < n:
+            # Tabla con muchos huecos de rowid: se completa con sondeos "siguiente fila"
+            rows += _probe_next(connection, table, columns, low, high, n - len(rows), rng, seen)
+    return _strip_rowid(connection, table, columns, rows)
+
+
+def sample_rowids(connection: sqlite3.Connection, table: str, n: int, seed: int = 0) -> Optional[List[int]]:
+    """Rowids de una muestra uniforme de `n` filas, con los mismos sondeos que `sample_uniform`
+
+    Args:
+        connection (sqlite3.Connection): Conexión abierta
+        table (str): Nombre de la tabla e.g. "books"
+        n (int): Tamaño de la muestra
+        seed (int): Semilla; la misma semilla sobre los mismos datos da la misma muestra
+    Returns:
+        Optional[List[int]]: Rowids de la muestra, o None si la tabla es WITHOUT ROWID, una vista o está vacía
+    """
+    bounds = _rowid_range(connection, table)
+    if bounds is None:
+        return None
+    low, high = bounds
+    if high - low + 1 <= n:
+        return [row[0] for row in connection.execute(f"SELECT rowid FROM {_quote(table)}")]
+    rng = random.Random(seed)
+    seen = set()
+    # Solo hace falta el rowid: NULL en lugar de las columnas
+    rows = _probe_exact(connection, table, "NULL", low, high, n, rng, seen)
+    if len(rows) < n:
+        rows += _probe_next(connection, table, "NULL", low, high, n - len(rows), rng, seen)
+    return [row[0] for row in rows]
+
+
+def _leading_index(connection: sqlite3.Connection, table: str, column: str) -> Optional[str]:
+    """Nombre de un índice completo de la tabla que empiece por la columna, o None. SQLite guarda el rowid
+    al final de cada entrada, así que el índice sirve como (columna, rowid) para "columna = ? AND rowid >= ?"."""
+    for index in connection.execute(f"PRAGMA index_list({_quote(table)})").fetchall():
+        name, partial = index[1], index[4]
+        info = connection.execute(f"PRAGMA index_info({_quote(name)})").fetchall()
+        if not partial and info and info[0][2] == column:
+            return name
+    return None
+
+
+def _data_version(connection: sqlite3.Connection) -> str:
+    """Cambia con cualquier escritura: de otras conexiones (data_version), de esta (total_changes) o del esquema"""
+    data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+    schema_version = connection.execute("PRAGMA schema_version").fetchone()[0]
+    return f"{data_version}:{schema_version}:{connection.total_changes}"
+
+
+class _StratumIndex:
+    """Ids de las filas de cada estrato, consultados por un índice (columna, id).
+
+    Usa el índice de la tabla si existe. Si no, copia (rowid, columna) a una tabla TEMP de la
+    conexión con un índice (valor, id): un recorrido y una ordenación, sin modificar la base de datos.
+    La copia se reutiliza en las siguientes muestras de la misma columna hasta que cambien los datos."""
+
+    _TEMP = "_sample_strata"
+
+    def __init__(self, connection: sqlite3.Connection, table: str, column: str):
+        self.connection = connection
+        # INDEXED BY: con "ORDER BY rowid LIMIT 1" el planificador podría preferir recorrer la tabla
+        index = _leading_index(connection, table, column)
+        if index is not None:
+            self.source, self.key, self.id = f"{_quote(table)} INDEXED BY {_quote(index)}", _quote(column), "rowid"
+            return
+        self.source, self.key, self.id = f"temp.{self._TEMP} INDEXED BY {self._TEMP}_value", "value", "id"
+        try:
+            built = connection.execute(f"SELECT source, key, version FROM temp.{self._TEMP}_meta").fetchone()
+        except sqlite3.OperationalError:
+            built = None  # aún no hay copia en esta conexión
+        if built is not None and tuple(built) == (table, column, _data_version(connection)):
+            return
+        connection.execute(f"DROP TABLE IF EXISTS temp.{self._TEMP}")
+        connection.execute(f"DROP TABLE IF EXISTS temp.{self._TEMP}_meta")
+        connection.execute(
+            f"CREATE TEMP TABLE {self._TEMP} AS SELECT rowid AS id, {_quote(column)} AS value FROM {_quote(table)}"
+        )
+        connection.execute(f"CREATE INDEX temp.{self._TEMP}_value ON {self._TEMP} (value, id)")
+        # CREATE ... AS y no INSERT: no abre una transacción implícita en la conexión
+        connection.execute(
+            f"CREATE TEMP TABLE {self._TEMP}_meta AS SELECT ? AS source, ? AS key, ? AS version",
+            (table, column, _data_version(connection)),
+        )
+
+    def _ids(self, value, where: str = "", params: tuple = (), order: str = "", limit: int = -1) -> List[int]:
+        return [row[0] for row in self.connection.execute(
+            f"SELECT {self.id} FROM {self.source} WHERE {self.key} = ?{where}{order} LIMIT ?",
+            (value, *params, limit),
+        )]
+
+    def sample(self, value, n: int, rng: random.Random, seen: set) -> List[int]:
+        """Hasta `n` ids del estrato que no estén en `seen`; menos de `n` solo si el estrato no tiene más"""
+        order = f" ORDER BY {self.id}"
+        # Con el índice, contar hasta este límite cuesta O(n): un estrato más pequeño se lista entero
+        limit = 4 * n + len(seen) + 1
+        ids = self._ids(value, order=order, limit=limit)
+        if len(ids) < limit:
+            candidates = [rowid for rowid in ids if rowid not in seen]
+            found = rng.sample(candidates, min(n, len(candidates)))
+            seen.update(found)
+            return found
+
+        # Estrato grande: sondeo "siguiente fila" dentro de su propio rango de ids
+        low = self._ids(value, order=order, limit=1)[0]
+        high = self._ids(value, order=f"{order} DESC", limit=1)[0]
+        found = []
+        attempts = 0
+        while len(found) < n and attempts < 4 * n + 16:
+            attempts += 1
+            start = rng.randint(low, high)
+            ids = self._ids(value, f" AND {self.id} >= ?", (start,), order, 1)
+            if ids[0] not in seen:
+                seen.add(ids[0])
+                found.append(ids[0])
+        if len(found) < n:
+            # Ids muy agrupados: se completa con ids consecutivos desde un punto al azar
+            start = rng.randint(low, high)
+            following = self._ids(value, f" AND {self.id} >= ?", (start,), order, n + len(seen))
+            preceding = self._ids(value, f" AND {self.id} < ?", (start,), order, n + len(seen))
+            for rowid in following + preceding:
+                if len(found) == n:
+                    break
+                if rowid not in seen:
+                    seen.add(rowid)
+                    found.append(rowid)
+        return found
+
+
+def _allocate(n: int, values: list, strata: dict, allocation: str) -> dict:
+    """Reparte exactamente `n` filas entre los estratos, a partes iguales o según los pesos (mayor resto)"""
+    weights = [1.0 if allocation == "equal" else float(strata[value]) for value in values]
+    total = sum(weights) or 1.0
+    exact = [n * weight / total for weight in weights]
+    quotas = [int(share) for share in exact]
+    by_remainder = sorted(range(len(values)), key=lambda i: exact[i] - quotas[i], reverse=True)
+    for i in by_remainder[: n - sum(quotas)]:
+        quotas[i] += 1
+    return dict(zip(values, quotas))
+
+
+def _fetch(connection: sqlite3.Connection, table: str, columns: str, ids: List[int]) -> list:
+    """Filas con estos rowid, en el mismo orden"""
+    by_id = {}
+    for start in range(0, len(ids), _PROBE_BATCH):
+        batch = ids[start:start + _PROBE_BATCH]
+        placeholders = ", ".join("?" for _ in batch)
+        for row in connection.execute(
+            f"SELECT rowid, {columns} FROM {_quote(table)} WHERE rowid IN ({placeholders})", batch
+        ):
+            by_id[row[0]] = row
+    return [by_id[rowid] for rowid in ids if rowid in by_id]
+
+
+def sample_stratified(
+    connection: sqlite3.Connection,
+    table: str,
+    n: int,
+    column: str,
+    strata: dict,
+    allocation: str = "equal",
+    seed: int = 0,
+) -> Tuple[List[sqlite3.Row], dict]:
+    """Muestra estratificada por una columna categórica, e.g. "genre"
+
+    Cada estrato se sondea dentro de su propio rango de rowid a través de un índice que empiece por
+    la columna; si la tabla no lo tiene se crea uno temporal en la conexión (ver `_StratumIndex`). Si un estrato
+    tiene menos filas que su cuota, lo que falta se reparte entre los demás estratos.
+
+    Args:
+        connection (sqlite3.Connection): Conexión abierta
+        table (str): Nombre de la tabla
+        n (int): Tamaño total de la muestra
+        column (str): Columna que define los estratos
+        strata (dict): Valor del estrato -> peso (e.g. frecuencia estimada por el perfilador)
+        allocation (str): "equal" reparte n a partes iguales, "proportional" según los pesos
+        seed (int): Semilla de la muestra
+    Returns:
+        Tuple[List, dict]: Filas de la muestra agrupadas por estrato, y el informe de la muestra
+                           e.g. {"requested": 10, "returned": 7, "short": True,
+                                 "strata": {"Fiction": {"quota": 5, "returned": 5, "exhausted": False},
+                                            "Poetry": {"quota": 5, "returned": 2, "exhausted": True}}}
+    """
+    if allocation not in ("equal", "proportional"):
+        raise ValueError(f"Asignación no soportada: {allocation}. Usa 'equal' o 'proportional'")
+    values = list(strata)
+    report = {"requested": n, "returned": 0, "short": n > 0, "strata": {}}
+    bounds = _rowid_range(connection, table)
+    if bounds is None or not values or n <= 0:
+        return [], report
+
+    quotas = _allocate(n, values, strata, allocation)
+    columns = _columns(connection, table)
+    rng = random.Random(seed)
+    seen = set()
+    ids = {value: [] for value in values}
+    exhausted = set()
+    index = _StratumIndex(connection, table, column)
+    pending = dict(quotas)
+    while pending:
+        shortfall = 0
+        for value, quota in pending.items():
+            if quota <= 0:
+                continue
+            found = index.sample(value, quota, rng, seen)
+            ids[value] += found
+            if len(found) < quota:
+                exhausted.add(value)
+                shortfall += quota - len(found)
+        remaining = [value for value in values if value not in exhausted]
+        if not shortfall or not remaining:
+            break
+        pending = _allocate(shortfall, remaining, strata, allocation)
+
+    rows = _fetch(connection, table, columns, [rowid for value in values for rowid in ids[value]])
+    report["returned"] = len(rows)
+    report["short"] = len(rows) < n
+    report["strata"] = {
+        value: {"quota": quotas[value], "returned": len(ids[value]), "exhausted": value in exhausted}
+        for value in values
+    }
+    return _strip_rowid(connection, table, columns, rows), report
@@ -0,0 +1,133 @@
+import contextlib
+import contextvars
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from utils.database_registry import Connection, _default_database_path
+
+# Imagen serializada de cada base de datos de origen: ruta -> ((mtime, tamaño), bytes)
+_images = {}
+_images_lock = threading.Lock()
+
+# Sesión aislada activa en el contexto (ver `isolated_database`), o None
+_session: contextvars.ContextVar[Optional["_IsolatedSession"]] = contextvars.ContextVar("isolated_session", default=None)
+
+
+def _signature(path: str) -> tuple:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _backup_to_memory(source_path: str) -> sqlite3.Connection:
+    """Copia la base de datos a una conexión en memoria con la API de backup de SQLite"""
+    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+    target = sqlite3.connect(":memory:", check_same_thread=False, factory=Connection)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+    return target
+
+
+def database_image(source_path: Optional[str] = None, refresh: bool = False) -> bytes:
+    """Imagen serializada de la base de datos, cacheada hasta que cambie el archivo de origen
+
+    Args:
+        source_path (Optional[str]): Ruta de la base de datos. Por defecto library_database.db
+        refresh (bool): Volver a leer el archivo aunque no haya cambiado
+    Returns:
+        bytes: Contenido de la base de datos tal como lo devuelve `Connection.serialize()`
+    """
+    source_path = os.path.abspath(source_path or _default_database_path())
+    signature = _signature(source_path)
+    with _images_lock:
+        cached = _images.get(source_path)
+        if cached and cached[0] == signature and not refresh:
+            return cached[1]
+        memory = _backup_to_memory(source_path)
+        try:
+            image = memory.serialize()
+        finally:
+            memory.close()
+        _images[source_path] = (signature, image)
+        return image
+
+
+def clone_database(source_path: Optional[str] = None, use_image: bool = True) -> sqlite3.Connection:
+    """Crea una copia privada en memoria de la base de datos. Los cambios no afectan al archivo
+    ni a otras copias, y desaparecen al cerrar la conexión.
+
+    Args:
+        source_path (Optional[str]): Ruta de la base de datos. Por defecto library_database.db
+        use_image (bool): Clonar desde la imagen cacheada con `deserialize` (milisegundos);
+                          si es False se copia desde el archivo con la API de backup
+    Returns:
+        sqlite3.Connection: Conexión a la copia en memoria
+    """
+    source_path = source_path or _default_database_path()
+    if not use_image or not hasattr(sqlite3.Connection, "deserialize"):
+        connection = _backup_to_memory(source_path)
+    else:
+        connection = sqlite3.connect(":memory:", check_same_thread=False, factory=Connection)
+        connection.deserialize(database_image(source_path))
+    connection.row_factory = sqlite3.Row
+    return connection
+
+
+class _IsolatedSession:
+    """Copias en memoria de una sesión aislada, creadas la primera vez que la sesión usa cada base de datos"""
+
+    def __init__(self, parent: Optional["_IsolatedSession"] = None):
+        self.parent = parent
+        self._copies = {}
+        self._lock = threading.Lock()
+
+    def connection(self, source_path: str) -> sqlite3.Connection:
+        """Copia de la base de datos (la de una sesión exterior si ya la tenía)"""
+        if self.parent is not None and source_path in self.parent._copies:
+            return self.parent._copies[source_path]
+        with self._lock:
+            if source_path not in self._copies:
+                self._copies[source_path] = clone_database(source_path)
+            return self._copies[source_path]
+
+    def close(self) -> None:
+        with self._lock:
+            copies, self._copies = list(self._copies.values()), {}
+        for connection in copies:
+            connection.close()
+
+
+def session_connection(source_path: Optional[str] = None) -> Optional[sqlite3.Connection]:
+    """Copia en memoria de una base de datos para la sesión aislada del contexto actual (ver
+    `isolated_database`), o None fuera de una sesión aislada"""
+    session = _session.get()
+    if session is None:
+        return None
+    return session.connection(os.path.abspath(source_path or _default_database_path()))
+
+
+@contextlib.contextmanager
+def isolated_database(source_path: Optional[str] = None):
+    """Da al contexto actual su propia copia en memoria de cada base de datos que use.
+    Todas las DatabaseConnection creadas dentro del bloque, de cualquier base de datos del registro,
+    usan la copia de la sesión (creada la primera vez que se usa), así las escrituras de una sesión
+    no se ven en las demás ni llegan a los archivos. Al salir las copias se descartan: no hay nada que limpiar.
+
+    e.g.
+        with isolated_database():
+            db = DatabaseConnection()
+            db.execute_command("DELETE FROM books")  # solo en esta sesión
+
+    Args:
+        source_path (Optional[str]): Base de datos que se copia al entrar y se retorna. Por defecto library_database.db
+    """
+    session = _IsolatedSession(_session.get())
+    token = _session.set(session)
+    try:
+        yield session.connection(os.path.abspath(source_path or _default_database_path()))
+    finally:
+        _session.reset(token)
+        session.close()
@@ -0,0 +1,305 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional
+
+# Esquema con el que se adjunta el archivo de índices; la base de datos indexada no se modifica
+INDEX_SCHEMA = "text_index"
+# Prefijo de las tablas FTS5 dentro del archivo de índices
+INDEX_PREFIX = "fts_"
+# Ruta del índice de las copias en memoria de una sesión: vive y muere con su conexión
+MEMORY_INDEX = ":memory:"
+DEFAULT_SEARCH_LIMIT = 10
+# Palabras de contexto de cada fragmento
+_SNIPPET_TOKENS = 12
+
+_STATE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {INDEX_SCHEMA}.index_state (
+    table_name TEXT PRIMARY KEY,
+    columns TEXT NOT NULL,
+    schema_hash TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    max_rowid INTEGER
+)
+"""
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def index_name(table: str) -> str:
+    return f"{INDEX_PREFIX}{table}"
+
+
+def _index_table(table: str) -> str:
+    return f"{INDEX_SCHEMA}.{_quote(index_name(table))}"
+
+
+def index_path(db_path: str) -> str:
+    """Archivo de índices de una base de datos, junto a ella e.g. library_database.db -> library_database.fts.db"""
+    return f"{os.path.splitext(db_path)[0]}.fts.db"
+
+
+def is_text_column(declared_type: str) -> bool:
+    """Afinidad TEXT de SQLite: el tipo declarado contiene CHAR, CLOB o TEXT"""
+    declared_type = (declared_type or "").upper()
+    return any(marker in declared_type for marker in ("CHAR", "CLOB", "TEXT"))
+
+
+def match_expression(text: str) -> str:
+    """Convierte texto libre en una expresión MATCH de FTS5 segura.
+    Cada palabra se cita (así "@", "-" o "." no se interpretan como operadores) y todas deben aparecer;
+    un "*" final en una palabra busca por prefijo. e.g. 'john@example.com' -> '"john@example.com"'
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if re.search(r"\w", word):
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+@contextlib.contextmanager
+def attach_index(connection: sqlite3.Connection, path: str):
+    """Adjunta el archivo de índices a la conexión como esquema `INDEX_SCHEMA` mientras dura el bloque.
+    Si ya estaba adjunto se reutiliza; el índice en memoria (`MEMORY_INDEX`) se queda adjunto,
+    porque al separarlo se perdería.
+
+    Args:
+        connection (sqlite3.Connection): Conexión a la base de datos indexada
+        path (str): Archivo de índices (ver `index_path`) o `MEMORY_INDEX`
+    """
+    attached = any(row[1] == INDEX_SCHEMA for row in connection.execute("PRAGMA database_list"))
+    if not attached:
+        connection.execute(f"ATTACH DATABASE ? AS {INDEX_SCHEMA}", (path,))
+        connection.execute(_STATE_SCHEMA)
+    try:
+        yield connection
+    finally:
+        # Dentro de una transacción abierta no se puede separar: queda adjunto y la próxima vez se reutiliza
+        if not attached and path != MEMORY_INDEX and not connection.in_transaction:
+            connection.execute(f"DETACH DATABASE {INDEX_SCHEMA}")
+
+
+def indexed_tables(connection: sqlite3.Connection) -> Dict[str, List[str]]:
+    """Tablas con índice de texto y sus columnas indexadas, e.g. {"books": ["title", "author", "genre"]}.
+    La conexión debe tener el archivo de índices adjunto (ver `attach_index`)."""
+    rows = connection.execute(f"SELECT table_name, columns FROM {INDEX_SCHEMA}.index_state").fetchall()
+    return {row[0]: json.loads(row[1]) for row in rows}
+
+
+def _text_tables(connection: sqlite3.Connection) -> Dict[str, tuple]:
+    """Tablas de la base de datos indexada con columnas TEXT -> (columnas, hash de su CREATE TABLE)"""
+    tables = {}
+    rows = connection.execute(
+        "SELECT name, sql FROM main.sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()
+    for name, sql in rows:
+        columns = [
+            row[1] for row in connection.execute(f"PRAGMA main.table_info({_quote(name)})")
+            if is_text_column(row[2])
+        ]
+        if columns and "WITHOUT ROWID" not in (sql or "").upper():
+            tables[name] = (columns, hashlib.sha256((sql or "").encode()).hexdigest())
+    return tables
+
+
+def _watermark(connection: sqlite3.Connection, table: str) -> tuple:
+    row_count = connection.execute(f"SELECT COUNT(*) FROM main.{_quote(table)}").fetchone()[0]
+    max_rowid = connection.execute(f"SELECT MAX(rowid) FROM main.{_quote(table)}").fetchone()[0]
+    return row_count, max_rowid
+
+
+def stale_tables(connection: sqlite3.Connection, tables: Optional[List[str]] = None) -> Dict[str, str]:
+    """Qué índices hay que poner al día y cómo, comparando cada tabla con el estado guardado al indexarla:
+    "build" si es nueva, cambió su esquema o se borraron filas; "append" si solo tiene filas nuevas
+    por encima del último rowid indexado; "drop" si la tabla ya no existe.
+    Las actualizaciones que no cambian el número de filas ni el rowid máximo no se detectan
+    (ver `build_index` para reconstruir a mano).
+
+    Args:
+        connection (sqlite3.Connection): Conexión con el archivo de índices adjunto
+        tables (Optional[List[str]]): Tablas a comprobar. Por defecto todas
+    Returns:
+        Dict[str, str]: Acción por tabla e.g. {"reviews": "build", "sales": "append"}
+    """
+    current = _text_tables(connection)
+    state = {
+        row[0]: row[1:]
+        for row in connection.execute(
+            f"SELECT table_name, columns, schema_hash, row_count, max_rowid FROM {INDEX_SCHEMA}.index_state"
+        )
+    }
+    stale = {}
+    for table in tables if tables is not None else list(current) + [name for name in state if name not in current]:
+        if table not in current:
+            if table in state:
+                stale[table] = "drop"
+            continue
+        columns, schema_hash = current[table]
+        if table not in state or json.loads(state[table][0]) != columns or state[table][1] != schema_hash:
+            stale[table] = "build"
+            continue
+        row_count, max_rowid = _watermark(connection, table)
+        indexed_count, indexed_max = state[table][2], state[table][3]
+        if (row_count, max_rowid) == (indexed_count, indexed_max):
+            continue
+        appended = connection.execute(
+            f"SELECT COUNT(*) FROM main.{_quote(table)} WHERE rowid > ?", (indexed_max or 0,)
+        ).fetchone()[0]
+        stale[table] = "append" if row_count == indexed_count + appended else "build"
+    return stale
+
+
+def _record_state(connection: sqlite3.Connection, table: str, columns: List[str], schema_hash: str) -> None:
+    row_count, max_rowid = _watermark(connection, table)
+    connection.execute(
+        f"INSERT OR REPLACE INTO {INDEX_SCHEMA}.index_state VALUES (?, ?, ?, ?, ?)",
+        (table, json.dumps(columns), schema_hash, row_count, max_rowid),
+    )
+
+
+def build_index(connection: sqlite3.Connection, table: str, columns: Optional[List[str]] = None) -> None:
+    """Crea (o recrea) el índice FTS5 de una tabla en el archivo de índices, con una copia de sus columnas
+    de texto. No se crean triggers ni tablas en la base de datos indexada: `refresh_index` lo pone al día.
+
+    Args:
+        connection (sqlite3.Connection): Conexión con el archivo de índices adjunto
+        table (str): Tabla con rowid e.g. "books"
+        columns (Optional[List[str]]): Columnas de texto a indexar e.g. ["title", "author"]. Por defecto todas
+    """
+    text_columns, schema_hash = _text_tables(connection).get(table, ([], ""))
+    columns = columns or text_columns
+    column_list = ", ".join(_quote(column) for column in columns)
+    # Un SAVEPOINT hace atómica la creación: o queda el índice completo con su estado, o nada
+    connection.execute("SAVEPOINT build_text_index")
+    try:
+        drop_index(connection, table, commit=False)
+        connection.execute(
+            f"CREATE VIRTUAL TABLE {_index_table(table)} USING fts5({column_list}, "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        connection.execute(
+            f"INSERT INTO {_index_table(table)}(rowid, {column_list}) SELECT rowid, {column_list} FROM main.{_quote(table)}"
+        )
+        _record_state(connection, table, columns, schema_hash)
+    except sqlite3.Error:
+        connection.execute("ROLLBACK TO build_text_index")
+        raise
+    finally:
+        connection.execute("RELEASE build_text_index")
+    if connection.in_transaction:
+        connection.commit()
+
+
+def _append_rows(connection: sqlite3.Connection, table: str) -> None:
+    """Indexa solo las filas por encima del último rowid indexado"""
+    columns_json, max_rowid = connection.execute(
+        f"SELECT columns, max_rowid FROM {INDEX_SCHEMA}.index_state WHERE table_name = ?", (table,)
+    ).fetchone()
+    columns = json.loads(columns_json)
+    column_list = ", ".join(_quote(column) for column in columns)
+    connection.execute("SAVEPOINT append_text_index")
+    try:
+        connection.execute(
+            f"INSERT INTO {_index_table(table)}(rowid, {column_list}) "
+            f"SELECT rowid, {column_list} FROM main.{_quote(table)} WHERE rowid > ?",
+            (max_rowid or 0,),
+        )
+        _record_state(connection, table, columns, _text_tables(connection)[table][1])
+    except sqlite3.Error:
+        connection.execute("ROLLBACK TO append_text_index")
+        raise
+    finally:
+        connection.execute("RELEASE append_text_index")
+    if connection.in_transaction:
+        connection.commit()
+
+
+def refresh_index(connection: sqlite3.Connection, tables: Optional[List[str]] = None) -> Dict[str, str]:
+    """Pone al día los índices de texto (ver `stale_tables`): indexa las tablas nuevas, añade las filas
+    nuevas, reconstruye las tablas cambiadas y elimina los índices de las tablas que ya no existen.
+
+    Args:
+        connection (sqlite3.Connection): Conexión con el archivo de índices adjunto
+        tables (Optional[List[str]]): Tablas a poner al día. Por defecto todas
+    Returns:
+        Dict[str, str]: Acción aplicada por tabla e.g. {"reviews": "build"}
+    """
+    stale = stale_tables(connection, tables)
+    for table, action in stale.items():
+        if action == "drop":
+            drop_index(connection, table)
+        elif action == "append":
+            _append_rows(connection, table)
+        else:
+            build_index(connection, table)
+    return stale
+
+
+def drop_index(connection: sqlite3.Connection, table: str, commit: bool = True) -> None:
+    """Elimina el índice de texto de una tabla"""
+    connection.execute(f"DROP TABLE IF EXISTS {_index_table(table)}")
+    connection.execute(f"DELETE FROM {INDEX_SCHEMA}.index_state WHERE table_name = ?", (table,))
+    if commit and connection.in_transaction:
+        connection.commit()
+
+
+def search(
+    connection: sqlite3.Connection,
+    text: str,
+    tables: Optional[List[str]] = None,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+) -> List[dict]:
+    """Busca texto en los índices FTS5 y retorna las filas originales ordenadas por relevancia (BM25)
+
+    Args:
+        connection (sqlite3.Connection): Conexión con el archivo de índices adjunto
+        text (str): Texto a buscar e.g. "george orwell" o "john@example.com"
+        tables (Optional[List[str]]): Tablas en las que buscar. Por defecto todas las indexadas
+        limit (int): Número máximo de filas en total
+    Returns:
+        List[dict]: e.g. [{"table": "books", "rowid": 3, "score": 1.7, "snippet": "[1984] ...", "row": {...}}]
+    """
+    expression = match_expression(text)
+    if not expression:
+        return []
+
+    indexes = indexed_tables(connection)
+    matches = []
+    for table in tables or list(indexes):
+        if table not in indexes:
+            continue
+        fts = _quote(index_name(table))
+        hits = connection.execute(
+            f"SELECT rowid, bm25({fts}), snippet({fts}, -1, '[', ']', '...', {_SNIPPET_TOKENS}) "
+            f"FROM {INDEX_SCHEMA}.{fts} WHERE {fts} MATCH ? ORDER BY rank LIMIT ?",
+            (expression, limit),
+        ).fetchall()
+        if not hits:
+            continue
+        placeholders = ", ".join("?" for _ in hits)
+        cursor = connection.execute(
+            f"SELECT rowid, * FROM main.{_quote(table)} WHERE rowid IN ({placeholders})",
+            [hit[0] for hit in hits],
+        )
+        names = [description[0] for description in cursor.description][1:]
+        by_rowid = {row[0]: dict(zip(names, tuple(row)[1:])) for row in cursor.fetchall()}
+        for rowid, score, snippet in hits:
+            if rowid in by_rowid:
+                # bm25() es negativo: cuanto menor, más relevante
+                matches.append({
+                    "table": table,
+                    "rowid": rowid,
+                    "score": round(-score, 4),
+                    "snippet": snippet,
+                    "row": by_rowid[rowid],
+                })
+
+    matches.sort(key=lambda match: match["score"], reverse=True)
+    return matches[:limit]